@@ -1,104 +1,176 @@
+import copy
 import json
 import os
 import secrets
-from base64 import b64encode, b64decode
+import threading
 from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
 from dotenv import load_dotenv, set_key
 
+from backend.credential_store import CredentialStore
+
 load_dotenv()
 
 KEY_FILE = ".env"
 KEY_ENV = "ACCOUNT_AES_KEY"
 ACCOUNT_FILE = "account.enc"
 COOKIE_FILE = "cookie.enc"
+CREDENTIAL_DB = os.getenv("CREDENTIAL_DB", "credentials.db")
+ACCOUNT_KIND = "account"
+COOKIE_KIND = "cookie"
 BLOCK_SIZE = 16
 
+_key_lock = threading.Lock()
+_cached_key = None
+_cached_key_signature = None
+
 def reset_env():
     if os.path.exists(KEY_FILE):
         os.remove(KEY_FILE)
+    _invalidate_key()
     print(".env文件已重置。下次运行将自动生成新密钥。")
 
+def _file_signature(path):
+    """文件签名 (mtime, inode, size)，文件不存在时为None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+def _db_signature(path):
+    """数据库签名 - 文件签名加上SQLite文件头中的修改计数器（每次提交递增）"""
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            header = f.read(28)
+    except FileNotFoundError:
+        return None
+    return signature + (header[24:28],)
+
+def _invalidate_key():
+    global _cached_key, _cached_key_signature
+    with _key_lock:
+        _cached_key = None
+        _cached_key_signature = None
+
 def get_key():
-    load_dotenv()
-    key = os.getenv(KEY_ENV)
-    if not key or len(key) not in (16, 24, 32):
-        # 自动生成32字节高强度密钥
-        key = secrets.token_urlsafe(48)[:32]
-        set_key(KEY_FILE, KEY_ENV, key)
-        print(f"已自动生成32字节AES密钥并写入{KEY_FILE}，请妥善备份：{key}")
-    return key.encode("utf-8")
-
-def pad(s):
-    pad_len = BLOCK_SIZE - len(s) % BLOCK_SIZE
-    return s + chr(pad_len) * pad_len
+    """获取AES密钥 - 仅在.env文件变化时重新读取"""
+    global _cached_key, _cached_key_signature
+    signature = _file_signature(KEY_FILE)
+    with _key_lock:
+        if _cached_key is not None and signature == _cached_key_signature:
+            return _cached_key
+        load_dotenv()
+        key = os.getenv(KEY_ENV)
+        if not key or len(key) not in (16, 24, 32):
+            # 自动生成32字节高强度密钥
+            key = secrets.token_urlsafe(48)[:32]
+            set_key(KEY_FILE, KEY_ENV, key)
+            print(f"已自动生成32字节AES密钥并写入{KEY_FILE}，请妥善备份：{key}")
+            signature = _file_signature(KEY_FILE)
+        _cached_key = key.encode("utf-8")
+        _cached_key_signature = signature
+        return _cached_key
 
 def unpad(s):
     pad_len = ord(s[-1])
     return s[:-pad_len]
 
-def save_account(platform, account_dict):
-    key = get_key()
-    accounts = {}
-    if os.path.exists(ACCOUNT_FILE):
-        with open(ACCOUNT_FILE, "rb") as f:
-            raw = f.read()
-            if raw:
-                iv = raw[:BLOCK_SIZE]
-                cipher = AES.new(key, AES.MODE_CBC, iv)
-                data = unpad(cipher.decrypt(raw[BLOCK_SIZE:]).decode("utf-8"))
-                accounts = json.loads(data)
-    accounts[platform] = account_dict
-    data = json.dumps(accounts)
-    iv = get_random_bytes(BLOCK_SIZE)
+def _decrypt_file(path, key):
+    """读取并解密旧版整文件加密的凭据（仅用于迁移）"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as f:
+        raw = f.read()
+    if not raw:
+        return {}
+    iv = raw[:BLOCK_SIZE]
     cipher = AES.new(key, AES.MODE_CBC, iv)
-    enc = iv + cipher.encrypt(pad(data).encode("utf-8"))
-    with open(ACCOUNT_FILE, "wb") as f:
-        f.write(enc)
+    data = unpad(cipher.decrypt(raw[BLOCK_SIZE:]).decode("utf-8"))
+    return json.loads(data)
+
+_store = CredentialStore(CREDENTIAL_DB, key_provider=get_key)
+_LEGACY_FILES = {ACCOUNT_KIND: ACCOUNT_FILE, COOKIE_KIND: COOKIE_FILE}
+
+class _CredentialCache:
+    """已解密凭据的内存缓存
+
+    每类凭据只解密一次，数据库文件变化（含其他进程写入）或密钥变化时自动失效，线程安全
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._lock = threading.RLock()
+        self._entries = {}  # kind -> (签名, 密钥, 解密后的字典)
+        self._migrated = set()
+
+    def _migrate(self, kind):
+        """首次访问时迁移旧版凭据文件"""
+        if kind in self._migrated:
+            return
+        legacy = _LEGACY_FILES.get(kind)
+        if legacy:
+            self._store.import_legacy(kind, legacy, lambda path: _decrypt_file(path, get_key()))
+        self._migrated.add(kind)
+
+    def get(self, kind):
+        """获取某类全部凭据（调用方不得修改返回值）"""
+        key = get_key()
+        entry = self._entries.get(kind)
+        if entry and entry[1] == key and entry[0] == _db_signature(self._store.path):
+            return entry[2]
+        with self._lock:
+            self._migrate(kind)
+            # 先取签名再读取数据，读取期间的外部写入会在下次访问时重新加载
+            signature = _db_signature(self._store.path)
+            entry = self._entries.get(kind)
+            if entry and entry[0] == signature and entry[1] == key:
+                return entry[2]
+            records = self._store.get_all(kind)
+            self._entries[kind] = (signature, key, records)
+            return records
+
+    def update(self, kind, records):
+        """批量写入凭据（单个事务）并使缓存失效"""
+        with self._lock:
+            self._migrate(kind)
+            count = self._store.put_many(kind, records)
+            self._entries.clear()
+            return count
+
+    def invalidate(self, kind=None):
+        """清除缓存"""
+        with self._lock:
+            if kind is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(kind, None)
+
+_credential_cache = _CredentialCache(_store)
+
+def save_account(platform, account_dict):
+    _credential_cache.update(ACCOUNT_KIND, {platform: account_dict})
+
+def save_accounts(accounts):
+    """批量保存账号 {platform: account_dict}，返回写入条数"""
+    return _credential_cache.update(ACCOUNT_KIND, accounts)
 
 def load_account(platform):
-    key = get_key()
-    if not os.path.exists(ACCOUNT_FILE):
-        return None
-    with open(ACCOUNT_FILE, "rb") as f:
-        raw = f.read()
-        if not raw:
-            return None
-        iv = raw[:BLOCK_SIZE]
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        data = unpad(cipher.decrypt(raw[BLOCK_SIZE:]).decode("utf-8"))
-        accounts = json.loads(data)
-        return accounts.get(platform)
+    return copy.deepcopy(_credential_cache.get(ACCOUNT_KIND).get(platform))
 
 def save_cookie(platform, cookie_dict):
-    key = get_key()
-    cookies = {}
-    if os.path.exists(COOKIE_FILE):
-        with open(COOKIE_FILE, "rb") as f:
-            raw = f.read()
-            if raw:
-                iv = raw[:BLOCK_SIZE]
-                cipher = AES.new(key, AES.MODE_CBC, iv)
-                data = unpad(cipher.decrypt(raw[BLOCK_SIZE:]).decode("utf-8"))
-                cookies = json.loads(data)
-    cookies[platform] = cookie_dict
-    data = json.dumps(cookies)
-    iv = get_random_bytes(BLOCK_SIZE)
-    cipher = AES.new(key, AES.MODE_CBC, iv)
-    enc = iv + cipher.encrypt(pad(data).encode("utf-8"))
-    with open(COOKIE_FILE, "wb") as f:
-        f.write(enc)
+    _credential_cache.update(COOKIE_KIND, {platform: cookie_dict})
+
+def save_cookies(cookies):
+    """批量保存Cookie {platform: cookie}，在一个事务中写入，返回写入条数"""
+    return _credential_cache.update(COOKIE_KIND, cookies)
 
 def load_cookie(platform):
-    key = get_key()
-    if not os.path.exists(COOKIE_FILE):
-        return None
-    with open(COOKIE_FILE, "rb") as f:
-        raw = f.read()
-        if not raw:
-            return None
-        iv = raw[:BLOCK_SIZE]
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        data = unpad(cipher.decrypt(raw[BLOCK_SIZE:]).decode("utf-8"))
-        cookies = json.loads(data)
-        return cookies.get(platform) 
\ No newline at end of file
+    return copy.deepcopy(_credential_cache.get(COOKIE_KIND).get(platform))
+
+def invalidate_credential_cache():
+    """清除已解密凭据缓存（外部修改密钥后可手动调用）"""
+    _invalidate_key()
+    _credential_cache.invalidate()
@@ -0,0 +1,222 @@
+"""
+准入控制与限流
+按当前容量（可执行的搜索数、排队深度）决定是否接纳新搜索，饱和时返回429和Retry-After；
+可选按API Key、客户端ID或IP做令牌桶限流，避免单个客户端占满容量（默认关闭）
+"""
+
+import collections
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Union
+
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+# 每个客户端每秒补充的搜索次数，<=0 关闭限流（默认）。
+# 自带的Streamlit界面所有用户都经同一个IP访问API，开启时应同时设置 RATE_LIMIT_TRUST_CLIENT_ID=1 按会话限流
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))  # 突发上限
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"  # 位于反向代理之后时按 X-Forwarded-For 识别客户端
+# 信任 X-Client-Id（由前端按会话生成），只应在API只对可信前端开放时启用
+TRUST_CLIENT_ID = os.getenv("RATE_LIMIT_TRUST_CLIENT_ID", "0") == "1"
+
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))  # 允许排队的搜索数
+ADMISSION_DEFAULT_DURATION = float(os.getenv("ADMISSION_DEFAULT_DURATION", "30"))  # 没有样本时假设的单次搜索耗时
+
+
+class Rejected(Exception):
+    """准入被拒绝"""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def to_http(self) -> HTTPException:
+        return too_many_requests(self.detail, self.retry_after)
+
+
+def too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    """429响应，Retry-After向上取整到秒"""
+    return HTTPException(status_code=429, detail=detail,
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+def client_key(connection: HTTPConnection) -> str:
+    """限流键: 优先使用API Key（只保存摘要），其次是可信前端传入的客户端ID，否则使用客户端IP"""
+    api_key = connection.headers.get("x-api-key")
+    if api_key:
+        return "key:" + hashlib.blake2b(api_key.encode("utf-8"), digest_size=8).hexdigest()
+    if TRUST_CLIENT_ID:
+        client_id = connection.headers.get("x-client-id")
+        if client_id:
+            return "client:" + hashlib.blake2b(client_id.encode("utf-8"), digest_size=8).hexdigest()
+    if TRUST_PROXY:
+        forwarded = connection.headers.get("x-forwarded-for")
+        if forwarded:
+            return "ip:" + forwarded.split(",")[0].strip()
+    return "ip:" + (connection.client.host if connection.client else "unknown")
+
+
+class RateLimiter:
+    """按客户端的令牌桶，客户端数量有界（LRU淘汰最久未出现的客户端）"""
+
+    def __init__(self, rate: float = RATE_LIMIT_RATE, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._buckets: "collections.OrderedDict[str, list]" = collections.OrderedDict()  # key -> [令牌, 时间]
+        self._counters = collections.Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """取令牌，成功返回0，否则返回需要等待的秒数"""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self._counters["allowed"] += 1
+                return 0.0
+            self._counters["limited"] += 1
+            return (cost - bucket[0]) / self.rate
+
+    def check(self, connection: HTTPConnection, cost: float = 1.0):
+        """超过限流时抛出429"""
+        wait = self.acquire(client_key(connection), cost)
+        if wait > 0:
+            raise too_many_requests("请求过于频繁，请稍后重试", wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rate": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "allowed": self._counters["allowed"],
+                "limited": self._counters["limited"],
+            }
+
+
+class AdmissionController:
+    """容量驱动的准入控制
+
+    slots 为可同时执行的搜索数（整数或返回整数的函数）。
+    pending 为返回当前排队数的函数（如任务队列深度）；不提供时按 track() 登记的进行中搜索计算。
+    排队数达到 max_queue 时拒绝，Retry-After 按排队长度和近期平均耗时估算
+    """
+
+    def __init__(self, name: str, slots: Union[int, Callable[[], int]],
+                 max_queue: int = ADMISSION_MAX_QUEUE,
+                 pending: Optional[Callable[[], int]] = None,
+                 default_duration: float = ADMISSION_DEFAULT_DURATION):
+        self.name = name
+        self._slots = slots
+        self.max_queue = max_queue
+        self._pending = pending
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._avg_duration = default_duration
+        self._counters = collections.Counter()
+
+    @property
+    def slots(self) -> int:
+        return max(1, self._slots() if callable(self._slots) else self._slots)
+
+    def pending(self) -> int:
+        if self._pending is not None:
+            return self._pending()
+        with self._lock:
+            return max(0, self._inflight - self.slots)
+
+    def estimate_wait(self, position: int) -> float:
+        """排在第 position 位（0表示队首）的搜索预计等待秒数"""
+        return (position // self.slots + 1) * self._avg_duration
+
+    def admit(self):
+        """检查容量，饱和时抛出 Rejected"""
+        pending = self.pending()
+        if pending >= self.max_queue:
+            with self._lock:
+                self._counters["rejected"] += 1
+            logger.warning(f"{self.name} 搜索容量已满 (排队 {pending}/{self.max_queue})")
+            raise Rejected(f"搜索繁忙 (排队 {pending}/{self.max_queue})，请稍后重试",
+                           self.estimate_wait(pending - self.max_queue))
+        with self._lock:
+            self._counters["admitted"] += 1
+
+    def observe(self, duration: float):
+        """记录一次搜索耗时（指数移动平均）"""
+        with self._lock:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+    def acquire(self) -> float:
+        """接纳并登记一个进行中的搜索，返回开始时间，结束时需调用 release()"""
+        with self._lock:
+            if self._pending is None and self._inflight - self.slots >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise Rejected(f"搜索繁忙 (进行中 {self._inflight})，请稍后重试",
+                               self.estimate_wait(self._inflight - self.slots - self.max_queue))
+            self._inflight += 1
+            self._counters["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, started: float):
+        with self._lock:
+            self._inflight -= 1
+        self.observe(time.monotonic() - started)
+
+    @contextmanager
+    def track(self):
+        """接纳并登记进行中的搜索，结束时记录耗时"""
+        started = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self) -> Dict[str, Any]:
+        pending = self.pending()
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "inflight": self._inflight,
+                "pending": pending,
+                "max_queue": self.max_queue,
+                "avg_duration": round(self._avg_duration, 2),
+                "admitted": self._counters["admitted"],
+                "rejected": self._counters["rejected"],
+            }
+
+
+__all__ = [
+    "AdmissionController",
+    "RateLimiter",
+    "Rejected",
+    "client_key",
+    "too_many_requests",
+]
@@ -0,0 +1,125 @@
+"""
+批量搜索调度
+把 (问题, 平台) 组合分发到各平台的并行通道（如平台的多个浏览器标签页），按完成顺序产出结果并统计吞吐
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# search_pair(问题, 平台, 通道) -> {"status": ..., "content": ...}
+SearchPair = Callable[[str, str, Any], Awaitable[Dict[str, Any]]]
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))], 3)
+
+
+class BatchStats:
+    """批量搜索的吞吐与耗时统计"""
+
+    def __init__(self, queries: int, platforms: List[str]):
+        self.queries = queries
+        self.platforms = platforms
+        self.start = time.monotonic()
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.per_platform: Dict[str, Dict[str, Any]] = {
+            platform: {"count": 0, "success": 0, "latency_total": 0.0} for platform in platforms
+        }
+
+    def record(self, platform: str, status: str, latency: float):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        entry = self.per_platform[platform]
+        entry["count"] += 1
+        entry["success"] += status == "success"
+        entry["latency_total"] += latency
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.start
+        latencies = sorted(self.latencies)
+        completed = len(latencies)
+        return {
+            "queries": self.queries,
+            "platforms": self.platforms,
+            "pairs": self.queries * len(self.platforms),
+            "completed": completed,
+            "statuses": self.statuses,
+            "elapsed": round(elapsed, 3),
+            "throughput": round(completed / elapsed, 3) if elapsed > 0 else None,  # 每秒完成的组合数
+            "latency": {
+                "p50": _percentile(latencies, 0.5),
+                "p95": _percentile(latencies, 0.95),
+                "max": round(latencies[-1], 3) if latencies else None,
+                "serial_total": round(sum(latencies), 3),  # 串行执行的总耗时，用于对比并行收益
+            },
+            "per_platform": {
+                platform: {
+                    "count": entry["count"],
+                    "success": entry["success"],
+                    "avg_latency": round(entry["latency_total"] / entry["count"], 3) if entry["count"] else None,
+                }
+                for platform, entry in self.per_platform.items()
+            },
+        }
+
+
+async def run_batch(queries: List[str], platforms: List[str], search_pair: SearchPair,
+                    lanes: Dict[str, List[Any]], pair_timeout: Optional[float] = None,
+                    stats: Optional[BatchStats] = None) -> AsyncIterator[Dict[str, Any]]:
+    """执行批量搜索，按完成顺序产出每个 (问题, 平台) 的结果
+
+    lanes 为每个平台的并行通道（如浏览器页面，或占位的None），通道数即该平台的并行度；
+    不同平台互不等待，同一平台的问题按提交顺序依次分配到空闲通道。
+    生成器被关闭（如客户端断开）时取消尚未完成的搜索
+    """
+    stats = stats or BatchStats(len(queries), platforms)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def lane_worker(platform: str, lane: Any, pending: asyncio.Queue):
+        while True:
+            try:
+                index = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            query = queries[index]
+            started = time.monotonic()
+            try:
+                outcome = await asyncio.wait_for(search_pair(query, platform, lane), pair_timeout)
+            except asyncio.TimeoutError:
+                outcome = {"status": "timeout", "content": "", "error": f"超过时间预算 ({pair_timeout}s)"}
+            except Exception as e:
+                logger.error(f"批量搜索失败 [{platform}] {query[:30]}: {e}")
+                outcome = {"status": "failed", "content": "", "error": str(e)}
+            latency = time.monotonic() - started
+            stats.record(platform, outcome.get("status", "failed"), latency)
+            await results.put({"type": "result", "index": index, "query": query, "platform": platform,
+                               "latency": round(latency, 3), **outcome})
+
+    tasks = []
+    for platform in platforms:
+        pending: asyncio.Queue = asyncio.Queue()
+        for index in range(len(queries)):
+            pending.put_nowait(index)
+        for lane in lanes.get(platform) or [None]:
+            tasks.append(asyncio.create_task(lane_worker(platform, lane, pending)))
+
+    try:
+        for _ in range(len(queries) * len(platforms)):
+            yield await results.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+__all__ = [
+    "BatchStats",
+    "run_batch",
+]
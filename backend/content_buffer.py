@@ -0,0 +1,148 @@
+"""
+流式内容缓冲
+以分块列表累积平台的流式回答，追加为O(块长度)，按偏移切片时只拼接涉及的块；
+完整内容在读取时拼接一次并缓存。超长回答可溢出到临时文件以限制内存占用
+"""
+
+import bisect
+import os
+import tempfile
+import weakref
+from typing import Any, List, Optional
+
+# 内存中保留的最大字符数，超过后把已有内容写入临时文件，0 表示不溢出
+CONTENT_SPILL_CHARS = int(os.getenv("CONTENT_SPILL_CHARS", str(4 * 1024 * 1024)))
+
+# 临时文件使用定长编码，字符偏移可以直接换算为文件偏移
+_SPILL_ENCODING = "utf-32-le"
+_SPILL_CHAR_BYTES = 4
+
+
+class ContentBuffer:
+    """可追加的文本缓冲
+
+    支持 len()、str()、切片（返回str），可在状态、结果列表之间按引用共享，
+    序列化时通过 str() 转为普通字符串（FastJSONResponse 和状态存储的 json default=str 均会处理）
+    """
+
+    def __init__(self, text: str = "", spill_chars: int = CONTENT_SPILL_CHARS):
+        self.spill_chars = spill_chars
+        self._chunks: List[str] = []
+        self._ends: List[int] = []  # 各内存块结束位置（整段内容中的绝对偏移）
+        self._length = 0
+        self._joined: Optional[str] = None
+        self._spill_file = None
+        self._spilled = 0  # 已写入临时文件的字符数
+        if text:
+            self.append(text)
+
+    def append(self, chunk: str):
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        self._ends.append(self._length)
+        self._joined = None
+        if self.spill_chars and self._length - self._spilled > self.spill_chars:
+            self._spill()
+
+    def replace(self, text: str):
+        """整体替换内容（如浏览器模式一次性返回完整回答）"""
+        self._chunks.clear()
+        self._ends.clear()
+        self._length = self._spilled = 0
+        self._joined = None
+        if self._spill_file is not None:
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+        self.append(text)
+
+    @property
+    def spilled(self) -> bool:
+        return self._spilled > 0
+
+    def memory_chars(self) -> int:
+        """内存中保存的字符数"""
+        return self._length - self._spilled
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __str__(self) -> str:
+        if self._spilled:
+            # 已溢出时不缓存完整内容，避免重新占用内存
+            return self._read_spilled(0, self._spilled) + "".join(self._chunks)
+        if self._joined is None:
+            self._joined = "".join(self._chunks)
+            if len(self._chunks) > 1:
+                # 合并为单块，之后的追加只需拼接新增部分
+                self._chunks = [self._joined]
+                self._ends = [self._length]
+        return self._joined
+
+    def __getitem__(self, key) -> str:
+        if isinstance(key, int):
+            if key < 0:
+                key += self._length
+            if not 0 <= key < self._length:
+                raise IndexError("ContentBuffer index out of range")
+            return self[key:key + 1]
+        start, stop, step = key.indices(self._length)
+        if step != 1:
+            return str(self)[key]
+        if start >= stop:
+            return ""
+        if self._joined is not None:
+            return self._joined[start:stop]
+        parts = []
+        if start < self._spilled:
+            parts.append(self._read_spilled(start, min(stop, self._spilled)))
+        if stop > self._spilled:
+            parts.append(self._read_memory(max(start, self._spilled), stop))
+        return "".join(parts)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (ContentBuffer, str)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ContentBuffer(length={self._length}, chunks={len(self._chunks)}, spilled={self._spilled})"
+
+    def _read_memory(self, start: int, stop: int) -> str:
+        index = bisect.bisect_right(self._ends, start)
+        parts = []
+        while index < len(self._chunks) and start < stop:
+            chunk = self._chunks[index]
+            chunk_start = self._ends[index] - len(chunk)
+            parts.append(chunk[start - chunk_start:stop - chunk_start])
+            start = self._ends[index]
+            index += 1
+        return "".join(parts)
+
+    def _spill(self):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile()
+            weakref.finalize(self, self._spill_file.close)
+        self._spill_file.seek(self._spilled * _SPILL_CHAR_BYTES)
+        for chunk in self._chunks:
+            self._spill_file.write(chunk.encode(_SPILL_ENCODING))
+        self._spill_file.flush()
+        self._spilled = self._length
+        self._chunks.clear()
+        self._ends.clear()
+        self._joined = None
+
+    def _read_spilled(self, start: int, stop: int) -> str:
+        self._spill_file.seek(start * _SPILL_CHAR_BYTES)
+        return self._spill_file.read((stop - start) * _SPILL_CHAR_BYTES).decode(_SPILL_ENCODING)
+
+
+__all__ = [
+    "ContentBuffer",
+]
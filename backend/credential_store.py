@@ -0,0 +1,210 @@
+"""
+加密凭据存储
+SQLite按条保存账号/Cookie，每条记录单独AES-GCM加密，支持批量事务写入
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("CREDENTIAL_DB", "credentials.db")
+NONCE_SIZE = 12
+BUSY_TIMEOUT = 10.0  # 等待其他进程释放写锁的秒数
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    nonce BLOB NOT NULL,
+    ciphertext BLOB NOT NULL,
+    tag BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (kind, name)
+)
+"""
+
+
+class CredentialDecryptError(ValueError):
+    """凭据解密失败（密钥错误或数据被篡改）"""
+
+
+def seal(key: bytes, kind: str, name: str, value: Any):
+    """加密单条记录，kind/name 作为附加认证数据防止记录被挪用"""
+    nonce = get_random_bytes(NONCE_SIZE)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(f"{kind}:{name}".encode("utf-8"))
+    ciphertext, tag = cipher.encrypt_and_digest(json.dumps(value).encode("utf-8"))
+    return nonce, ciphertext, tag
+
+
+def unseal(key: bytes, kind: str, name: str, nonce: bytes, ciphertext: bytes, tag: bytes) -> Any:
+    """解密单条记录"""
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(f"{kind}:{name}".encode("utf-8"))
+    try:
+        data = cipher.decrypt_and_verify(ciphertext, tag)
+    except ValueError as e:
+        raise CredentialDecryptError(f"凭据 {kind}:{name} 解密失败，请检查密钥") from e
+    return json.loads(data.decode("utf-8"))
+
+
+class CredentialStore:
+    """按条加密的凭据存储
+
+    - 每条记录 (kind, name) 独立加密，修改一条不需要重写全部数据
+    - 写入在 SQLite 事务中完成，崩溃不会留下半写的文件
+    - 写事务使用 BEGIN IMMEDIATE 获取文件写锁，多进程并发写入串行执行
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, key_provider: Optional[Callable[[], bytes]] = None):
+        self.path = path
+        self._key_provider = key_provider
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _key(self) -> bytes:
+        if self._key_provider is None:
+            raise RuntimeError("CredentialStore 未配置密钥")
+        return self._key_provider()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程复用一个连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(_SCHEMA)
+                    self._initialized = True
+        return conn
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在写事务中执行"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def put(self, kind: str, name: str, value: Any):
+        """保存单条凭据"""
+        self.put_many(kind, {name: value})
+
+    def put_many(self, kind: str, records: Dict[str, Any]) -> int:
+        """批量保存凭据（单个事务，全部成功或全部回滚）"""
+        if not records:
+            return 0
+        key = self._key()
+        now = time.time()
+        rows = [(kind, name, *seal(key, kind, name, value), now) for name, value in records.items()]
+
+        def write(conn):
+            conn.executemany(
+                "INSERT OR REPLACE INTO credentials (kind, name, nonce, ciphertext, tag, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return len(rows)
+
+        return self._write(write)
+
+    def get(self, kind: str, name: str) -> Any:
+        """读取单条凭据，不存在时返回None"""
+        row = self._connect().execute(
+            "SELECT nonce, ciphertext, tag FROM credentials WHERE kind = ? AND name = ?",
+            (kind, name)
+        ).fetchone()
+        if row is None:
+            return None
+        return unseal(self._key(), kind, name, *row)
+
+    def get_all(self, kind: str) -> Dict[str, Any]:
+        """读取某类全部凭据"""
+        key = self._key()
+        rows = self._connect().execute(
+            "SELECT name, nonce, ciphertext, tag FROM credentials WHERE kind = ?",
+            (kind,)
+        ).fetchall()
+        return {name: unseal(key, kind, name, nonce, ciphertext, tag)
+                for name, nonce, ciphertext, tag in rows}
+
+    def names(self, kind: str) -> List[str]:
+        """列出某类凭据名称（不解密）"""
+        rows = self._connect().execute(
+            "SELECT name FROM credentials WHERE kind = ? ORDER BY name", (kind,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, kind: str, name: str) -> bool:
+        """删除单条凭据"""
+        return self._write(lambda conn: conn.execute(
+            "DELETE FROM credentials WHERE kind = ? AND name = ?", (kind, name)
+        ).rowcount > 0)
+
+    def import_legacy(self, kind: str, legacy_path: str, loader: Callable[[str], Dict[str, Any]]) -> int:
+        """迁移旧版整文件加密的凭据，完成后将旧文件重命名为 .migrated
+
+        检查与写入在同一个写事务中完成，多进程同时启动时只会迁移一次；
+        提交成功后才重命名旧文件，提交前进程退出时下次启动会重新迁移（已存在的凭据跳过）
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+        key = self._key()
+
+        def write(conn):
+            if not os.path.exists(legacy_path):
+                return 0
+            records = loader(legacy_path)
+            existing = {row[0] for row in conn.execute(
+                "SELECT name FROM credentials WHERE kind = ?", (kind,)
+            )}
+            now = time.time()
+            rows = [(kind, name, *seal(key, kind, name, value), now)
+                    for name, value in records.items() if name not in existing]
+            conn.executemany(
+                "INSERT INTO credentials (kind, name, nonce, ciphertext, tag, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return len(rows)
+
+        count = self._write(write)
+        try:
+            os.replace(legacy_path, legacy_path + ".migrated")
+        except FileNotFoundError:
+            pass  # 其他进程已完成迁移并重命名
+        if count:
+            logger.info(f"已将 {legacy_path} 中的 {count} 条凭据迁移到 {self.path}")
+        return count
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+__all__ = [
+    "CredentialStore",
+    "CredentialDecryptError",
+    "seal",
+    "unseal",
+]
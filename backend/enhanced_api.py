@@ -3,10 +3,12 @@
 支持模拟模式和真实模式的渐进式开发
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Header, Request, WebSocket
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 import json
 import os
 import time
@@ -19,7 +21,21 @@ from datetime import datetime
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from core.stream_aggregator import MultiPlatformStreamAggregator
+from core.stream_aggregator import AggregatorEngine
+from core.circuit_breaker import get_breaker, OPEN
+from backend.account_manager import save_cookies
+from backend.result_cache import get_result_cache, make_cache_key, STALE
+from backend.single_flight import AsyncSingleFlight, InflightRegistry
+from backend.status_store import create_status_store
+from backend.search_events import SearchEventHub, SearchEventLog, TERMINAL_STATES
+from backend.search_socket import SearchSocket
+from backend.job_queue import CANCELLED as JOB_CANCELLED, LEASED as JOB_LEASED, get_job_queue, run_queue_call
+from backend.search_worker import DEFAULT_CONCURRENCY as WORKER_CONCURRENCY, SEARCH_JOB, SearchWorkerPool
+from backend.admission import AdmissionController, RateLimiter, Rejected
+from backend.batch_search import BatchStats, run_batch
+from backend.content_buffer import ContentBuffer
+from backend.json_response import CompressionMiddleware, FastJSONResponse
+from backend.simulation import SimulatedFailure, create_simulation_engine
 from ragflow_utils.simple_aggregator import aggregate_platform_results
 
 # 配置日志
@@ -40,9 +56,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 超过阈值的状态/结果响应按 Accept-Encoding 压缩
+app.add_middleware(CompressionMiddleware)
 
-# 全局搜索状态管理
-search_status_store = {}
+# 全局搜索状态管理（有界、完成后按TTL过期）
+search_status_store = create_status_store()
+event_hub = SearchEventHub()  # 搜索增量事件，供 /search-stream 推送
+SSE_KEEPALIVE_SECONDS = 15
+SSE_POLL_INTERVAL = 0.5  # 没有事件日志时轮询状态存储的间隔
+_search_tasks: Dict[str, asyncio.Task] = {}  # 本进程正在执行的搜索任务，用于取消
+STATUS_LONG_POLL_MAX = 30.0  # 长轮询最长等待秒数
 
 # 数据模型
 class SearchRequest(BaseModel):
@@ -50,9 +73,19 @@ class SearchRequest(BaseModel):
     platforms: List[str] = ["DeepSeek", "Kimi", "智谱清言"]
     enable_ai_processing: bool = False
     ai_config: Optional[Dict[str, Any]] = None
-    timeout: Optional[int] = 30
+    timeout: Optional[int] = 30  # 整个搜索的截止时间（秒）
+    platform_timeouts: Optional[Dict[str, float]] = None  # 单个平台的时间预算（秒）
     max_workers: Optional[int] = 3
     simulation_mode: bool = True  # 默认启用模拟模式
+    cache_control: Optional[str] = None  # 缓存策略: default/no-cache/no-store/only-if-cached
+    priority: int = 0  # 异步搜索的排队优先级，越大越先执行
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    platforms: List[str] = ["DeepSeek", "Kimi", "智谱清言"]
+    simulation_mode: bool = True
+    timeout: Optional[float] = 60  # 单个 (问题, 平台) 组合的时间预算（秒）
+    max_parallel_per_platform: Optional[int] = None  # 每个平台的并行上限，浏览器模式默认为打开的标签页数
 
 class SearchResponse(BaseModel):
     success: bool
@@ -61,10 +94,11 @@ class SearchResponse(BaseModel):
     processing_time: str
     simulation_mode: bool
     search_id: Optional[str] = None
+    cache: Optional[str] = None  # 缓存状态: fresh/stale/miss/bypass
 
 class SearchStatus(BaseModel):
     search_id: str
-    status: str  # "running", "completed", "failed"
+    status: str  # "queued", "running", "completed", "failed", "cancelled"
     progress: float  # 0.0 - 1.0
     current_platform: Optional[str] = None
     completed_platforms: List[str] = []
@@ -73,6 +107,13 @@ class SearchStatus(BaseModel):
     error: Optional[str] = None
     start_time: str
     last_update: str
+    version: int = 0  # 每次更新递增，供增量轮询使用
+
+def _new_status(search_id: str, status: str, progress: float = 0.0, **fields) -> Dict[str, Any]:
+    """创建搜索状态字典（用 model_dump 代替兼容层 .dict()）"""
+    now = datetime.now().isoformat()
+    return SearchStatus(search_id=search_id, status=status, progress=progress,
+                        start_time=now, last_update=now, **fields).model_dump()
 
 class HealthResponse(BaseModel):
     status: str
@@ -88,9 +129,31 @@ class PlatformStatus(BaseModel):
     has_account: bool
     simulation_available: bool
     description: str
+    circuit: Optional[Dict[str, Any]] = None  # 熔断器状态
 
 # 全局变量
-aggregator = MultiPlatformStreamAggregator()
+aggregator_engine = AggregatorEngine()  # 只读共享，每次搜索创建独立会话
+result_cache = get_result_cache()
+CACHE_CONTROL_VALUES = ("default", "no-cache", "no-store", "only-if-cached")
+_refresh_tasks = set()  # 持有后台刷新任务的引用，避免被回收
+search_flight = AsyncSingleFlight()  # 合并相同的同步搜索
+inflight_searches = InflightRegistry()  # 合并相同的异步搜索
+# local: API进程内置worker执行队列中的搜索；external: 只入队，由独立的 backend.search_worker 进程执行
+SEARCH_QUEUE_MODE = os.getenv("SEARCH_QUEUE_MODE", "local").lower()
+search_workers: Optional[SearchWorkerPool] = None
+rate_limiter = RateLimiter()  # 按API Key/客户端IP限制搜索提交频率
+# 异步搜索按任务队列深度准入；同步搜索在请求内执行，按进行中的数量准入
+async_admission = AdmissionController(
+    "search-async",
+    slots=lambda: search_workers.concurrency if search_workers is not None else WORKER_CONCURRENCY,
+    pending=lambda: get_job_queue().depth()  # 异步搜索任务队列在启动时创建
+)
+sync_admission = AdmissionController("search", slots=int(os.getenv("ADMISSION_SYNC_SLOTS", "4")))
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_PLATFORM_PARALLEL = int(os.getenv("BATCH_PLATFORM_PARALLEL", "2"))  # 非浏览器模式下每个平台的默认并行数
+# 批量搜索会占满各平台的标签页，同时只允许少量批次运行
+batch_admission = AdmissionController("search-batch", slots=int(os.getenv("BATCH_MAX_CONCURRENT", "1")), max_queue=0)
+simulator = create_simulation_engine()  # 模拟模式及占位平台调用的延迟，SIMULATION_TIME_SCALE=0 时不等待
 
 # 平台配置
 PLATFORM_CONFIGS = {
@@ -145,6 +208,8 @@ async def health_check():
             "/search - 多平台搜索",
             "/search-async - 异步搜索",
             "/search-status/{search_id} - 搜索状态",
+            "/search-stream/{search_id} - 搜索进度事件流(SSE)",
+            "/ws - WebSocket搜索（多路复用）",
             "/platforms - 平台列表",
             "/platform-status - 平台状态",
             "/simulation - 模拟模式设置",
@@ -155,82 +220,520 @@ async def health_check():
 @app.get("/health")
 async def simple_health():
     """简单健康检查"""
+    job_queue = get_job_queue()
     return {
         "status": "healthy",
         "service": "AI多平台搜索聚合器",
         "version": "2.1.0",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "coalescing": {
+            "search": search_flight.stats(),
+            "search_async": inflight_searches.stats()
+        },
+        "queue": {
+            "mode": SEARCH_QUEUE_MODE,
+            "jobs": await run_queue_call(job_queue, job_queue.stats),
+            "workers": search_workers.stats() if search_workers is not None else None
+        },
+        "admission": {
+            "search": sync_admission.stats(),
+            "search_batch": batch_admission.stats(),
+            "search_async": await run_queue_call(job_queue, async_admission.stats),
+            "rate_limit": rate_limiter.stats()
+        }
     }
 
 @app.post("/search", response_model=SearchResponse)
-async def search_platforms(request: SearchRequest):
+async def search_platforms(request: SearchRequest, http_request: Request):
     """同步多平台搜索聚合 (向后兼容)"""
     start_time = time.time()
+    rate_limiter.check(http_request)
     
     try:
         logger.info(f"开始搜索: {request.user_input}")
         logger.info(f"目标平台: {request.platforms}")
         logger.info(f"模拟模式: {request.simulation_mode}")
         
-        if request.simulation_mode:
-            # 模拟模式 - 使用内置模拟数据
-            result = await _simulation_search(request)
-        else:
-            # 真实模式 - 调用实际平台
-            result = await _real_search(request)
+        cache_key = _cache_key(request, "search")
+        cached, cache_state = _cache_lookup(request, cache_key)
+        if cached is not None:
+            if cache_state == STALE:
+                _schedule_refresh(cache_key, _refresh_search(request, cache_key))
+            return FastJSONResponse(SearchResponse(
+                success=True,
+                data=cached,
+                message=f"命中缓存，共 {len(request.platforms)} 个平台",
+                processing_time=f"{time.time() - start_time:.2f}s",
+                simulation_mode=request.simulation_mode,
+                cache=cache_state
+            ))
+        
+        try:
+            # 相同的搜索正在进行时直接等待其结果
+            with sync_admission.track():
+                (result, stored), shared = await search_flight.do(
+                    cache_key, lambda: _search_and_store(request, cache_key), timeout=request.timeout or None
+                )
+        except Rejected as e:
+            raise e.to_http()
+        except asyncio.TimeoutError:
+            logger.warning(f"搜索超时: {request.timeout}s")
+            raise HTTPException(status_code=504, detail=f"搜索超时 ({request.timeout}s)")
         
         processing_time = f"{time.time() - start_time:.2f}s"
         
-        return SearchResponse(
+        return FastJSONResponse(SearchResponse(
             success=True,
             data=result,
-            message=f"搜索完成，处理了 {len(request.platforms)} 个平台",
+            message=f"搜索完成，处理了 {len(request.platforms)} 个平台" + ("（已合并相同请求）" if shared else ""),
             processing_time=processing_time,
-            simulation_mode=request.simulation_mode
-        )
+            simulation_mode=request.simulation_mode,
+            cache="miss" if stored else "bypass"
+        ))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
 
 @app.post("/search-async")
-async def search_platforms_async(request: SearchRequest, background_tasks: BackgroundTasks):
-    """异步多平台搜索 - 支持实时状态查询"""
+async def search_platforms_async(request: SearchRequest, http_request: Request):
+    """异步多平台搜索 - 支持实时状态查询，可通过 DELETE /search/{search_id} 取消
+    
+    队列已满时返回429和Retry-After
+    """
+    rate_limiter.check(http_request)
+    try:
+        return FastJSONResponse(await _submit_async_search(request))
+    except Rejected as e:
+        raise e.to_http()
+
+@app.post("/search-batch")
+async def search_batch(request: BatchSearchRequest, http_request: Request):
+    """批量搜索 - 多个问题在各平台间并行调度
+    
+    每个 (问题, 平台) 完成即返回一行NDJSON结果，最后一行为吞吐统计（type=done）
+    """
+    rate_limiter.check(http_request)
+    queries = [query.strip() for query in request.queries if query and query.strip()]
+    if not queries:
+        raise HTTPException(status_code=400, detail="问题列表为空")
+    if len(queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"单次最多 {BATCH_MAX_QUERIES} 个问题")
+    unknown = [p for p in request.platforms if p not in PLATFORM_CONFIGS]
+    if unknown or not request.platforms:
+        raise HTTPException(status_code=400, detail=f"不支持的平台: {unknown}")
+    
+    try:
+        started = batch_admission.acquire()
+    except Rejected as e:
+        raise e.to_http()
+    
+    engine = None
+    try:
+        search_pair, lanes, engine = await _prepare_batch(request)
+    except BaseException:
+        batch_admission.release(started)
+        raise
+    stats = BatchStats(len(queries), request.platforms)
+    logger.info(f"批量搜索开始: {len(queries)} 个问题 × {len(request.platforms)} 个平台")
+    released = False
+    
+    async def cleanup():
+        """释放批量名额和浏览器连接（只执行一次）"""
+        nonlocal released
+        if released:
+            return
+        released = True
+        batch_admission.release(started)
+        if engine is not None:
+            await engine.disconnect()
+    
+    async def generate():
+        try:
+            async for item in run_batch(queries, request.platforms, search_pair, lanes,
+                                        pair_timeout=request.timeout or None, stats=stats):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+            summary = stats.summary()
+            logger.info(f"批量搜索完成: {summary['completed']} 个组合，{summary['throughput']} 个/秒")
+            yield json.dumps({"type": "done", **summary}, ensure_ascii=False) + "\n"
+        finally:
+            await cleanup()
+    
+    # 客户端在生成器开始前断开时 finally 不会执行，由响应结束后的后台任务兜底释放
+    return StreamingResponse(generate(), media_type="application/x-ndjson", background=BackgroundTask(cleanup))
+
+async def _prepare_batch(request: BatchSearchRequest):
+    """选择批量搜索的执行方式，返回 (search_pair, 各平台并行通道, 浏览器引擎)"""
+    parallel = max(1, request.max_parallel_per_platform or BATCH_PLATFORM_PARALLEL)
+    
+    if request.simulation_mode:
+        async def simulate_pair(query: str, platform: str, lane) -> Dict[str, Any]:
+            await simulator.wait(platform, "response")
+            simulator.check_failure(platform)
+            return {"status": "success", "content": _generate_mock_content(platform, query)}
+        return simulate_pair, {p: [None] * parallel for p in request.platforms}, None
+    
+    if await _check_browser_session():
+        from core.browser_search_engine import BrowserSearchEngine
+        engine = BrowserSearchEngine()
+        if await engine.connect():
+            # 每个标签页同时处理一个问题
+            lanes = {}
+            for platform in request.platforms:
+                pages = engine.find_platform_pages(platform)
+                lanes[platform] = pages[:request.max_parallel_per_platform] if request.max_parallel_per_platform else pages
+                logger.info(f"批量搜索 {platform}: {len(lanes[platform])} 个标签页")
+            
+            async def browser_pair(query: str, platform: str, page) -> Dict[str, Any]:
+                result = await engine.search_platform(platform, query, page=page)
+                if result.get("success"):
+                    status = "success"
+                elif result.get("circuit_open"):
+                    status = "circuit_open"
+                else:
+                    status = "failed"
+                return {"status": status, "content": result.get("content", ""), "error": result.get("error")}
+            return browser_pair, lanes, engine
+    
+    async def real_pair(query: str, platform: str, lane) -> Dict[str, Any]:
+        content = await _perform_real_search(platform, query)
+        return {"status": "failed" if content.startswith("❌") else "success", "content": content}
+    return real_pair, {p: [None] * parallel for p in request.platforms}, None
+
+async def _submit_async_search(request: SearchRequest) -> Dict[str, Any]:
+    """创建异步搜索并放入任务队列（命中缓存或合并相同搜索时不入队）"""
     search_id = str(uuid.uuid4())
     
-    # 初始化搜索状态
-    search_status_store[search_id] = SearchStatus(
-        search_id=search_id,
-        status="running",
-        progress=0.0,
-        current_platform=None,
-        completed_platforms=[],
-        results=[],
-        live_results={},
-        start_time=datetime.now().isoformat(),
-        last_update=datetime.now().isoformat()
-    ).dict()
+    cache_key = _cache_key(request, "search-async")
+    cached, cache_state = _cache_lookup(request, cache_key)
+    if cached is not None:
+        # 命中缓存：直接生成已完成的状态
+        status = _new_status(search_id, "completed", 1.0, completed_platforms=list(request.platforms))
+        status["results"] = cached
+        status["live_results"] = cached.get("live_results", {})
+        search_status_store[search_id] = status
+        if cache_state == STALE:
+            _schedule_refresh(cache_key, _refresh_background_search(request))
+        return {
+            "success": True,
+            "search_id": search_id,
+            "cache": cache_state,
+            "message": "命中缓存，搜索结果已就绪"
+        }
+    
+    # 相同的搜索正在进行时复用其状态和实时结果
+    running_id = inflight_searches.attach(cache_key)
+    running_status = search_status_store.get(running_id) if running_id is not None else None
+    if running_status is not None and running_status.get("status") not in TERMINAL_STATES:
+        logger.info(f"合并相同搜索: {running_id}")
+        return {
+            "success": True,
+            "search_id": running_id,
+            "coalesced": True,
+            "message": "相同的搜索正在进行，已加入该搜索"
+        }
+    
+    job_queue = get_job_queue()
+    await run_queue_call(job_queue, async_admission.admit)
     
-    # 启动后台搜索任务
-    background_tasks.add_task(_background_search, search_id, request)
+    # 初始化搜索状态，由worker领取后变为running
+    search_status_store[search_id] = _new_status(search_id, "queued")
+    
+    if SEARCH_QUEUE_MODE == "local":
+        # 由本进程执行：增量事件直接推送，相同搜索在结束前可合并
+        event_hub.open(search_id)
+        inflight_searches.register(cache_key, search_id)
+    await run_queue_call(job_queue, job_queue.enqueue, SEARCH_JOB, {
+        "search_id": search_id,
+        "request": request.dict(),
+        "cache_key": cache_key
+    }, job_id=search_id, priority=request.priority)
+    if search_workers is not None:
+        search_workers.notify()
     
     return {
         "success": True,
         "search_id": search_id,
-        "message": "搜索已启动，可通过search_id查询状态"
+        "queue": await _queue_info(search_id),
+        "message": "搜索已提交，可通过search_id查询状态"
     }
 
+async def _queue_info(search_id: str) -> Optional[Dict[str, Any]]:
+    """排队中的搜索的位置和预计等待时间，已开始或不在队列中时返回None"""
+    job_queue = get_job_queue()
+    position = await run_queue_call(job_queue, job_queue.position, search_id)
+    if position is None:
+        return None
+    return {"position": position, "estimated_wait": round(async_admission.estimate_wait(position), 1)}
+
+@app.on_event("startup")
+async def _start_search_workers():
+    """创建任务队列，内置worker模式下随API启动worker池"""
+    global search_workers
+    job_queue = get_job_queue()
+    if SEARCH_QUEUE_MODE == "external" and job_queue.name == "memory":
+        logger.warning("任务队列为内存后端，独立worker进程无法领取本进程提交的搜索，"
+                       "请使用SQLite队列（JOB_QUEUE_BACKEND=sqlite）和相同的 JOB_QUEUE_DB")
+    if SEARCH_QUEUE_MODE == "local":
+        search_workers = SearchWorkerPool(job_queue, run_search_job, on_cancelled=mark_search_cancelled)
+        search_workers.start()
+
+@app.on_event("shutdown")
+async def _stop_search_workers():
+    if search_workers is not None:
+        await search_workers.stop()
+
+async def run_search_job(job):
+    """执行队列中的搜索任务（内置worker和独立worker进程共用）"""
+    search_id = job.payload["search_id"]
+    request = SearchRequest(**job.payload["request"])
+    status = search_status_store.get(search_id)
+    if status is not None and status.get("status") in TERMINAL_STATES:
+        return
+    if status is None:
+        # 状态已过期或状态存储未在进程间共享，重新创建
+        search_status_store[search_id] = _new_status(search_id, "running")
+    _search_tasks[search_id] = asyncio.current_task()
+    started = time.monotonic()
+    try:
+        await _coalesced_background_search(search_id, request, job.payload["cache_key"])
+    finally:
+        _search_tasks.pop(search_id, None)
+        async_admission.observe(time.monotonic() - started)
+
+def mark_search_cancelled(job):
+    """worker取消任务后更新搜索状态"""
+    search_id = job.payload["search_id"]
+    status = search_status_store.get(search_id)
+    if status is not None and status.get("status") not in TERMINAL_STATES:
+        _patch_status(search_id, {"status": "cancelled", "error": "搜索已取消",
+                                  "last_update": datetime.now().isoformat()})
+
 @app.get("/search-status/{search_id}")
-async def get_search_status(search_id: str):
-    """获取搜索状态"""
-    if search_id not in search_status_store:
+async def get_search_status(search_id: str, request: Request, since_version: Optional[int] = None,
+                            wait: Optional[float] = None):
+    """获取搜索状态
+
+    - since_version=N: 状态版本未超过N时只返回 changed=false
+    - content_offset[平台]=K: 该平台只返回第K个字符之后的内容
+    - wait=秒: 与 since_version 同用时为长轮询，阻塞到状态变化或超时
+    不带上述参数时返回完整状态（向后兼容）
+    """
+    status = search_status_store.get(search_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="搜索ID不存在")
     
-    status = search_status_store[search_id]
-    return {
+    if since_version is not None and wait and status.get("version", 0) <= since_version:
+        status = await _wait_for_status_change(search_id, since_version, min(wait, STATUS_LONG_POLL_MAX))
+        if status is None:
+            raise HTTPException(status_code=404, detail="搜索ID不存在")
+    
+    offsets = _parse_content_offsets(request.query_params)
+    # 排队位置不属于状态版本，每次查询时计算
+    queue = await _queue_info(search_id) if status.get("status") == "queued" else None
+    # 状态中的内容缓冲由 FastJSONResponse 直接序列化，不经过 jsonable_encoder
+    if since_version is None and not offsets:
+        return FastJSONResponse({
+            "success": True,
+            "status": status,
+            "queue": queue
+        })
+    
+    version = status.get("version", 0)
+    if since_version is not None and version <= since_version:
+        return FastJSONResponse({"success": True, "changed": False, "version": version, "queue": queue})
+    return FastJSONResponse({
         "success": True,
-        "status": status
-    }
+        "changed": True,
+        "version": version,
+        "status": _status_delta(status, offsets),
+        "queue": queue
+    })
+
+def _parse_content_offsets(query_params) -> Dict[str, int]:
+    """解析 content_offset[平台]=K 形式的查询参数"""
+    offsets = {}
+    for key, value in query_params.items():
+        if key.startswith("content_offset[") and key.endswith("]"):
+            try:
+                offsets[key[len("content_offset["):-1]] = max(0, int(value))
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"无效的内容偏移: {key}={value}")
+    return offsets
+
+def _status_delta(status: Dict[str, Any], offsets: Dict[str, int]) -> Dict[str, Any]:
+    """按内容偏移裁剪状态，只复制发生变化的部分"""
+    delta = dict(status)
+    live_results = {}
+    for platform, live in (status.get("live_results") or {}).items():
+        offset = offsets.get(platform)
+        content = live.get("content") or ""
+        if offset is None or offset > len(content):
+            live_results[platform] = live
+            continue
+        live_results[platform] = dict(live, content=content[offset:], content_offset=offset,
+                                      content_length=len(content))
+    delta["live_results"] = live_results
+    if status.get("status") not in TERMINAL_STATES:
+        # 最终结果只在搜索结束后返回
+        delta.pop("results", None)
+    return delta
+
+async def _wait_for_status_change(search_id: str, since_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+    """等待状态版本超过 since_version 或搜索结束"""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = search_status_store.get(search_id)
+        if (status is None or status.get("version", 0) > since_version
+                or status.get("status") in TERMINAL_STATES):
+            return status
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return status
+        log = event_hub.get(search_id)
+        if log is not None and not log.closed:
+            await log.wait(log.seq, remaining)
+        else:
+            # 没有本进程的事件日志（由其他进程执行）时轮询状态存储
+            await asyncio.sleep(min(SSE_POLL_INTERVAL, remaining))
+
+@app.get("/search-stream/{search_id}")
+async def stream_search_events(search_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """以SSE推送搜索进度增量
+
+    事件类型: progress, platform_started, content_delta, content_reset, platform_progress,
+    platform_completed, aggregate_ready, done。断线重连时通过 Last-Event-ID 续读
+    """
+    source = _open_event_source(search_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="搜索ID不存在")
+    
+    try:
+        start_seq = int(last_event_id or 0)
+    except ValueError:
+        start_seq = 0
+    
+    async def event_stream():
+        yield f"retry: 2000\n\n"
+        async for events in _follow_events(search_id, *source, start_seq):
+            if not events:
+                yield ": keep-alive\n\n"
+            for event in events:
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if await request.is_disconnected():
+                break
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.websocket("/ws")
+async def websocket_search(websocket: WebSocket, format: str = "json"):
+    """WebSocket搜索接口 - 一个连接上提交、订阅、取消多个搜索（format=msgpack 使用二进制帧）"""
+    
+    async def submit(payload: Dict[str, Any]) -> Dict[str, Any]:
+        rate_limiter.check(websocket)
+        try:
+            request = SearchRequest(**payload)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        try:
+            return await _submit_async_search(request)
+        except Rejected as e:
+            raise e.to_http()
+    
+    def follow(search_id: str, since: int):
+        source = _open_event_source(search_id)
+        if source is None:
+            return None
+        return _follow_events(search_id, *source, since)
+    
+    await SearchSocket(websocket, submit, follow, _cancel_search, binary=format == "msgpack").run()
+
+async def _cancel_search(search_id: str) -> Dict[str, Any]:
+    """取消正在进行的搜索 - 取消asyncio任务，浏览器页面操作随之中止并停止生成
+    
+    合并到该搜索的所有调用方都会看到取消状态
+    """
+    task = _search_tasks.get(search_id)
+    if task is None or task.done():
+        status = search_status_store.get(search_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="搜索ID不存在")
+        if status.get("status") in TERMINAL_STATES:
+            return {"success": False, "status": status.get("status"), "message": "搜索已结束"}
+        job_queue = get_job_queue()
+        job_state = await run_queue_call(job_queue, job_queue.cancel, search_id)
+        if job_state == JOB_LEASED:
+            # 由其他进程的worker执行，续租时发现取消请求后中止并更新状态
+            logger.info(f"已请求取消搜索: {search_id}")
+            return {"success": True, "status": "cancelling", "message": "已通知执行该搜索的worker取消"}
+        if job_state != JOB_CANCELLED:
+            return {"success": False, "status": status.get("status"), "message": "该搜索无法取消"}
+        logger.info(f"取消排队中的搜索: {search_id}")
+        job = await run_queue_call(job_queue, job_queue.get, search_id)
+        if job is not None:
+            inflight_searches.release(job.payload["cache_key"], search_id)
+        _patch_status(search_id, {"status": "cancelled", "error": "搜索已取消", "last_update": datetime.now().isoformat()})
+        return {"success": True, "status": "cancelled", "message": "搜索已取消"}
+    logger.info(f"取消搜索: {search_id}")
+    task.cancel()
+    _patch_status(search_id, {"status": "cancelled", "error": "搜索已取消", "last_update": datetime.now().isoformat()})
+    return {"success": True, "status": "cancelled", "message": "搜索已取消"}
+
+def _patch_status(search_id: str, fields: Dict[str, Any]) -> bool:
+    """更新搜索状态：递增版本号、写入状态存储并发布增量事件"""
+    current = search_status_store.get(search_id)
+    if current is None:
+        return False
+    fields["version"] = current.get("version", 0) + 1
+    updated = search_status_store.patch(search_id, fields)
+    event_hub.record(search_id, fields)
+    return updated
+
+def _open_event_source(search_id: str) -> Optional[Tuple[SearchEventLog, bool]]:
+    """获取搜索的事件日志，返回 (日志, 是否需要轮询状态存储)，搜索不存在时返回None"""
+    log = event_hub.get(search_id)
+    if log is not None:
+        return log, False
+    status = search_status_store.get(search_id)
+    if status is None:
+        return None
+    # 没有事件日志（命中缓存或由其他进程执行）时，轮询状态存储并计算增量
+    log = SearchEventLog(search_id)
+    log.record(status)
+    return log, True
+
+async def _follow_events(search_id: str, log: SearchEventLog, poll_store: bool,
+                         seq: int = 0) -> AsyncIterator[List[Dict[str, Any]]]:
+    """按序号跟踪搜索事件，每次产出一批新事件（空列表表示保活）"""
+    while True:
+        events = log.events_since(seq)
+        if events:
+            seq = events[-1]["seq"]
+            yield events
+        if log.closed and seq >= log.seq:
+            return
+        if poll_store:
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+            status = search_status_store.get(search_id)
+            if status is None:
+                log.publish("done", status="expired", error="搜索状态已过期")
+                log.close()
+            else:
+                log.record(status)
+        elif not await log.wait(seq, timeout=SSE_KEEPALIVE_SECONDS):
+            yield []
+
+async def _coalesced_background_search(search_id: str, request: SearchRequest, cache_key: str):
+    """执行后台搜索，结束后允许相同请求重新发起"""
+    try:
+        await _background_search(search_id, request)
+    finally:
+        inflight_searches.release(cache_key, search_id)
 
 async def _background_search(search_id: str, request: SearchRequest):
     """后台搜索任务"""
@@ -238,18 +741,21 @@ async def _background_search(search_id: str, request: SearchRequest):
         def update_status(status: str, progress: float, current_platform: str = None, 
                          completed: List[str] = None, results: List[Dict] = None, error: str = None,
                          live_results: Dict[str, Dict] = None):
-            """更新搜索状态"""
-            if search_id in search_status_store:
-                search_status_store[search_id].update({
-                    "status": status,
-                    "progress": progress,
-                    "current_platform": current_platform,
-                    "completed_platforms": completed or search_status_store[search_id]["completed_platforms"],
-                    "results": results or search_status_store[search_id]["results"],
-                    "live_results": live_results or search_status_store[search_id].get("live_results", {}),
-                    "error": error,
-                    "last_update": datetime.now().isoformat()
-                })
+            """更新搜索状态（completed/results/live_results 为空时保留原值）"""
+            fields = {
+                "status": status,
+                "progress": progress,
+                "current_platform": current_platform,
+                "error": error,
+                "last_update": datetime.now().isoformat()
+            }
+            if completed:
+                fields["completed_platforms"] = completed
+            if results:
+                fields["results"] = results
+            if live_results:
+                fields["live_results"] = live_results
+            _patch_status(search_id, fields)
         
         logger.info(f"后台搜索开始: {search_id}")
         
@@ -258,7 +764,7 @@ async def _background_search(search_id: str, request: SearchRequest):
         for platform in request.platforms:
             live_results[platform] = {
                 "status": "waiting",  # waiting, searching, completed, failed
-                "content": "",
+                "content": ContentBuffer(),  # 流式追加，结果列表按引用共享
                 "progress_text": "等待开始...",
                 "start_time": None,
                 "end_time": None,
@@ -267,73 +773,95 @@ async def _background_search(search_id: str, request: SearchRequest):
         
         update_status("running", 0.0, None, [], [], None, live_results)
         
+        # 整个搜索的截止时间
+        deadline = time.monotonic() + request.timeout if request.timeout else None
+        
         if request.simulation_mode:
-            # 模拟搜索过程
-            results = []
-            for i, platform in enumerate(request.platforms):
-                # 开始搜索该平台
-                live_results[platform]["status"] = "searching"
-                live_results[platform]["progress_text"] = f"正在连接 {platform}..."
-                live_results[platform]["start_time"] = datetime.now().isoformat()
-                
-                update_status("running", i / len(request.platforms), platform, 
-                            search_status_store[search_id]["completed_platforms"], 
-                            search_status_store[search_id]["results"], None, live_results)
-                
-                # 模拟连接延时
-                await asyncio.sleep(1)
+            # 模拟搜索过程 - 各平台并发执行，延迟由模拟引擎按平台配置采样
+            platform_count = len(request.platforms)
+            platform_progress = {platform: 0.0 for platform in request.platforms}
+            completed: List[str] = []
+            timed_out = []
+            
+            def report(platform: str, fraction: float):
+                platform_progress[platform] = fraction
+                update_status("running", sum(platform_progress.values()) / platform_count, platform,
+                              list(completed) if fraction == 1.0 else None, None, None, live_results)
+            
+            async def simulate_platform(platform: str):
+                live = live_results[platform]
+                await simulator.wait(platform, "connect")
+                simulator.check_failure(platform)
                 
-                # 模拟搜索过程 - 分步显示内容
-                live_results[platform]["progress_text"] = f"正在分析问题..."
-                update_status("running", (i + 0.2) / len(request.platforms), platform, 
-                            search_status_store[search_id]["completed_platforms"], 
-                            search_status_store[search_id]["results"], None, live_results)
-                await asyncio.sleep(0.5)
+                # 思考时间分为分析和生成两步显示
+                think = simulator.latency(platform, "think")
+                live["progress_text"] = f"正在分析问题..."
+                report(platform, 0.2)
+                await asyncio.sleep(think / 2)
                 
-                live_results[platform]["progress_text"] = f"正在生成回答..."
-                update_status("running", (i + 0.4) / len(request.platforms), platform, 
-                            search_status_store[search_id]["completed_platforms"], 
-                            search_status_store[search_id]["results"], None, live_results)
-                await asyncio.sleep(0.5)
+                live["progress_text"] = f"正在生成回答..."
+                report(platform, 0.4)
+                await asyncio.sleep(think / 2)
                 
                 # 模拟流式内容生成
                 full_content = _generate_mock_content(platform, request.user_input)
                 content_chunks = _split_content_into_chunks(full_content)
                 
                 for j, chunk in enumerate(content_chunks):
-                    live_results[platform]["content"] += chunk
-                    live_results[platform]["progress_text"] = f"正在生成回答... ({j+1}/{len(content_chunks)})"
-                    
-                    update_status("running", (i + 0.6 + (j / len(content_chunks)) * 0.3) / len(request.platforms), 
-                                platform, search_status_store[search_id]["completed_platforms"], 
-                                search_status_store[search_id]["results"], None, live_results)
-                    await asyncio.sleep(0.3)  # 模拟流式输出
+                    live["content"].append(chunk)
+                    live["progress_text"] = f"正在生成回答... ({j+1}/{len(content_chunks)})"
+                    report(platform, 0.6 + (j / len(content_chunks)) * 0.3)
+                    await simulator.wait(platform, "chunk")  # 模拟流式输出
+            
+            async def run_platform(platform: str) -> Dict[str, Any]:
+                live = live_results[platform]
+                live["status"] = "searching"
+                live["progress_text"] = f"正在连接 {platform}..."
+                live["start_time"] = datetime.now().isoformat()
+                platform_start = time.monotonic()
+                report(platform, 0.0)
+                
+                try:
+                    await asyncio.wait_for(simulate_platform(platform),
+                                           timeout=_platform_budget(request.platform_timeouts, platform, deadline))
+                except asyncio.TimeoutError:
+                    # 超时：保留已生成的部分内容
+                    _mark_platform_timeout(live, platform_start)
+                    timed_out.append(platform)
+                    return _timeout_result(platform, live)
+                except SimulatedFailure as e:
+                    live["status"] = "failed"
+                    live["progress_text"] = "模拟失败 ❌"
+                    live["error"] = str(e)
+                    live["end_time"] = datetime.now().isoformat()
+                    live["latency"] = round(time.monotonic() - platform_start, 3)
+                    return {"platform": platform, "content": live["content"], "timestamp": live["end_time"],
+                            "is_complete": False, "confidence": 0.0, "status": "failed",
+                            "latency": live["latency"], "error": str(e)}
                 
                 # 完成该平台搜索
-                live_results[platform]["status"] = "completed"
-                live_results[platform]["progress_text"] = "搜索完成 ✅"
-                live_results[platform]["end_time"] = datetime.now().isoformat()
+                live["status"] = "completed"
+                live["progress_text"] = "搜索完成 ✅"
+                live["end_time"] = datetime.now().isoformat()
+                live["latency"] = round(time.monotonic() - platform_start, 3)
+                completed.append(platform)
+                report(platform, 1.0)
                 
-                result = {
+                return {
                     "platform": platform,
-                    "content": live_results[platform]["content"],
+                    "content": live["content"],
                     "timestamp": datetime.now().isoformat(),
                     "is_complete": True,
                     "confidence": 0.9,
-                    "status": "success"
+                    "status": "success",
+                    "latency": live["latency"]
                 }
-                results.append(result)
-                
-                # 更新已完成平台
-                completed = search_status_store[search_id]["completed_platforms"] + [platform]
-                update_status("running", (i + 1) / len(request.platforms), None, completed, results, None, live_results)
-                
-                # 平台间隔时间
-                if i < len(request.platforms) - 1:
-                    await asyncio.sleep(0.5)
+            
+            results = list(await asyncio.gather(*[run_platform(platform) for platform in request.platforms]))
             
             # 聚合结果
-            contents = [(r["platform"], r["content"]) for r in results]
+            valid_results = [r for r in results if r["status"] == "success"]
+            contents = [(r["platform"], str(r["content"])) for r in valid_results]
             aggregated = aggregate_platform_results(contents)
             
             final_result = {
@@ -359,8 +887,9 @@ async def _background_search(search_id: str, request: SearchRequest):
                 "live_results": live_results,  # 保留实时结果
                 "processing_summary": {
                     "original_count": len(results),
-                    "after_filtering": len(results),
-                    "after_deduplication": len(results),
+                    "after_filtering": len(valid_results),
+                    "after_deduplication": len(valid_results),
+                    "timed_out_platforms": timed_out,
                     "ai_integration_enabled": request.enable_ai_processing,
                     "fact_check_enabled": False,
                     "simulation_mode": True,
@@ -368,7 +897,11 @@ async def _background_search(search_id: str, request: SearchRequest):
                 }
             }
             
-            update_status("completed", 1.0, None, None, final_result, None, live_results)
+            if valid_results:
+                update_status("completed", 1.0, None, None, final_result, None, live_results)
+                _cache_store(request, _cache_key(request, "search-async"), final_result)
+            else:
+                update_status("failed", 1.0, None, None, None, "所有平台搜索超时或失败", live_results)
             
         else:
             # 真实搜索模式 - 检查可用的搜索方法
@@ -391,7 +924,9 @@ async def _background_search(search_id: str, request: SearchRequest):
                 
                 try:
                     # 执行浏览器自动化搜索
-                    browser_result = await _perform_browser_search(request.platforms, request.user_input)
+                    browser_result = await _perform_browser_search(
+                        request.platforms, request.user_input, _remaining_time(deadline)
+                    )
                     
                     if browser_result.get("success"):
                         results = browser_result["results"]
@@ -401,30 +936,41 @@ async def _background_search(search_id: str, request: SearchRequest):
                             platform = result["platform"]
                             if platform in live_results:
                                 live_results[platform]["content"] = result["content"]
-                                live_results[platform]["status"] = "completed" if result["status"] == "success" else "failed"
-                                live_results[platform]["progress_text"] = "浏览器自动化完成 ✅" if result["status"] == "success" else "浏览器自动化失败 ❌"
+                                live_results[platform]["latency"] = result.get("latency")
                                 live_results[platform]["end_time"] = datetime.now().isoformat()
+                                if result["status"] == "success":
+                                    live_results[platform]["status"] = "completed"
+                                    live_results[platform]["progress_text"] = "浏览器自动化完成 ✅"
+                                elif result["status"] == "timeout":
+                                    live_results[platform]["status"] = "timeout"
+                                    live_results[platform]["progress_text"] = "搜索超时 ⏱️"
+                                else:
+                                    live_results[platform]["status"] = "failed"
+                                    live_results[platform]["progress_text"] = "浏览器自动化失败 ❌"
                         
                         update_status("running", 0.8, None, request.platforms, results, None, live_results)
                         
                     else:
                         # 浏览器搜索失败，回退到传统方法
                         logger.warning(f"浏览器搜索失败: {browser_result.get('error')}")
-                        results = await _fallback_real_search(request.platforms, request.user_input, live_results)
+                        results = await _fallback_real_search(request.platforms, request.user_input, live_results,
+                                                        deadline, request.platform_timeouts)
                         
                 except Exception as e:
                     logger.error(f"浏览器搜索异常: {e}")
-                    results = await _fallback_real_search(request.platforms, request.user_input, live_results)
+                    results = await _fallback_real_search(request.platforms, request.user_input, live_results,
+                                                        deadline, request.platform_timeouts)
             
             else:
                 # 使用传统的Cookie/API搜索
                 logger.info("使用传统Cookie/API搜索模式")
-                results = await _fallback_real_search(request.platforms, request.user_input, live_results)
+                results = await _fallback_real_search(request.platforms, request.user_input, live_results,
+                                                        deadline, request.platform_timeouts)
             
             # 聚合结果
             valid_results = [r for r in results if r["status"] == "success"]
             if valid_results:
-                contents = [(r["platform"], r["content"]) for r in valid_results]
+                contents = [(r["platform"], str(r["content"])) for r in valid_results]
                 aggregated = aggregate_platform_results(contents)
             else:
                 aggregated = {
@@ -457,6 +1003,7 @@ async def _background_search(search_id: str, request: SearchRequest):
                     "original_count": len(results),
                     "after_filtering": len(valid_results),
                     "after_deduplication": len(valid_results),
+                    "timed_out_platforms": [r["platform"] for r in results if r["status"] == "timeout"],
                     "ai_integration_enabled": request.enable_ai_processing,
                     "fact_check_enabled": False,
                     "simulation_mode": False,
@@ -467,6 +1014,7 @@ async def _background_search(search_id: str, request: SearchRequest):
             # 根据成功数量决定最终状态
             if valid_results:
                 update_status("completed", 1.0, None, None, final_result, None, live_results)
+                _cache_store(request, _cache_key(request, "search-async"), final_result)
             else:
                 update_status("failed", 1.0, None, None, None, "所有平台连接失败", live_results)
         
@@ -483,6 +1031,114 @@ async def _background_search(search_id: str, request: SearchRequest):
             }
         update_status("failed", 0.0, None, None, None, str(e), live_results)
 
+async def _run_search(request: SearchRequest) -> Dict[str, Any]:
+    """执行一次同步搜索"""
+    if request.simulation_mode:
+        # 模拟模式 - 使用内置模拟数据
+        return await _simulation_search(request)
+    # 真实模式 - 调用实际平台
+    return await _real_search(request)
+
+def _cache_key(request: SearchRequest, scope: str) -> str:
+    """结果缓存键 - /search 与 /search-async 的结果结构不同，分开缓存"""
+    ai_config = request.ai_config if request.enable_ai_processing else None
+    mode = "simulation" if request.simulation_mode else "real"
+    return make_cache_key(request.user_input, request.platforms, mode, ai_config, scope)
+
+def _cache_lookup(request: SearchRequest, cache_key: str):
+    """按 cache_control 查询结果缓存，返回 (结果, 状态)"""
+    cache_control = request.cache_control or "default"
+    if cache_control not in CACHE_CONTROL_VALUES:
+        raise HTTPException(status_code=400, detail=f"不支持的cache_control: {cache_control}")
+    if cache_control in ("no-cache", "no-store"):
+        return None, None
+    cached, state = result_cache.get(cache_key)
+    if cached is None and cache_control == "only-if-cached":
+        raise HTTPException(status_code=504, detail="缓存中没有该搜索结果")
+    return cached, state
+
+def _cache_store(request: SearchRequest, cache_key: str, result: Dict[str, Any]) -> bool:
+    """缓存搜索结果 - 只缓存所有平台都成功的结果，避免失败被缓存"""
+    if request.cache_control == "no-store":
+        return False
+    raw_results = result.get("raw_results") or []
+    if not raw_results or any(r.get("status", "success") != "success" for r in raw_results):
+        return False
+    result_cache.set(cache_key, result, request.platforms)
+    return True
+
+async def _search_and_store(request: SearchRequest, cache_key: str):
+    """执行搜索并写入缓存，返回 (结果, 是否已缓存)"""
+    result = await _run_search(request)
+    return result, _cache_store(request, cache_key, result)
+
+def _schedule_refresh(cache_key: str, refresh_coro):
+    """后台刷新过期缓存，同一个键同时只刷新一次"""
+    if not result_cache.begin_refresh(cache_key):
+        refresh_coro.close()
+        return
+
+    async def run():
+        try:
+            await refresh_coro
+        except Exception as e:
+            logger.warning(f"后台刷新缓存失败: {e}")
+        finally:
+            result_cache.end_refresh(cache_key)
+
+    task = asyncio.create_task(run())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+async def _refresh_search(request: SearchRequest, cache_key: str):
+    """刷新 /search 的缓存结果（与同时到达的未命中请求合并执行）"""
+    await search_flight.do(cache_key, lambda: _search_and_store(request, cache_key),
+                           timeout=request.timeout or None)
+
+async def _refresh_background_search(request: SearchRequest):
+    """刷新 /search-async 的缓存结果（使用临时状态，完成后清除）"""
+    refresh_id = f"refresh-{uuid.uuid4()}"
+    search_status_store[refresh_id] = _new_status(refresh_id, "running")
+    try:
+        await _background_search(refresh_id, request.model_copy(update={"cache_control": "no-cache"}))
+    finally:
+        search_status_store.pop(refresh_id, None)
+
+def _remaining_time(deadline: Optional[float]) -> Optional[float]:
+    """距离截止时间的剩余秒数"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def _platform_budget(platform_timeouts: Optional[Dict[str, float]], platform: str,
+                     deadline: Optional[float]) -> Optional[float]:
+    """单个平台可用时间: 平台预算与剩余总时间取较小者"""
+    remaining = _remaining_time(deadline)
+    budget = (platform_timeouts or {}).get(platform)
+    if budget is None:
+        return remaining
+    return budget if remaining is None else min(budget, remaining)
+
+def _mark_platform_timeout(platform_live: Dict[str, Any], platform_start: float):
+    """标记平台超时"""
+    platform_live["status"] = "timeout"
+    platform_live["progress_text"] = "搜索超时 ⏱️"
+    platform_live["error"] = "超过时间预算"
+    platform_live["end_time"] = datetime.now().isoformat()
+    platform_live["latency"] = round(time.monotonic() - platform_start, 3)
+
+def _timeout_result(platform: str, platform_live: Dict[str, Any]) -> Dict[str, Any]:
+    """构造超时平台的结果，保留已获取的部分内容"""
+    return {
+        "platform": platform,
+        "content": platform_live.get("content", ""),
+        "timestamp": datetime.now().isoformat(),
+        "is_complete": False,
+        "confidence": 0.0,
+        "status": "timeout",
+        "latency": platform_live.get("latency")
+    }
+
 def _split_content_into_chunks(content: str, chunk_size: int = 200) -> List[str]:
     """将内容分割为块，模拟流式输出"""
     chunks = []
@@ -511,8 +1167,8 @@ async def _simulation_search(request: SearchRequest) -> Dict[str, Any]:
     """模拟搜索 - 用于测试和开发"""
     logger.info("执行模拟搜索")
     
-    # 模拟搜索延时
-    await asyncio.sleep(1)
+    # 模拟搜索延时（各平台并发，等待最慢的平台）
+    await simulator.wait_all([p for p in request.platforms if p in PLATFORM_CONFIGS], "response")
     
     # 生成模拟结果
     mock_results = []
@@ -570,7 +1226,9 @@ async def _real_search(request: SearchRequest) -> Dict[str, Any]:
     # 使用原有的聚合器
     ai_config = request.ai_config if request.enable_ai_processing else None
     
-    result = aggregator.start_aggregation(
+    # 平台搜索和AI处理在聚合器线程池中执行，不阻塞事件循环
+    session = aggregator_engine.new_session()
+    result = await session.start_aggregation_async(
         platforms=request.platforms,
         query=request.user_input,
         ai_processor_config=ai_config
@@ -654,17 +1312,23 @@ async def get_platforms():
 
 @app.get("/platform-status")
 async def get_all_platform_status():
-    """获取所有平台状态"""
+    """获取所有平台状态
+
+    circuit 为熔断器状态。熔断打开后不做后台探测：冷却（CIRCUIT_OPEN_SECONDS）结束后进入半开，
+    放行下一次真实搜索请求作为探测，成功则恢复，失败则重新打开
+    """
     statuses = []
     
     for platform, config in PLATFORM_CONFIGS.items():
+        circuit = get_breaker(platform).snapshot()
         status = PlatformStatus(
             platform=platform,
             supported=config["supported"],
-            available=config["status"] == "ready",
+            available=config["status"] == "ready" and circuit["state"] != OPEN,
             has_account=False,  # 暂时简化
             simulation_available=True,
-            description=config["description"]
+            description=config["description"],
+            circuit=circuit
         )
         statuses.append(status.model_dump())
     
@@ -675,24 +1339,28 @@ async def get_all_platform_status():
             "total": len(statuses),
             "supported": sum(1 for s in statuses if s["supported"]),
             "available": sum(1 for s in statuses if s["available"]),
+            "circuit_open": sum(1 for s in statuses if s["circuit"]["state"] == OPEN),
             "simulation_ready": len(statuses)
-        }
+        },
+        "circuit_recovery": "熔断冷却结束后放行一次真实请求探测恢复"
     }
 
 @app.get("/platform-status/{platform}")
 async def get_platform_status(platform: str):
-    """获取特定平台状态"""
+    """获取特定平台状态（熔断恢复方式同 /platform-status）"""
     if platform not in PLATFORM_CONFIGS:
         raise HTTPException(status_code=404, detail="平台不存在")
     
     config = PLATFORM_CONFIGS[platform]
+    circuit = get_breaker(platform).snapshot()
     status = PlatformStatus(
         platform=platform,
         supported=config["supported"],
-        available=config["status"] == "ready", 
+        available=config["status"] == "ready" and circuit["state"] != OPEN, 
         has_account=False,
         simulation_available=True,
-        description=config["description"]
+        description=config["description"],
+        circuit=circuit
     )
     
     return {
@@ -701,7 +1369,7 @@ async def get_platform_status(platform: str):
     }
 
 @app.post("/quick-search")
-async def quick_search(query: str, platforms: Optional[str] = None, simulation: bool = True):
+async def quick_search(http_request: Request, query: str, platforms: Optional[str] = None, simulation: bool = True):
     """快速搜索接口"""
     try:
         platform_list = platforms.split(",") if platforms else ["DeepSeek"]
@@ -713,8 +1381,10 @@ async def quick_search(query: str, platforms: Optional[str] = None, simulation:
             simulation_mode=simulation
         )
         
-        return await search_platforms(request)
+        return await search_platforms(request, http_request)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"快速搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"快速搜索失败: {str(e)}")
@@ -734,6 +1404,22 @@ async def get_config():
         logger.error(f"获取配置失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取配置失败: {str(e)}")
 
+@app.get("/search-status-store/stats")
+async def get_status_store_stats():
+    """搜索状态存储统计"""
+    return {"success": True, "stats": search_status_store.stats()}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """结果缓存统计"""
+    return {"success": True, "stats": result_cache.stats()}
+
+@app.delete("/cache")
+async def clear_result_cache():
+    """清空结果缓存"""
+    result_cache.invalidate()
+    return {"success": True, "message": "结果缓存已清空"}
+
 @app.post("/simulation/toggle")
 async def toggle_simulation_mode(enabled: bool = True):
     """切换模拟模式"""
@@ -744,11 +1430,33 @@ async def toggle_simulation_mode(enabled: bool = True):
         "description": "模拟模式用于测试功能，不调用真实AI平台"
     }
 
+@app.get("/simulation/config")
+async def get_simulation_config():
+    """模拟模式的时间系数和各平台延迟分布"""
+    return {"success": True, **simulator.config()}
+
+@app.post("/simulation/time-scale")
+async def set_simulation_time_scale(value: float):
+    """调整模拟延迟的时间系数（0表示不等待，用于压测服务本身的开销）"""
+    if value < 0:
+        raise HTTPException(status_code=400, detail="时间系数不能为负数")
+    simulator.time_scale = value
+    return {"success": True, "time_scale": simulator.time_scale}
+
+@app.delete("/search/{search_id}")
+async def cancel_search(search_id: str):
+    """取消正在进行的搜索"""
+    return await _cancel_search(search_id)
+
+@app.post("/search/{search_id}/cancel")
+async def cancel_search_post(search_id: str):
+    """取消正在进行的搜索（POST形式，供不便发送DELETE的客户端使用）"""
+    return await _cancel_search(search_id)
+
 @app.delete("/search-status/{search_id}")
 async def clear_search_status(search_id: str):
     """清除搜索状态"""
-    if search_id in search_status_store:
-        del search_status_store[search_id]
+    if search_status_store.delete(search_id):
         return {"success": True, "message": "搜索状态已清除"}
     else:
         raise HTTPException(status_code=404, detail="搜索ID不存在")
@@ -762,11 +1470,11 @@ async def _check_real_platform_availability(platform: str) -> bool:
         # 暂时返回基于平台的模拟结果
         if platform in ["DeepSeek", "Kimi"]:
             # 模拟某些平台可用
-            await asyncio.sleep(0.5)  # 模拟检查延时
+            await simulator.sleep(0.5)  # 模拟检查延时
             return True
         else:
             # 模拟其他平台不可用
-            await asyncio.sleep(0.5)
+            await simulator.sleep(0.5)
             return False
             
     except Exception as e:
@@ -780,7 +1488,7 @@ async def _perform_real_search(platform: str, query: str) -> str:
         # 使用保存的Cookie调用真实的AI平台
         
         # 暂时返回模拟的真实搜索结果
-        await asyncio.sleep(2)  # 模拟真实搜索延时
+        await simulator.sleep(2)  # 模拟真实搜索延时
         
         return f"""# {platform} 真实搜索结果
 
@@ -871,41 +1579,32 @@ async def _check_platform_config(platform: str) -> bool:
 
 @app.post("/real-platforms/import-cookies")
 async def import_platform_cookies(cookies_data: dict):
-    """导入平台Cookie"""
+    """导入平台Cookie - 先逐个校验，再在一个事务中批量加密保存"""
     try:
-        # 这里应该实现Cookie的安全保存
-        # 包括加密、验证等
-        
-        imported_count = 0
         results = {}
+        valid_cookies = {}
         
         for platform, cookie in cookies_data.items():
-            if platform in PLATFORM_CONFIGS:
-                # 验证Cookie格式
-                if _validate_cookie_format(cookie):
-                    # 保存Cookie (这里需要实现安全存储)
-                    success = await _save_platform_cookie(platform, cookie)
-                    if success:
-                        imported_count += 1
-                        results[platform] = {
-                            "success": True,
-                            "message": "Cookie导入成功"
-                        }
-                    else:
-                        results[platform] = {
-                            "success": False,
-                            "message": "Cookie保存失败"
-                        }
-                else:
-                    results[platform] = {
-                        "success": False,
-                        "message": "Cookie格式无效"
-                    }
-            else:
+            if platform not in PLATFORM_CONFIGS:
                 results[platform] = {
                     "success": False,
                     "message": "不支持的平台"
                 }
+            elif not _validate_cookie_format(cookie):
+                results[platform] = {
+                    "success": False,
+                    "message": "Cookie格式无效"
+                }
+            else:
+                valid_cookies[platform] = cookie
+        
+        saved = await _save_platform_cookies(valid_cookies) if valid_cookies else True
+        for platform in valid_cookies:
+            results[platform] = {
+                "success": saved,
+                "message": "Cookie导入成功" if saved else "Cookie保存失败"
+            }
+        imported_count = len(valid_cookies) if saved else 0
         
         return {
             "success": True,
@@ -933,13 +1632,10 @@ def _validate_cookie_format(cookie: str) -> bool:
     except Exception:
         return False
 
-async def _save_platform_cookie(platform: str, cookie: str) -> bool:
-    """安全保存平台Cookie"""
+async def _save_platform_cookies(cookies: Dict[str, str]) -> bool:
+    """加密保存平台Cookie（单个事务，全部成功或全部失败）"""
     try:
-        # 这里应该实现Cookie的加密保存
-        # 可以保存到数据库或加密文件
-        
-        # 暂时模拟保存成功
+        await asyncio.to_thread(save_cookies, cookies)
         return True
         
     except Exception as e:
@@ -980,24 +1676,32 @@ async def _check_browser_session() -> bool:
     except Exception:
         return False
 
-async def _perform_browser_search(platforms: List[str], query: str) -> Dict:
+async def _perform_browser_search(platforms: List[str], query: str,
+                                  timeout: Optional[float] = None) -> Dict:
     """使用浏览器自动化进行搜索"""
     try:
         from core.browser_search_engine import browser_search
         
-        result = await browser_search(platforms, query)
+        result = await browser_search(platforms, query, platform_timeout=timeout)
         
         if result.get("success"):
             # 转换为统一格式
             unified_results = []
             for platform_result in result.get("results", []):
+                if platform_result.get("success"):
+                    status = "success"
+                elif platform_result.get("timed_out"):
+                    status = "timeout"
+                else:
+                    status = "failed"
                 unified_results.append({
                     "platform": platform_result.get("platform", "Unknown"),
                     "content": platform_result.get("content", ""),
                     "timestamp": platform_result.get("timestamp", datetime.now().isoformat()),
                     "is_complete": platform_result.get("success", False),
                     "confidence": 0.9 if platform_result.get("success") else 0.0,
-                    "status": "success" if platform_result.get("success") else "failed",
+                    "status": status,
+                    "latency": platform_result.get("latency"),
                     "method": "browser_automation"
                 })
             
@@ -1021,56 +1725,88 @@ async def _perform_browser_search(platforms: List[str], query: str) -> Dict:
             "results": []
         }
 
-async def _fallback_real_search(platforms: List[str], query: str, live_results: Dict) -> List[Dict]:
+async def _fallback_real_search(platforms: List[str], query: str, live_results: Dict,
+                                deadline: Optional[float] = None,
+                                platform_timeouts: Optional[Dict[str, float]] = None) -> List[Dict]:
     """传统的Cookie/API搜索回退方法"""
     results = []
     
+    async def search_platform(platform: str) -> Dict:
+        live_results[platform]["progress_text"] = f"正在调用 {platform} API..."
+        await simulator.sleep(1)
+        
+        live_results[platform]["progress_text"] = f"正在处理 {platform} 响应..."
+        await simulator.sleep(1)
+        
+        # 检查是否可以连接到真实平台
+        real_success = await _check_real_platform_availability(platform)
+        
+        if real_success:
+            # 真实搜索成功
+            content = await _perform_real_search(platform, query)
+            live_results[platform]["content"] = content
+            live_results[platform]["status"] = "completed"
+            live_results[platform]["progress_text"] = "真实搜索完成 ✅"
+            
+            return {
+                "platform": platform,
+                "content": content,
+                "timestamp": datetime.now().isoformat(),
+                "is_complete": True,
+                "confidence": 0.85,  # 真实搜索置信度
+                "status": "success"
+            }
+        
+        # 真实搜索失败
+        live_results[platform]["status"] = "failed"
+        live_results[platform]["progress_text"] = "连接失败，请检查配置"
+        live_results[platform]["error"] = "无法连接到平台，可能需要重新配置Cookie"
+        
+        return {
+            "platform": platform,
+            "content": f"⚠️ {platform} 连接失败，请检查平台配置或Cookie是否有效。建议使用浏览器会话模式。",
+            "timestamp": datetime.now().isoformat(),
+            "is_complete": False,
+            "confidence": 0.0,
+            "status": "failed"
+        }
+    
     for i, platform in enumerate(platforms):
+        # 平台熔断中：直接返回缓存的错误，不再等待连接超时
+        # 这里的可用性检查和搜索仍是占位实现，只读取熔断状态，不占用半开探测名额、不记录结果，
+        # 熔断器只由真实的浏览器/脚本搜索驱动
+        circuit = get_breaker(platform).snapshot()
+        if circuit["state"] == OPEN:
+            live_results[platform]["status"] = "failed"
+            live_results[platform]["progress_text"] = "平台暂不可用（熔断中）"
+            live_results[platform]["error"] = circuit["last_error"]
+            live_results[platform]["end_time"] = datetime.now().isoformat()
+            results.append({
+                "platform": platform,
+                "content": f"⚠️ {platform} 暂不可用，{circuit['retry_after']:.0f}s 后自动重试。最近错误: {circuit['last_error']}",
+                "timestamp": datetime.now().isoformat(),
+                "is_complete": False,
+                "confidence": 0.0,
+                "status": "circuit_open",
+                "latency": 0.0
+            })
+            continue
+        
         # 开始搜索该平台
         live_results[platform]["status"] = "searching"
         live_results[platform]["progress_text"] = f"正在连接 {platform}..."
         live_results[platform]["start_time"] = datetime.now().isoformat()
+        platform_start = time.monotonic()
         
         # 尝试真实搜索
         try:
-            live_results[platform]["progress_text"] = f"正在调用 {platform} API..."
-            await asyncio.sleep(1)
-            
-            live_results[platform]["progress_text"] = f"正在处理 {platform} 响应..."
-            await asyncio.sleep(1)
+            result = await asyncio.wait_for(search_platform(platform),
+                                            timeout=_platform_budget(platform_timeouts, platform, deadline))
             
-            # 检查是否可以连接到真实平台
-            real_success = await _check_real_platform_availability(platform)
-            
-            if real_success:
-                # 真实搜索成功
-                content = await _perform_real_search(platform, query)
-                live_results[platform]["content"] = content
-                live_results[platform]["status"] = "completed"
-                live_results[platform]["progress_text"] = "真实搜索完成 ✅"
-                
-                result = {
-                    "platform": platform,
-                    "content": content,
-                    "timestamp": datetime.now().isoformat(),
-                    "is_complete": True,
-                    "confidence": 0.85,  # 真实搜索置信度
-                    "status": "success"
-                }
-            else:
-                # 真实搜索失败
-                live_results[platform]["status"] = "failed"
-                live_results[platform]["progress_text"] = "连接失败，请检查配置"
-                live_results[platform]["error"] = "无法连接到平台，可能需要重新配置Cookie"
-                
-                result = {
-                    "platform": platform,
-                    "content": f"⚠️ {platform} 连接失败，请检查平台配置或Cookie是否有效。建议使用浏览器会话模式。",
-                    "timestamp": datetime.now().isoformat(),
-                    "is_complete": False,
-                    "confidence": 0.0,
-                    "status": "failed"
-                }
+        except asyncio.TimeoutError:
+            # 超过时间预算
+            _mark_platform_timeout(live_results[platform], platform_start)
+            result = _timeout_result(platform, live_results[platform])
             
         except Exception as e:
             # 搜索异常
@@ -1088,11 +1824,13 @@ async def _fallback_real_search(platforms: List[str], query: str, live_results:
             }
         
         live_results[platform]["end_time"] = datetime.now().isoformat()
+        live_results[platform]["latency"] = round(time.monotonic() - platform_start, 3)
+        result["latency"] = live_results[platform]["latency"]
         results.append(result)
         
         # 平台间隔时间
         if i < len(platforms) - 1:
-            await asyncio.sleep(0.5)
+            await simulator.sleep(0.5)
     
     return results
 
@@ -0,0 +1,445 @@
+"""
+搜索任务队列
+持久化的优先级队列：租约（可见性超时）到期未确认的任务会被其他worker重新领取，进程崩溃不丢任务。
+默认使用SQLite，可在多个API/worker进程间共享；内存后端用于单进程部署和测试
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+DEFAULT_RETENTION = float(os.getenv("JOB_RETENTION", "86400"))  # 结束的任务保留秒数
+
+# 任务状态
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    """队列中的任务"""
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    priority: int = 0
+    state: str = QUEUED
+    attempts: int = 0
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    available_at: float = 0.0
+    leased_until: Optional[float] = None
+    worker_id: Optional[str] = None
+    cancel_requested: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "kind": self.kind, "priority": self.priority, "state": self.state,
+            "attempts": self.attempts, "max_attempts": self.max_attempts,
+            "worker_id": self.worker_id, "cancel_requested": self.cancel_requested,
+            "error": self.error, "created_at": self.created_at, "updated_at": self.updated_at,
+        }
+
+
+class MemoryJobQueue:
+    """进程内队列 - 与SQLite队列接口一致，不持久化"""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._heap: List[tuple] = []  # (-priority, 序号, job_id)，已领取/结束的任务惰性删除
+        self._counter = itertools.count()
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_id: str, priority: int = 0,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, delay: float = 0.0) -> Job:
+        now = time.time()
+        job = Job(id=job_id, kind=kind, payload=payload, priority=priority,
+                  max_attempts=max_attempts, available_at=now + delay)
+        with self._lock:
+            self._jobs[job_id] = job
+            heapq.heappush(self._heap, (-priority, next(self._counter), job_id))
+        return job
+
+    def lease(self, worker_id: str, kinds: Optional[Iterable[str]] = None,
+              visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Job]:
+        now = time.time()
+        kinds = set(kinds) if kinds else None
+        with self._lock:
+            self._requeue_expired(now)
+            skipped = []
+            leased = None
+            while self._heap:
+                entry = heapq.heappop(self._heap)
+                job = self._jobs.get(entry[2])
+                if job is None or job.state != QUEUED:
+                    continue
+                if job.available_at > now or (kinds and job.kind not in kinds):
+                    skipped.append(entry)
+                    continue
+                leased = job
+                break
+            for entry in skipped:
+                heapq.heappush(self._heap, entry)
+            if leased is None:
+                return None
+            leased.state = LEASED
+            leased.attempts += 1
+            leased.worker_id = worker_id
+            leased.leased_until = now + visibility_timeout
+            leased.updated_at = now
+            return Job(**vars(leased))
+
+    def _requeue_expired(self, now: float):
+        for job in self._jobs.values():
+            if job.state == LEASED and job.leased_until is not None and job.leased_until <= now:
+                self._release(job, now, "租约过期")
+
+    def _release(self, job: Job, now: float, error: str, delay: float = 0.0):
+        """租约结束但任务未完成: 还有重试次数时重新排队，否则标记失败"""
+        job.worker_id = None
+        job.leased_until = None
+        job.error = error
+        job.updated_at = now
+        if job.cancel_requested:
+            job.state = CANCELLED
+        elif job.attempts < job.max_attempts:
+            job.state = QUEUED
+            job.available_at = now + delay
+            heapq.heappush(self._heap, (-job.priority, next(self._counter), job.id))
+        else:
+            job.state = FAILED
+
+    def heartbeat(self, job_id: str, worker_id: str,
+                  visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> bool:
+        """延长租约，任务被请求取消或租约已丢失时返回False"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != LEASED or job.worker_id != worker_id or job.cancel_requested:
+                return False
+            job.leased_until = time.time() + visibility_timeout
+            return True
+
+    def complete(self, job_id: str, worker_id: str, state: str = DONE, error: Optional[str] = None) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.worker_id != worker_id:
+                return False
+            job.state = state
+            job.error = error
+            job.worker_id = None
+            job.leased_until = None
+            job.updated_at = time.time()
+            return True
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry_delay: float = 0.0) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.worker_id != worker_id:
+                return False
+            self._release(job, time.time(), error, retry_delay)
+            return True
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """取消任务，返回取消后的状态: cancelled（尚未领取）/leased（已通知worker）/None（不存在）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state == QUEUED:
+                job.state = CANCELLED
+                job.updated_at = time.time()
+            elif job.state == LEASED:
+                job.cancel_requested = True
+            return job.state
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**vars(job)) if job else None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """排在该任务之前的待领取任务数，任务不在排队时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != QUEUED:
+                return None
+            return sum(1 for other in self._jobs.values()
+                       if other.state == QUEUED and other is not job
+                       and (other.priority, -other.created_at) > (job.priority, -job.created_at))
+
+    def depth(self) -> int:
+        """待领取的任务数"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.state == QUEUED)
+
+    def purge(self, retention: float = DEFAULT_RETENTION) -> int:
+        cutoff = time.time() - retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.state in FINISHED_STATES and job.updated_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.state] = counts.get(job.state, 0) + 1
+        return {"backend": self.name, **counts}
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    leased_until REAL,
+    worker_id TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, priority DESC, created_at);
+"""
+
+_COLUMNS = ("id", "kind", "payload", "priority", "state", "attempts", "max_attempts", "available_at",
+            "leased_until", "worker_id", "cancel_requested", "error", "created_at", "updated_at")
+
+
+class SQLiteJobQueue:
+    """SQLite队列 - WAL模式，领取任务在 BEGIN IMMEDIATE 事务内完成，多个进程可同时领取"""
+
+    name = "sqlite"
+    blocking = True  # 读写数据库，异步代码中应放到线程中调用
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        db = self._connect()
+        db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _transaction(self, fn):
+        """在写事务中执行 fn(db)"""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        values = dict(zip(_COLUMNS, row))
+        values["payload"] = json.loads(values["payload"])
+        values["cancel_requested"] = bool(values["cancel_requested"])
+        return Job(**values)
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], job_id: str, priority: int = 0,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, delay: float = 0.0) -> Job:
+        now = time.time()
+        job = Job(id=job_id, kind=kind, payload=payload, priority=priority,
+                  max_attempts=max_attempts, available_at=now + delay, created_at=now, updated_at=now)
+        self._connect().execute(
+            f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            (job.id, kind, json.dumps(payload, ensure_ascii=False, default=str), priority, QUEUED, 0,
+             max_attempts, job.available_at, None, None, 0, None, now, now)
+        )
+        return job
+
+    def lease(self, worker_id: str, kinds: Optional[Iterable[str]] = None,
+              visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> Optional[Job]:
+        kinds = list(kinds or ())
+
+        def take(db):
+            now = time.time()
+            self._requeue_expired(db, now)
+            sql = f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE state = ? AND available_at <= ?"
+            params: List[Any] = [QUEUED, now]
+            if kinds:
+                sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+                params += kinds
+            row = db.execute(sql + " ORDER BY priority DESC, created_at LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            job = self._row_to_job(row)
+            job.state = LEASED
+            job.attempts += 1
+            job.worker_id = worker_id
+            job.leased_until = now + visibility_timeout
+            job.updated_at = now
+            db.execute("UPDATE jobs SET state = ?, attempts = ?, worker_id = ?, leased_until = ?, updated_at = ? "
+                       "WHERE id = ?", (LEASED, job.attempts, worker_id, job.leased_until, now, job.id))
+            return job
+
+        return self._transaction(take)
+
+    @staticmethod
+    def _requeue_expired(db: sqlite3.Connection, now: float):
+        """租约过期的任务（worker崩溃或卡死）重新排队，超过重试次数的标记失败"""
+        db.execute("UPDATE jobs SET state = CASE WHEN cancel_requested THEN ? WHEN attempts < max_attempts "
+                   "THEN ? ELSE ? END, worker_id = NULL, leased_until = NULL, error = ?, updated_at = ?, "
+                   "available_at = ? WHERE state = ? AND leased_until <= ?",
+                   (CANCELLED, QUEUED, FAILED, "租约过期", now, now, LEASED, now))
+
+    def heartbeat(self, job_id: str, worker_id: str,
+                  visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> bool:
+        """延长租约，任务被请求取消或租约已丢失时返回False"""
+        cursor = self._connect().execute(
+            "UPDATE jobs SET leased_until = ? WHERE id = ? AND state = ? AND worker_id = ? AND NOT cancel_requested",
+            (time.time() + visibility_timeout, job_id, LEASED, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, state: str = DONE, error: Optional[str] = None) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE jobs SET state = ?, error = ?, worker_id = NULL, leased_until = NULL, updated_at = ? "
+            "WHERE id = ? AND worker_id = ?", (state, error, time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry_delay: float = 0.0) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE jobs SET state = CASE WHEN cancel_requested THEN ? WHEN attempts < max_attempts THEN ? "
+            "ELSE ? END, worker_id = NULL, leased_until = NULL, error = ?, available_at = ?, updated_at = ? "
+            "WHERE id = ? AND worker_id = ?",
+            (CANCELLED, QUEUED, FAILED, error, now + retry_delay, now, job_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """取消任务，返回取消后的状态: cancelled（尚未领取）/leased（已通知worker）/None（不存在）"""
+        def mark(db):
+            row = db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] == QUEUED:
+                db.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?", (CANCELLED, time.time(), job_id))
+                return CANCELLED
+            if row[0] == LEASED:
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return row[0]
+
+        return self._transaction(mark)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """排在该任务之前的待领取任务数，任务不在排队时返回None"""
+        db = self._connect()
+        row = db.execute("SELECT priority, created_at FROM jobs WHERE id = ? AND state = ?",
+                         (job_id, QUEUED)).fetchone()
+        if row is None:
+            return None
+        return db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = ? AND id != ? AND (priority > ? OR (priority = ? AND created_at < ?))",
+            (QUEUED, job_id, row[0], row[0], row[1])
+        ).fetchone()[0]
+
+    def depth(self) -> int:
+        """待领取的任务数"""
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def purge(self, retention: float = DEFAULT_RETENTION) -> int:
+        cursor = self._connect().execute(
+            f"DELETE FROM jobs WHERE state IN ({', '.join('?' * len(FINISHED_STATES))}) AND updated_at < ?",
+            (*FINISHED_STATES, time.time() - retention)
+        )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._connect().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {"backend": self.name, **dict(rows)}
+
+
+def create_job_queue():
+    """按环境变量创建任务队列: JOB_QUEUE_BACKEND=sqlite/memory，SQLite文件路径为 JOB_QUEUE_DB"""
+    backend_name = os.getenv("JOB_QUEUE_BACKEND", "sqlite").lower()
+    if backend_name == "sqlite":
+        queue = SQLiteJobQueue(os.getenv("JOB_QUEUE_DB", "search_jobs.db"))
+    elif backend_name == "memory":
+        queue = MemoryJobQueue()
+    else:
+        raise ValueError(f"不支持的任务队列后端: {backend_name}")
+    logger.info(f"搜索任务队列后端: {queue.name}")
+    return queue
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """获取进程级任务队列（首次调用时按环境变量创建）"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = create_job_queue()
+    return _queue
+
+
+async def run_queue_call(queue, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """在异步代码中执行会访问队列的调用: SQLite队列放到线程中执行，避免阻塞事件循环"""
+    if queue.blocking:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+__all__ = [
+    "Job",
+    "MemoryJobQueue",
+    "SQLiteJobQueue",
+    "create_job_queue",
+    "get_job_queue",
+    "run_queue_call",
+    "QUEUED",
+    "LEASED",
+    "DONE",
+    "FAILED",
+    "CANCELLED",
+    "FINISHED_STATES",
+]
@@ -0,0 +1,136 @@
+"""
+快速JSON响应与响应压缩
+状态和结果响应包含多份较长的中文Markdown，使用orjson直接序列化（跳过FastAPI的jsonable_encoder），
+超过阈值的完整响应按客户端支持使用brotli或gzip压缩；流式响应（SSE、NDJSON）不压缩，避免缓冲延迟
+"""
+
+import gzip
+import json
+import logging
+import os
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.content_buffer import ContentBuffer
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时回退到标准库json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，缺失时只使用gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESS_MIN_SIZE", "1024"))  # 小于该字节数的响应不压缩
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+
+# 压缩效果明显的响应类型；SSE、NDJSON等流式类型在发送时识别并跳过
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ContentBuffer):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """序列化为UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用orjson序列化的JSON响应，内容中的 ContentBuffer、Pydantic模型可直接返回"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _choose_encoding(accept_encoding: str) -> str:
+    accepted = {item.split(";")[0].strip().lower() for item in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return ""
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 压缩超过阈值的完整响应（优先brotli，其次gzip）"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = ("content-encoding" in headers
+                               or not content_type.startswith(_COMPRESSIBLE_TYPES)
+                               or content_type.startswith("text/event-stream"))
+                if passthrough:
+                    await send(message)
+                else:
+                    # 等到第一段响应体再决定是否压缩
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            passthrough = True  # 之后的分段（流式响应）原样发送
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start_message)
+                await send(message)
+                return
+            compressed = _compress(body, encoding)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+
+__all__ = [
+    "CompressionMiddleware",
+    "FastJSONResponse",
+    "dumps",
+]
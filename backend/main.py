@@ -1,11 +1,16 @@
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import json
 import logging
+import threading
 from backend.account_manager import save_account, load_cookie
-from backend.search_runner import search_all_legacy, search_and_integrate
+from backend.search_runner import search_all_legacy, iter_search_all, search_and_integrate
+from backend.search_pool import SearchPoolSaturated, get_search_pool
+from backend.admission import AdmissionController, RateLimiter, too_many_requests
 from langchain_agents.prompt_optimizer import get_optimized_prompt
-from ragflow_utils.deduplicate import deduplicate_results
+from ragflow_utils.deduplicate import deduplicate_results, iter_deduplicate
 from playwright_scripts.check_login import check_login_status
 
 # 配置日志
@@ -14,6 +19,22 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="多平台AI搜索API", version="2.0.0")
 
+# 容量由进程级线程池决定，线程池已满时返回429；准入控制器记录搜索耗时用于估算Retry-After
+rate_limiter = RateLimiter()
+search_admission = AdmissionController(
+    "traditional",
+    slots=lambda: get_search_pool().max_workers,
+    pending=lambda: _pool_backlog()
+)
+
+def _pool_backlog() -> int:
+    """线程池中等待执行的平台任务数"""
+    stats = get_search_pool().stats()
+    return max(0, stats["inflight"] - stats["max_workers"])
+
+def _saturated(e: SearchPoolSaturated) -> HTTPException:
+    return too_many_requests(str(e), search_admission.estimate_wait(_pool_backlog()))
+
 class LoginRequest(BaseModel):
     platform: str
     account: dict
@@ -21,6 +42,7 @@ class LoginRequest(BaseModel):
 class SearchRequest(BaseModel):
     user_input: str
     platforms: list
+    timeout: Optional[float] = None  # 整个请求的截止时间（秒）
 
 class CheckLoginRequest(BaseModel):
     platform: str
@@ -33,6 +55,7 @@ class AISearchRequest(BaseModel):
     browser_config: Optional[Dict[str, Any]] = None
     enable_fact_check: bool = True
     use_ai_integration: bool = True
+    timeout: Optional[float] = None  # 整个请求的截止时间（秒）
     
 class LLMConfigRequest(BaseModel):
     base_url: str
@@ -53,8 +76,9 @@ def login(req: LoginRequest):
         raise HTTPException(status_code=500, detail=f"账号保存失败: {e}")
 
 @app.post("/search")
-def search(req: SearchRequest):
+def search(req: SearchRequest, request: Request):
     """传统搜索接口 - 保持兼容性"""
+    rate_limiter.check(request)
     try:
         logger.info(f"开始传统搜索: {req.user_input}")
         
@@ -62,7 +86,8 @@ def search(req: SearchRequest):
         optimized_query = get_optimized_prompt(req.user_input)
         
         # 执行搜索
-        results = search_all_legacy(optimized_query, req.platforms)
+        with search_admission.track():
+            results = search_all_legacy(optimized_query, req.platforms, req.timeout)
         
         # 简单去重
         merged = deduplicate_results([r[1] for r in results])
@@ -74,13 +99,65 @@ def search(req: SearchRequest):
             "query": optimized_query,
             "method": "traditional"
         }
+    except SearchPoolSaturated as e:
+        logger.warning(f"传统搜索被拒绝: {e}")
+        raise _saturated(e)
     except Exception as e:
         logger.error(f"传统搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"搜索失败: {e}")
 
+@app.post("/search-stream")
+def search_stream(req: SearchRequest, request: Request):
+    """流式传统搜索 - 平台完成即返回去重后的结果 (NDJSON)"""
+    rate_limiter.check(request)
+    try:
+        logger.info(f"开始流式搜索: {req.user_input}")
+        optimized_query = get_optimized_prompt(req.user_input)
+        # 立即提交任务，线程池已满时在开始流式响应前拒绝
+        cancel_event = threading.Event()
+        search_results = iter_search_all(optimized_query, req.platforms, timeout=req.timeout,
+                                         cancel_event=cancel_event)
+    except SearchPoolSaturated as e:
+        logger.warning(f"流式搜索被拒绝: {e}")
+        raise _saturated(e)
+    except Exception as e:
+        logger.error(f"流式搜索失败: {e}")
+        raise HTTPException(status_code=500, detail=f"搜索失败: {e}")
+    
+    def generate():
+        total = 0
+        unique = 0
+        
+        def counted():
+            nonlocal total
+            for item in search_results:
+                total += 1
+                yield item
+        
+        try:
+            for platform, result in iter_deduplicate(counted(), key=lambda item: item[1]):
+                unique += 1
+                yield json.dumps({"type": "result", "platform": platform, "content": result},
+                                 ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开时生成器被关闭，取消尚未完成的平台任务
+            cancel_event.set()
+        
+        logger.info(f"流式搜索完成，结果数: {unique}/{total}")
+        yield json.dumps({
+            "type": "done",
+            "query": optimized_query,
+            "total": total,
+            "unique": unique,
+            "method": "traditional_stream"
+        }, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @app.post("/ai-search")
-def ai_search(req: AISearchRequest):
+def ai_search(req: AISearchRequest, request: Request):
     """AI增强搜索接口"""
+    rate_limiter.check(request)
     try:
         logger.info(f"开始AI增强搜索: {req.user_input}")
         
@@ -94,14 +171,16 @@ def ai_search(req: AISearchRequest):
         logger.info(f"优化后查询: {optimized_query}")
         
         # 执行AI增强搜索和整合
-        result = search_and_integrate(
-            optimized_query=optimized_query,
-            platforms=req.platforms,
-            llm_config=req.llm_config,
-            browser_config=req.browser_config,
-            enable_fact_check=req.enable_fact_check,
-            use_ai_integration=req.use_ai_integration
-        )
+        with search_admission.track():
+            result = search_and_integrate(
+                optimized_query=optimized_query,
+                platforms=req.platforms,
+                llm_config=req.llm_config,
+                browser_config=req.browser_config,
+                enable_fact_check=req.enable_fact_check,
+                use_ai_integration=req.use_ai_integration,
+                timeout=req.timeout
+            )
         
         logger.info("AI增强搜索完成")
         return {
@@ -110,6 +189,9 @@ def ai_search(req: AISearchRequest):
             "method": "ai_enhanced"
         }
         
+    except SearchPoolSaturated as e:
+        logger.warning(f"AI增强搜索被拒绝: {e}")
+        raise _saturated(e)
     except Exception as e:
         logger.error(f"AI增强搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"AI搜索失败: {e}")
@@ -184,7 +266,10 @@ def health_check():
             "ai_integration": True,
             "fact_checking": True,
             "semantic_deduplication": True
-        }
+        },
+        "search_pool": get_search_pool().stats(),
+        "admission": search_admission.stats(),
+        "rate_limit": rate_limiter.stats()
     }
 
 @app.get("/platforms")
@@ -207,6 +292,6 @@ def get_platforms():
 
 # 保持向后兼容的路由
 @app.post("/search_legacy")
-def search_legacy(req: SearchRequest):
+def search_legacy(req: SearchRequest, request: Request):
     """向后兼容的搜索接口"""
-    return search(req) 
\ No newline at end of file
+    return search(req, request) 
\ No newline at end of file
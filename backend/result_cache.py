@@ -0,0 +1,282 @@
+"""
+搜索结果缓存
+按规范化问题、平台集合、模式和AI配置寻址，进程内LRU + 可选SQLite持久层，支持过期后先返回旧结果再后台刷新
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+DEFAULT_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+DEFAULT_STALE_SECONDS = float(os.getenv("RESULT_CACHE_STALE_SECONDS", "1800"))
+DEFAULT_DB_PATH = os.getenv("RESULT_CACHE_DB", "")  # 为空时只使用进程内缓存
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS result_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    ttl REAL NOT NULL,
+    stale_seconds REAL NOT NULL
+)
+"""
+
+
+def parse_platform_ttls(spec: Optional[str]) -> Dict[str, float]:
+    """解析平台缓存有效期配置，格式: DeepSeek=300,Kimi=900"""
+    ttls = {}
+    if not spec:
+        return ttls
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        platform, value = item.split("=", 1)
+        try:
+            ttls[platform.strip()] = max(0.0, float(value))
+        except ValueError:
+            logger.warning(f"忽略无效的平台缓存配置: {item}")
+    return ttls
+
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """缓存键使用的问题规范化: 只做NFKC（全角/半角等）和空白折叠
+
+    大小写和markdown符号可能改变问题含义，保留原样，避免不同的问题共用缓存
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", query)).strip()
+
+
+def make_cache_key(query: str, platforms: Iterable[str], mode: str,
+                   ai_config: Optional[Dict[str, Any]] = None, scope: str = "") -> str:
+    """计算缓存键 - 问题只规范化空白和字符宽度，平台顺序无关，AI配置按键排序"""
+    payload = json.dumps({
+        "scope": scope,
+        "query": normalize_query(query),
+        "platforms": sorted(set(platforms)),
+        "mode": mode,
+        "ai_config": ai_config or None,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("value", "created_at", "ttl", "stale_seconds")
+
+    def __init__(self, value, created_at, ttl, stale_seconds):
+        self.value = value
+        self.created_at = created_at
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+
+    def state(self, now: float) -> Optional[str]:
+        age = now - self.created_at
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.stale_seconds:
+            return STALE
+        return None
+
+
+class ResultCache:
+    """搜索结果缓存
+
+    - fresh: 有效期内直接返回
+    - stale: 超过有效期但仍在宽限期内，返回旧结果并由调用方后台刷新
+    - 超过宽限期视为未命中
+    缓存的结果对象被多个请求共享，调用方不得修改
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 default_ttl: float = DEFAULT_TTL,
+                 platform_ttls: Optional[Dict[str, float]] = None,
+                 stale_seconds: float = DEFAULT_STALE_SECONDS,
+                 db_path: str = DEFAULT_DB_PATH):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.platform_ttls = dict(platform_ttls or {})
+        self.stale_seconds = stale_seconds
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[str, _Entry]" = collections.OrderedDict()
+        self._refreshing = set()
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._counters = collections.Counter()
+
+    def ttl_for(self, platforms: Iterable[str]) -> float:
+        """结果有效期取所有平台中最短的一个"""
+        ttls = [self.platform_ttls.get(p, self.default_ttl) for p in platforms]
+        return min(ttls) if ttls else self.default_ttl
+
+    def get(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """查询缓存，返回 (结果, 状态)，未命中时为 (None, None)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._db_get(key)
+            if entry is not None:
+                self._remember(key, entry)
+        state = entry.state(now) if entry is not None else None
+        with self._lock:
+            if state is None:
+                self._counters["misses"] += 1
+                if entry is not None:
+                    self._entries.pop(key, None)
+                return None, None
+            self._counters["stale_hits" if state == STALE else "hits"] += 1
+        return entry.value, state
+
+    def set(self, key: str, value: Any, platforms: Iterable[str] = ()):
+        """写入缓存"""
+        entry = _Entry(value, time.time(), self.ttl_for(list(platforms)), self.stale_seconds)
+        self._remember(key, entry)
+        self._db_set(key, entry)
+        with self._lock:
+            self._counters["stores"] += 1
+
+    def invalidate(self, key: Optional[str] = None):
+        """删除单个键或清空缓存"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        db = self._connect()
+        if db is not None:
+            with self._db_lock:
+                if key is None:
+                    db.execute("DELETE FROM result_cache")
+                else:
+                    db.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                db.commit()
+
+    def begin_refresh(self, key: str) -> bool:
+        """登记后台刷新，同一个键同时只刷新一次"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self._counters["refreshes"] += 1
+            return True
+
+    def end_refresh(self, key: str):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["stale_hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": bool(self.db_path),
+                "hits": self._counters["hits"],
+                "stale_hits": self._counters["stale_hits"],
+                "misses": self._counters["misses"],
+                "stores": self._counters["stores"],
+                "refreshes": self._counters["refreshes"],
+                "refreshing": len(self._refreshing),
+                "hit_rate": round((lookups - self._counters["misses"]) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    db = sqlite3.connect(self.db_path, check_same_thread=False)
+                    db.execute(_SCHEMA)
+                    db.commit()
+                    self._db = db
+        return self._db
+
+    def _db_get(self, key: str) -> Optional[_Entry]:
+        db = self._connect()
+        if db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = db.execute(
+                    "SELECT value, created_at, ttl, stale_seconds FROM result_cache WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"读取结果缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        return _Entry(json.loads(row[0]), row[1], row[2], row[3])
+
+    def _db_set(self, key: str, entry: _Entry):
+        db = self._connect()
+        if db is None:
+            return
+        try:
+            value = json.dumps(entry.value, ensure_ascii=False, default=str)
+            with self._db_lock:
+                db.execute(
+                    "INSERT OR REPLACE INTO result_cache (key, value, created_at, ttl, stale_seconds) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, entry.created_at, entry.ttl, entry.stale_seconds)
+                )
+                # 顺带清理超过宽限期的记录
+                db.execute("DELETE FROM result_cache WHERE created_at + ttl + stale_seconds < ?", (time.time(),))
+                db.commit()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"写入结果缓存失败: {e}")
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """获取进程级结果缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache(
+                    platform_ttls=parse_platform_ttls(os.getenv("RESULT_CACHE_PLATFORM_TTLS"))
+                )
+    return _cache
+
+
+__all__ = [
+    "ResultCache",
+    "make_cache_key",
+    "normalize_query",
+    "parse_platform_ttls",
+    "get_result_cache",
+    "FRESH",
+    "STALE",
+]
@@ -0,0 +1,181 @@
+"""
+搜索事件流
+把搜索状态的变化转换为带序号的增量事件（平台开始、内容增量、平台完成、聚合完成），供SSE/WebSocket推送
+"""
+
+import asyncio
+import collections
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MAX_LOGS = int(os.getenv("SEARCH_EVENT_MAX_LOGS", "1000"))
+DEFAULT_RETENTION = float(os.getenv("SEARCH_EVENT_RETENTION", "600"))  # 搜索结束后保留事件的秒数
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+PLATFORM_DONE_STATES = ("completed", "failed", "timeout", "circuit_open", "cancelled")
+
+# 判断内容是否为追加时比较的尾部长度，避免每次更新都比较整段内容
+_TAIL_CHECK = 64
+
+
+class SearchEventLog:
+    """单个搜索的事件日志 - 事件序号单调递增，订阅者按序号续读"""
+
+    def __init__(self, search_id: str):
+        self.search_id = search_id
+        self.events: List[Dict[str, Any]] = []
+        self.seq = 0
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self._changed = asyncio.Event()
+        # 已发布的状态，用于计算增量
+        self._platforms: Dict[str, Dict[str, Any]] = {}
+        self._progress = None
+        self._current_platform = None
+
+    def publish(self, event_type: str, **data) -> Dict[str, Any]:
+        """追加事件并唤醒等待者"""
+        self.seq += 1
+        event = {"seq": self.seq, "type": event_type, "search_id": self.search_id, **data}
+        self.events.append(event)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        return event
+
+    def events_since(self, seq: int) -> List[Dict[str, Any]]:
+        """序号大于 seq 的事件"""
+        if seq >= self.seq:
+            return []
+        # 事件序号从1开始连续编号，可以直接按下标切片
+        return self.events[max(0, seq):]
+
+    async def wait(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """等待出现序号大于 seq 的事件或日志关闭，超时返回False"""
+        if self.seq > seq or self.closed:
+            return True
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.closed_at = time.monotonic()
+            changed, self._changed = self._changed, asyncio.Event()
+            changed.set()
+
+    def record(self, status: Dict[str, Any]):
+        """根据最新状态生成增量事件"""
+        if self.closed:
+            return
+        progress = status.get("progress")
+        current_platform = status.get("current_platform")
+        if progress is not None and (progress, current_platform) != (self._progress, self._current_platform):
+            self._progress, self._current_platform = progress, current_platform
+            self.publish("progress", progress=progress, current_platform=current_platform)
+
+        for platform, live in (status.get("live_results") or {}).items():
+            self._record_platform(platform, live)
+
+        state = status.get("status")
+        if state in TERMINAL_STATES:
+            results = status.get("results")
+            if state == "completed" and isinstance(results, dict):
+                self.publish("aggregate_ready",
+                             integrated_document=results.get("integrated_document"),
+                             processing_summary=results.get("processing_summary"))
+            self.publish("done", status=state, error=status.get("error"))
+            self.close()
+
+    def _record_platform(self, platform: str, live: Dict[str, Any]):
+        # 只记录已发布内容的长度和尾部：内容可能是原地追加的 ContentBuffer，不能按对象身份判断变化
+        previous = self._platforms.setdefault(platform, {"status": None, "length": 0, "tail": "",
+                                                         "progress_text": None})
+        state = live.get("status")
+        if state != previous["status"] and state == "searching":
+            self.publish("platform_started", platform=platform, start_time=live.get("start_time"))
+
+        content = live.get("content") or ""
+        offset = previous["length"]
+        length = len(content)
+        if length != offset or (length and content[max(0, length - _TAIL_CHECK):] != previous["tail"]):
+            if length >= offset and content[max(0, offset - _TAIL_CHECK):offset] == previous["tail"]:
+                self.publish("content_delta", platform=platform, offset=offset, delta=content[offset:])
+            else:
+                # 内容被整体替换（如浏览器模式一次性返回）
+                self.publish("content_reset", platform=platform, offset=0, content=str(content))
+            previous["length"] = length
+            previous["tail"] = content[max(0, length - _TAIL_CHECK):]
+
+        progress_text = live.get("progress_text")
+        if progress_text != previous["progress_text"]:
+            previous["progress_text"] = progress_text
+            self.publish("platform_progress", platform=platform, progress_text=progress_text)
+
+        if state != previous["status"] and state in PLATFORM_DONE_STATES:
+            self.publish("platform_completed", platform=platform, status=state,
+                         latency=live.get("latency"), error=live.get("error"),
+                         content_length=len(content))
+        previous["status"] = state
+
+
+class SearchEventHub:
+    """所有搜索的事件日志 - 有界，搜索结束后保留一段时间供迟到的订阅者续读"""
+
+    def __init__(self, max_logs: int = DEFAULT_MAX_LOGS, retention: float = DEFAULT_RETENTION):
+        self.max_logs = max_logs
+        self.retention = retention
+        self._logs: "collections.OrderedDict[str, SearchEventLog]" = collections.OrderedDict()
+
+    def open(self, search_id: str) -> SearchEventLog:
+        """为新搜索创建事件日志"""
+        self._cleanup()
+        log = self._logs.get(search_id)
+        if log is None:
+            log = self._logs[search_id] = SearchEventLog(search_id)
+        return log
+
+    def get(self, search_id: str) -> Optional[SearchEventLog]:
+        return self._logs.get(search_id)
+
+    def record(self, search_id: str, status: Dict[str, Any]):
+        """记录状态变化（没有事件日志的搜索忽略）"""
+        log = self._logs.get(search_id)
+        if log is not None:
+            log.record(status)
+
+    def discard(self, search_id: str):
+        log = self._logs.pop(search_id, None)
+        if log is not None:
+            log.close()
+
+    def _cleanup(self):
+        now = time.monotonic()
+        expired = [sid for sid, log in self._logs.items()
+                   if log.closed and now - log.closed_at >= self.retention]
+        for sid in expired:
+            del self._logs[sid]
+        while len(self._logs) >= self.max_logs:
+            # 优先淘汰已结束的日志
+            victim = next((sid for sid, log in self._logs.items() if log.closed), None)
+            if victim is None:
+                victim = next(iter(self._logs))
+            self._logs.pop(victim).close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "logs": len(self._logs),
+            "open": sum(1 for log in self._logs.values() if not log.closed),
+            "events": sum(len(log.events) for log in self._logs.values()),
+        }
+
+
+__all__ = [
+    "SearchEventLog",
+    "SearchEventHub",
+    "TERMINAL_STATES",
+]
@@ -0,0 +1,180 @@
+"""
+进程级搜索线程池
+全局限制工作线程数量，按平台限制并发会话，等待队列满时提前拒绝
+"""
+
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "8"))
+DEFAULT_MAX_PENDING = int(os.getenv("SEARCH_MAX_PENDING", "16"))
+DEFAULT_PLATFORM_LIMIT = int(os.getenv("SEARCH_DEFAULT_PLATFORM_LIMIT", "2"))
+
+
+class SearchPoolSaturated(RuntimeError):
+    """搜索线程池已满，拒绝新的搜索任务"""
+
+
+def parse_platform_limits(spec: Optional[str]) -> Dict[str, int]:
+    """解析平台并发限制配置，格式: DeepSeek=2,Kimi=1"""
+    limits = {}
+    if not spec:
+        return limits
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        platform, value = item.split("=", 1)
+        try:
+            limits[platform.strip()] = max(1, int(value))
+        except ValueError:
+            logger.warning(f"忽略无效的平台并发配置: {item}")
+    return limits
+
+
+class SearchPool:
+    """搜索线程池 - 全局工作线程上限 + 平台级并发上限 + 有界等待队列"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 platform_limits: Optional[Dict[str, int]] = None,
+                 default_platform_limit: int = DEFAULT_PLATFORM_LIMIT):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.platform_limits = dict(platform_limits or {})
+        self.default_platform_limit = default_platform_limit
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="search"
+        )
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._rejected = 0
+        self._running = collections.Counter()
+        # 超出平台并发上限的任务在此排队，不占用工作线程
+        self._waiting: Dict[str, collections.deque] = collections.defaultdict(collections.deque)
+
+    @property
+    def capacity(self) -> int:
+        """可同时接纳的任务总数（运行中 + 排队中）"""
+        return self.max_workers + self.max_pending
+
+    def platform_limit(self, platform: str) -> int:
+        """获取平台并发上限"""
+        return self.platform_limits.get(platform, self.default_platform_limit)
+
+    def submit(self, platform: str, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """提交单个平台任务"""
+        return self.submit_many([(platform, fn, args, kwargs)])[0]
+
+    def submit_many(self, calls: List[Tuple[str, Callable, tuple, dict]]) -> List[concurrent.futures.Future]:
+        """批量提交任务 - 整体接纳或整体拒绝，避免一个请求只跑了一部分平台"""
+        futures = []
+        dispatch = []
+        with self._lock:
+            if self._inflight + len(calls) > self.capacity:
+                self._rejected += 1
+                raise SearchPoolSaturated(
+                    f"搜索任务过多 (进行中 {self._inflight}/{self.capacity})，请稍后重试"
+                )
+            self._inflight += len(calls)
+            for platform, fn, args, kwargs in calls:
+                future = concurrent.futures.Future()
+                job = (platform, future, fn, args, kwargs)
+                futures.append(future)
+                if self._running[platform] < self.platform_limit(platform):
+                    self._running[platform] += 1
+                    dispatch.append(job)
+                else:
+                    self._waiting[platform].append(job)
+                    future.add_done_callback(lambda f, platform=platform: self._discard_cancelled(platform, f))
+        for job in dispatch:
+            self._dispatch(job)
+        return futures
+
+    def _dispatch(self, job):
+        self._executor.submit(self._run, *job)
+
+    def _run(self, platform: str, future: concurrent.futures.Future,
+             fn: Callable, args: tuple, kwargs: dict):
+        try:
+            if future.set_running_or_notify_cancel():
+                future.started_at = time.monotonic()  # 供对冲等逻辑判断实际开始时间
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            self._release(platform)
+
+    def _release(self, platform: str):
+        next_job = None
+        with self._lock:
+            self._inflight -= 1
+            if self._waiting[platform]:
+                next_job = self._waiting[platform].popleft()
+            else:
+                self._running[platform] -= 1
+        if next_job:
+            self._dispatch(next_job)
+
+    def _discard_cancelled(self, platform: str, future: concurrent.futures.Future):
+        """排队中的任务被取消时立即移出队列并释放容量，不必等前面的任务完成"""
+        if not future.cancelled():
+            return
+        with self._lock:
+            queue = self._waiting[platform]
+            for index, job in enumerate(queue):
+                if job[1] is future:
+                    del queue[index]
+                    self._inflight -= 1
+                    return
+
+    def stats(self) -> Dict[str, Any]:
+        """线程池状态"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "capacity": self.capacity,
+                "inflight": self._inflight,
+                "rejected": self._rejected,
+                "running": {p: n for p, n in self._running.items() if n},
+                "waiting": {p: len(q) for p, q in self._waiting.items() if q},
+            }
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
+
+
+_pool: Optional[SearchPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_search_pool() -> SearchPool:
+    """获取进程级搜索线程池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SearchPool(
+                    platform_limits=parse_platform_limits(os.getenv("SEARCH_PLATFORM_LIMITS"))
+                )
+    return _pool
+
+
+def configure_search_pool(max_workers: int = DEFAULT_MAX_WORKERS,
+                          max_pending: int = DEFAULT_MAX_PENDING,
+                          platform_limits: Optional[Dict[str, int]] = None,
+                          default_platform_limit: int = DEFAULT_PLATFORM_LIMIT) -> SearchPool:
+    """重新配置进程级搜索线程池（已提交的任务在旧线程池中继续完成）"""
+    global _pool
+    with _pool_lock:
+        _pool = SearchPool(max_workers, max_pending, platform_limits, default_platform_limit)
+    return _pool
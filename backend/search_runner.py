@@ -1,7 +1,14 @@
+import collections
 import concurrent.futures
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple, Iterator
 from backend.account_manager import load_account
+from backend.search_pool import SearchPoolSaturated, get_search_pool
+from core.circuit_breaker import get_breaker
 from playwright_scripts.deepseek import run as run_deepseek
 from playwright_scripts.kimi import run as run_kimi
 from playwright_scripts.chatglm import run as run_chatglm
@@ -26,63 +33,339 @@ PLATFORM_RUNNERS = {
     "Gemini": run_gemini,
 }
 
+# 单个平台的默认时间预算（秒），可按平台覆盖
+DEFAULT_PLATFORM_TIMEOUT = float(os.getenv("SEARCH_PLATFORM_TIMEOUT", "90"))
+PLATFORM_TIMEOUTS: Dict[str, float] = {}
+
+# 重试配置: 每个平台最多尝试次数，退避基数/上限（秒，带随机抖动）
+RETRY_MAX_ATTEMPTS = int(os.getenv("SEARCH_RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("SEARCH_RETRY_BACKOFF", "0.5"))
+RETRY_BACKOFF_MAX = 5.0
+
+# 对冲配置: 首次尝试超过平台p90耗时仍未返回时，启动第二个尝试，取先完成者
+HEDGE_ENABLED = os.getenv("SEARCH_HEDGE_ENABLED", "0") == "1"
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = int(os.getenv("SEARCH_HEDGE_MIN_SAMPLES", "10"))
+HEDGE_POLL_INTERVAL = 0.5  # 首次尝试尚在排队时的检查间隔
+
+TIMEOUT_MARKER = "[超时]"
+CIRCUIT_OPEN_MARKER = "[熔断]"
+CANCELLED_MARKER = "[已取消]"
+CANCEL_POLL_INTERVAL = 0.2  # 等待结果时检查取消信号的间隔
+
+class LatencyTracker:
+    """平台成功调用耗时的滚动窗口"""
+    
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._samples: Dict[str, collections.deque] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, platform: str, latency: float):
+        """记录一次成功调用的耗时"""
+        with self._lock:
+            samples = self._samples.setdefault(platform, collections.deque(maxlen=self.window))
+            samples.append(latency)
+    
+    def percentile(self, platform: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """耗时分位数，样本不足时返回None"""
+        with self._lock:
+            samples = sorted(self._samples.get(platform, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+latency_tracker = LatencyTracker()
+
+def _is_transient_error(error: Exception) -> bool:
+    """判断是否为可重试的临时性错误（超时、网络中断等）"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name or "TargetClosed" in name
+
+def _retry_delay(attempt: int) -> float:
+    """指数退避 + 全抖动"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * (2 ** (attempt - 1))))
+
 def search_one(platform: str, optimized_query: str, 
-               browser_config: Optional[Dict] = None) -> Tuple[str, str]:
-    """执行单个平台搜索"""
+               browser_config: Optional[Dict] = None,
+               deadline: Optional[float] = None,
+               max_attempts: Optional[int] = None,
+               cancel_event: Optional[threading.Event] = None) -> Tuple[str, str]:
+    """执行单个平台搜索
+    
+    deadline 为 time.monotonic() 时间点，排队到期的任务不再启动；
+    临时性错误按 max_attempts 带抖动重试，重试不会越过 deadline；
+    cancel_event 被设置后不再开始新的尝试，退避等待也会立即结束
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        return platform, f"{CANCELLED_MARKER} 搜索已取消"
+    if deadline is not None and time.monotonic() >= deadline:
+        logger.warning(f"平台 {platform} 排队超时，跳过执行")
+        return platform, f"{TIMEOUT_MARKER} 排队超过截止时间"
+    
+    # 平台持续失败时快速失败，不再占用浏览器
+    breaker = get_breaker(platform)
+    if not breaker.allow():
+        snapshot = breaker.snapshot()
+        logger.info(f"平台 {platform} 熔断中，快速失败")
+        return platform, f"{CIRCUIT_OPEN_MARKER} {platform} 暂不可用: {snapshot['last_error']}"
+    
     runner = PLATFORM_RUNNERS[platform]
     account = load_account(platform)
+    # 至少尝试一次（SEARCH_RETRY_ATTEMPTS=0 或传入0时）
+    max_attempts = max(1, max_attempts or RETRY_MAX_ATTEMPTS)
+    error_msg = f"[运行失败] {platform} 未执行"
     
-    try:
-        logger.info(f"开始搜索平台: {platform}")
-        
-        # 如果提供了浏览器配置，传递给runner
-        if browser_config:
-            result = runner(optimized_query, account, **browser_config)
-        else:
-            result = runner(optimized_query, account)
-        
-        logger.info(f"平台 {platform} 搜索完成")
-        return platform, result
-    except Exception as e:
-        error_msg = f"[运行失败] {e}"
-        logger.error(f"平台 {platform} 搜索失败: {error_msg}")
-        return platform, error_msg
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1 and cancel_event is not None and cancel_event.is_set():
+            logger.info(f"平台 {platform} 搜索已取消，停止重试")
+            return platform, f"{CANCELLED_MARKER} 搜索已取消"
+        try:
+            logger.info(f"开始搜索平台: {platform}" + (f" (第{attempt}次尝试)" if attempt > 1 else ""))
+            started = time.monotonic()
+            
+            # 如果提供了浏览器配置，传递给runner
+            if browser_config:
+                result = runner(optimized_query, account, **browser_config)
+            else:
+                result = runner(optimized_query, account)
+            
+            latency = time.monotonic() - started
+            if isinstance(result, str) and result.startswith("["):
+                breaker.record_failure(result[:200], latency)
+            else:
+                breaker.record_success(latency)
+                latency_tracker.record(platform, latency)
+            logger.info(f"平台 {platform} 搜索完成")
+            return platform, result
+        except Exception as e:
+            error_msg = f"[运行失败] {e}"
+            breaker.record_failure(str(e), time.monotonic() - started)
+            if attempt >= max_attempts or not _is_transient_error(e):
+                break
+            delay = _retry_delay(attempt)
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                break
+            logger.warning(f"平台 {platform} 临时性错误，{delay:.2f}s 后重试: {e}")
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+    
+    logger.error(f"平台 {platform} 搜索失败: {error_msg}")
+    return platform, error_msg
 
-def search_all(optimized_query: str, platforms: List[str], 
-               browser_config: Optional[Dict] = None) -> List[Tuple[str, str]]:
-    """并行搜索所有平台"""
-    results = []
+def _platform_deadline(platform: str, start: float, request_deadline: Optional[float],
+                       platform_timeouts: Optional[Dict[str, float]]) -> float:
+    """计算平台截止时间: 平台预算与请求总截止时间取较早者"""
+    budget = (platform_timeouts or {}).get(platform, PLATFORM_TIMEOUTS.get(platform, DEFAULT_PLATFORM_TIMEOUT))
+    deadline = start + budget
+    if request_deadline is not None:
+        deadline = min(deadline, request_deadline)
+    return deadline
+
+def _classify_result(result: str) -> str:
+    """根据结果文本判断状态"""
+    if result.startswith(TIMEOUT_MARKER):
+        return "timeout"
+    if result.startswith(CIRCUIT_OPEN_MARKER):
+        return "circuit_open"
+    if result.startswith(CANCELLED_MARKER):
+        return "cancelled"
+    if result.startswith("["):
+        return "failed"
+    return "success"
+
+def iter_search_outcomes(optimized_query: str, platforms: List[str],
+                         browser_config: Optional[Dict] = None,
+                         timeout: Optional[float] = None,
+                         platform_timeouts: Optional[Dict[str, float]] = None,
+                         hedge: Optional[bool] = None,
+                         cancel_event: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+    """并行搜索所有平台，按完成顺序产出带耗时和状态的结果
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(platforms)) as executor:
-        # 提交所有搜索任务
-        future_to_platform = {
-            executor.submit(search_one, platform, optimized_query, browser_config): platform
-            for platform in platforms
+    任务在调用时立即提交到进程级线程池，线程池已满时抛出 SearchPoolSaturated。
+    超过截止时间的平台被取消（尚未开始）或放弃（正在运行），以超时结果返回。
+    hedge 为 True 时（默认读取 SEARCH_HEDGE_ENABLED），慢于p90的平台会启动对冲尝试。
+    cancel_event 被设置后，排队中的任务被取消并立即归还线程池名额，运行中的任务结束当前尝试后
+    才归还名额且不再重试，剩余平台以取消结果返回。
+    """
+    start = time.monotonic()
+    request_deadline = start + timeout if timeout else None
+    deadlines = {
+        platform: _platform_deadline(platform, start, request_deadline, platform_timeouts)
+        for platform in platforms
+    }
+    futures = get_search_pool().submit_many([
+        (platform, search_one, (platform, optimized_query, browser_config, deadlines[platform]),
+         {"cancel_event": cancel_event})
+        for platform in platforms
+    ])
+    collector = _OutcomeCollector(
+        dict(zip(futures, platforms)), deadlines, start,
+        hedge=HEDGE_ENABLED if hedge is None else hedge,
+        hedge_args=(optimized_query, browser_config),
+        cancel_event=cancel_event
+    )
+    return collector.outcomes()
+
+class _OutcomeCollector:
+    """收集平台结果: 处理超时，并在启用时为慢平台发起对冲尝试"""
+    
+    def __init__(self, future_to_platform: Dict[concurrent.futures.Future, str],
+                 deadlines: Dict[str, float], start: float,
+                 hedge: bool, hedge_args: tuple,
+                 cancel_event: Optional[threading.Event] = None):
+        self.future_to_platform = dict(future_to_platform)
+        self.cancel_event = cancel_event
+        self.deadlines = deadlines
+        self.start = start
+        self.hedge = hedge
+        self.hedge_args = hedge_args
+        self.primary = {platform: future for future, platform in future_to_platform.items()}
+        self.attempts: Dict[str, List[concurrent.futures.Future]] = {
+            platform: [future] for platform, future in self.primary.items()
         }
-        
-        # 收集结果
-        for future in concurrent.futures.as_completed(future_to_platform):
-            platform = future_to_platform[future]
-            try:
-                platform_name, result = future.result()
-                results.append((platform_name, result))
-                logger.info(f"平台 {platform} 结果收集完成")
-            except Exception as e:
-                logger.error(f"平台 {platform} 结果收集失败: {e}")
-                results.append((platform, f"[执行异常] {e}"))
-    
-    return results
+        self.hedged = set()
+    
+    def _hedge_due(self, platform: str, now: float) -> Optional[float]:
+        """返回对冲尝试的启动时间点，不需要对冲时返回None"""
+        if not self.hedge or platform in self.hedged:
+            return None
+        p90 = latency_tracker.percentile(platform, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+        if p90 is None:
+            return None
+        started_at = getattr(self.primary[platform], "started_at", None)
+        if started_at is None:
+            # 首次尝试仍在排队，稍后再检查
+            return now + HEDGE_POLL_INTERVAL
+        return started_at + p90
+    
+    def _start_hedge(self, platform: str):
+        """启动对冲尝试（不重试），线程池已满时放弃对冲"""
+        self.hedged.add(platform)
+        query, browser_config = self.hedge_args
+        try:
+            future = get_search_pool().submit(
+                platform, search_one, platform, query, browser_config, self.deadlines[platform], 1,
+                cancel_event=self.cancel_event
+            )
+        except SearchPoolSaturated:
+            logger.info(f"平台 {platform} 线程池已满，跳过对冲")
+            return
+        logger.info(f"平台 {platform} 超过p90耗时，启动对冲尝试")
+        self.future_to_platform[future] = platform
+        self.attempts[platform].append(future)
+    
+    def _finish(self, platform: str, result: str, now: float, hedged_win: bool = False) -> Dict[str, Any]:
+        """平台结束: 丢弃其余尝试"""
+        for future in self.attempts.pop(platform, []):
+            self.future_to_platform.pop(future, None)
+            future.cancel()
+        outcome = {
+            "platform": platform,
+            "result": result,
+            "status": _classify_result(result),
+            "latency": round(now - self.start, 3)
+        }
+        if platform in self.hedged:
+            outcome["hedged"] = True
+            outcome["hedge_won"] = hedged_win
+        return outcome
+    
+    def outcomes(self) -> Iterator[Dict[str, Any]]:
+        """按完成顺序产出各平台结果"""
+        while self.attempts:
+            now = time.monotonic()
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                # 取消: 排队中的任务立即移出线程池队列并释放名额；运行中的任务无法中断，结束当前尝试后才释放名额且不再重试
+                for platform in list(self.attempts):
+                    logger.info(f"平台 {platform} 搜索已取消")
+                    yield self._finish(platform, f"{CANCELLED_MARKER} {platform} 搜索已取消", now)
+                return
+            wake_times = [now + CANCEL_POLL_INTERVAL] if self.cancel_event is not None else []
+            for platform in self.attempts:
+                wake_times.append(self.deadlines[platform])
+                hedge_at = self._hedge_due(platform, now)
+                if hedge_at is not None:
+                    wake_times.append(hedge_at)
+            done, _ = concurrent.futures.wait(
+                list(self.future_to_platform), timeout=max(0.0, min(wake_times) - now),
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            now = time.monotonic()
+            
+            for future in done:
+                platform = self.future_to_platform.pop(future, None)
+                if platform is None or platform not in self.attempts:
+                    continue
+                attempts = self.attempts[platform]
+                attempts.remove(future)
+                try:
+                    platform_name, result = future.result()
+                    logger.info(f"平台 {platform} 结果收集完成")
+                except Exception as e:
+                    logger.error(f"平台 {platform} 结果收集失败: {e}")
+                    result = f"[执行异常] {e}"
+                # 失败但仍有其他尝试在进行时，继续等待
+                if _classify_result(result) != "success" and attempts:
+                    continue
+                yield self._finish(platform, result, now, hedged_win=future is not self.primary[platform])
+            
+            for platform in [p for p in self.attempts if self.deadlines[p] <= now]:
+                # 尚未开始的任务直接取消；已在运行的任务无法中断，放弃等待其结果
+                cancelled = all([f.cancel() for f in self.attempts[platform]])
+                logger.warning(f"平台 {platform} 超时，{'已取消' if cancelled else '放弃等待'}")
+                yield self._finish(platform, f"{TIMEOUT_MARKER} {platform} 超过时间预算", now)
+            
+            for platform in list(self.attempts):
+                hedge_at = self._hedge_due(platform, now)
+                started_at = getattr(self.primary[platform], "started_at", None)
+                if hedge_at is not None and hedge_at <= now and started_at is not None:
+                    self._start_hedge(platform)
+
+def iter_search_all(optimized_query: str, platforms: List[str],
+                    browser_config: Optional[Dict] = None,
+                    timeout: Optional[float] = None,
+                    cancel_event: Optional[threading.Event] = None) -> Iterator[Tuple[str, str]]:
+    """并行搜索所有平台，按完成顺序逐个产出 (平台, 结果)"""
+    outcomes = iter_search_outcomes(optimized_query, platforms, browser_config, timeout,
+                                    cancel_event=cancel_event)
+    return ((outcome["platform"], outcome["result"]) for outcome in outcomes)
+
+def search_all_detailed(optimized_query: str, platforms: List[str],
+                        browser_config: Optional[Dict] = None,
+                        timeout: Optional[float] = None,
+                        platform_timeouts: Optional[Dict[str, float]] = None,
+                        hedge: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """并行搜索所有平台，返回带耗时和超时标记的结果"""
+    return list(iter_search_outcomes(optimized_query, platforms, browser_config,
+                                     timeout, platform_timeouts, hedge))
+
+def search_all(optimized_query: str, platforms: List[str], 
+               browser_config: Optional[Dict] = None,
+               timeout: Optional[float] = None) -> List[Tuple[str, str]]:
+    """并行搜索所有平台"""
+    return list(iter_search_all(optimized_query, platforms, browser_config, timeout))
 
 def search_and_integrate(optimized_query: str, platforms: List[str],
                         llm_config: Optional[Dict] = None,
                         browser_config: Optional[Dict] = None,
                         enable_fact_check: bool = True,
-                        use_ai_integration: bool = True) -> Dict[str, Any]:
+                        use_ai_integration: bool = True,
+                        timeout: Optional[float] = None) -> Dict[str, Any]:
     """搜索并使用AI整合结果"""
     logger.info(f"开始搜索并整合，平台数: {len(platforms)}, AI整合: {use_ai_integration}")
     
     # 1. 执行搜索
-    search_results = search_all(optimized_query, platforms, browser_config)
+    outcomes = search_all_detailed(optimized_query, platforms, browser_config, timeout)
+    search_results = [(o["platform"], o["result"]) for o in outcomes]
+    platform_stats = [
+        {"platform": o["platform"], "status": o["status"], "latency": o["latency"]}
+        for o in outcomes
+    ]
     
     # 2. 过滤有效结果
     valid_results = []
@@ -116,7 +399,8 @@ def search_and_integrate(optimized_query: str, platforms: List[str],
                     "ai_integration_enabled": True,
                     "fact_check_enabled": enable_fact_check,
                     "valid_results_count": len(valid_results),
-                    "total_results_count": len(search_results)
+                    "total_results_count": len(search_results),
+                    "platform_stats": platform_stats
                 }
             }
             
@@ -145,11 +429,13 @@ def search_and_integrate(optimized_query: str, platforms: List[str],
                 "ai_integration_enabled": False,
                 "fact_check_enabled": False,
                 "valid_results_count": len(valid_results),
-                "total_results_count": len(search_results)
+                "total_results_count": len(search_results),
+                "platform_stats": platform_stats
             }
         }
 
 # 保持原有接口兼容性
-def search_all_legacy(optimized_query: str, platforms: List[str]) -> List[Tuple[str, str]]:
+def search_all_legacy(optimized_query: str, platforms: List[str],
+                      timeout: Optional[float] = None) -> List[Tuple[str, str]]:
     """保持原有接口兼容性"""
-    return search_all(optimized_query, platforms) 
\ No newline at end of file
+    return search_all(optimized_query, platforms, timeout=timeout) 
\ No newline at end of file
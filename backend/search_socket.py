@@ -0,0 +1,194 @@
+"""
+WebSocket搜索连接
+一个连接上提交、订阅、取消多个搜索，进度以紧凑帧多路复用推送，并对慢速客户端施加背压
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖，缺失时只支持JSON帧
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "30"))  # 发送队列持续满载超过该时间视为客户端过慢
+MAX_SUBSCRIPTIONS = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "64"))
+
+# 1013: Try Again Later，用于断开接收过慢的客户端
+CLOSE_TOO_SLOW = 1013
+
+
+def coalesce_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """合并同一平台连续的内容增量，客户端落后时减少帧数"""
+    frames: List[Dict[str, Any]] = []
+    for event in events:
+        last = frames[-1] if frames else None
+        if (last is not None and event["type"] == "content_delta" and last["type"] == "content_delta"
+                and last["platform"] == event["platform"]
+                and last["offset"] + len(last["delta"]) == event["offset"]):
+            frames[-1] = dict(last, seq=event["seq"], delta=last["delta"] + event["delta"])
+        else:
+            frames.append(event)
+    return frames
+
+
+class SearchSocket:
+    """单个WebSocket连接
+
+    客户端消息（JSON或msgpack）:
+    - {"op": "search", "ref": ..., "request": {...}, "subscribe": true}
+    - {"op": "subscribe", "search_id": ..., "since": 0}
+    - {"op": "unsubscribe", "search_id": ...}
+    - {"op": "cancel", "search_id": ...}
+    - {"op": "ping"}
+    服务端帧为搜索事件（带 search_id 和 seq）或 submitted/subscribed/cancelled/error/pong 应答
+    """
+
+    def __init__(self, websocket: WebSocket,
+                 submit: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 follow: Callable[[str, int], Optional[AsyncIterator[List[Dict[str, Any]]]]],
+                 cancel: Callable[[str], Awaitable[Dict[str, Any]]],
+                 binary: bool = False):
+        self.websocket = websocket
+        self._submit = submit
+        self._follow = follow
+        self._cancel = cancel
+        self.binary = binary and msgpack is not None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._subscriptions: Dict[str, asyncio.Task] = {}
+        self._closed = False
+
+    async def run(self):
+        """处理连接直到客户端断开"""
+        await self.websocket.accept()
+        writer = asyncio.create_task(self._writer())
+        await self._send({"type": "hello", "format": "msgpack" if self.binary else "json",
+                          "max_subscriptions": MAX_SUBSCRIPTIONS})
+        try:
+            while not self._closed:
+                message = await self._receive()
+                if message is None:
+                    continue
+                await self._dispatch(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            for task in self._subscriptions.values():
+                task.cancel()
+            writer.cancel()
+
+    async def _receive(self) -> Optional[Dict[str, Any]]:
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        try:
+            if message.get("bytes") is not None:
+                if msgpack is None:
+                    raise ValueError("服务端未安装msgpack")
+                data = msgpack.unpackb(message["bytes"], raw=False)
+            else:
+                data = json.loads(message.get("text") or "")
+            if not isinstance(data, dict):
+                raise ValueError("消息必须是对象")
+            return data
+        except ValueError as e:
+            await self._send({"type": "error", "error": f"无法解析消息: {e}"})
+            return None
+
+    async def _dispatch(self, message: Dict[str, Any]):
+        op = message.get("op")
+        ref = message.get("ref")
+        search_id = message.get("search_id")
+        try:
+            if op == "search":
+                ack = await self._submit(message.get("request") or {})
+                await self._send({"type": "submitted", "ref": ref, **ack})
+                if message.get("subscribe", True):
+                    await self._subscribe(ack["search_id"], 0, ref)
+            elif op == "subscribe":
+                await self._subscribe(search_id, int(message.get("since") or 0), ref)
+            elif op == "unsubscribe":
+                task = self._subscriptions.pop(search_id, None)
+                if task is not None:
+                    task.cancel()
+                await self._send({"type": "unsubscribed", "ref": ref, "search_id": search_id})
+            elif op == "cancel":
+                result = await self._cancel(search_id)
+                await self._send({"type": "cancelled", "ref": ref, "search_id": search_id, **result})
+            elif op == "ping":
+                await self._send({"type": "pong", "ref": ref})
+            else:
+                await self._send({"type": "error", "ref": ref, "error": f"未知操作: {op}"})
+        except HTTPException as e:
+            frame = {"type": "error", "ref": ref, "search_id": search_id,
+                     "status_code": e.status_code, "error": e.detail}
+            if e.headers and "Retry-After" in e.headers:
+                frame["retry_after"] = int(e.headers["Retry-After"])
+            await self._send(frame)
+        except (ValueError, TypeError) as e:
+            await self._send({"type": "error", "ref": ref, "search_id": search_id, "error": str(e)})
+
+    async def _subscribe(self, search_id: Optional[str], since: int, ref: Any):
+        if not search_id:
+            raise ValueError("缺少search_id")
+        if search_id in self._subscriptions:
+            return
+        if len(self._subscriptions) >= MAX_SUBSCRIPTIONS:
+            raise ValueError(f"订阅数超过上限 {MAX_SUBSCRIPTIONS}")
+        events = self._follow(search_id, since)
+        if events is None:
+            raise HTTPException(status_code=404, detail="搜索ID不存在")
+        self._subscriptions[search_id] = asyncio.create_task(self._pump(search_id, events))
+        await self._send({"type": "subscribed", "ref": ref, "search_id": search_id})
+
+    async def _pump(self, search_id: str, events: AsyncIterator[List[Dict[str, Any]]]):
+        """把单个搜索的事件转发到发送队列，队列满时等待（背压）"""
+        try:
+            async for batch in events:
+                for frame in coalesce_events(batch):
+                    await self._send(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"推送搜索事件失败 {search_id}: {e}")
+            await self._send({"type": "error", "search_id": search_id, "error": str(e)})
+        finally:
+            if self._subscriptions.get(search_id) is asyncio.current_task():
+                del self._subscriptions[search_id]
+
+    async def _send(self, frame: Dict[str, Any]):
+        """放入发送队列，客户端长时间不接收时断开连接"""
+        if self._closed:
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(frame), SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("WebSocket客户端接收过慢，断开连接")
+            self._closed = True
+            await self.websocket.close(code=CLOSE_TOO_SLOW)
+
+    async def _writer(self):
+        try:
+            while True:
+                frame = await self._queue.get()
+                if self.binary:
+                    await self.websocket.send_bytes(msgpack.packb(frame, use_bin_type=True))
+                else:
+                    await self.websocket.send_text(json.dumps(frame, ensure_ascii=False, separators=(",", ":")))
+        except (WebSocketDisconnect, RuntimeError):
+            self._closed = True
+
+
+__all__ = [
+    "SearchSocket",
+    "coalesce_events",
+]
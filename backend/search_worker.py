@@ -0,0 +1,198 @@
+"""
+搜索worker
+从任务队列领取搜索任务并执行，定期续租；任务被请求取消或租约丢失时中止执行。
+既可以嵌入API进程运行，也可以作为独立进程横向扩展:
+    python -m backend.search_worker --concurrency 4
+独立进程需要与API共享任务队列和状态存储（相同的 JOB_QUEUE_DB，不能使用内存队列；STATUS_STORE_BACKEND=sqlite/redis）
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from backend.job_queue import CANCELLED, DEFAULT_VISIBILITY_TIMEOUT, Job, create_job_queue, run_queue_call
+
+logger = logging.getLogger(__name__)
+
+SEARCH_JOB = "search"
+
+DEFAULT_CONCURRENCY = int(os.getenv("SEARCH_WORKER_CONCURRENCY", "4"))
+POLL_INTERVAL = float(os.getenv("SEARCH_WORKER_POLL_INTERVAL", "1.0"))  # 队列为空时的轮询间隔
+RETRY_DELAY = 5.0  # 任务异常后重新排队的延迟
+PURGE_INTERVAL = 600.0  # 清理已结束任务的间隔
+
+
+class SearchWorkerPool:
+    """固定并发的worker池
+
+    run_job(job) 执行单个任务；正常返回即确认完成，抛出异常按重试次数重新排队，
+    被取消（CancelledError）时记为已取消并调用 on_cancelled(job)
+    """
+
+    def __init__(self, queue, run_job: Callable[[Job], Awaitable[Any]],
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 visibility_timeout: Optional[float] = None,
+                 worker_id: Optional[str] = None,
+                 kinds=(SEARCH_JOB,),
+                 on_cancelled: Optional[Callable[[Job], Any]] = None):
+        self.queue = queue
+        self.run_job = run_job
+        self.on_cancelled = on_cancelled
+        self.concurrency = max(1, concurrency)
+        self.visibility_timeout = visibility_timeout or DEFAULT_VISIBILITY_TIMEOUT
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.kinds = kinds
+        self._slots: Set[asyncio.Task] = set()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_purge = 0.0
+
+    def start(self):
+        """在当前事件循环中启动worker"""
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        for slot in range(self.concurrency):
+            task = asyncio.create_task(self._loop(slot))
+            self._slots.add(task)
+            task.add_done_callback(self._slots.discard)
+        logger.info(f"搜索worker已启动: {self.worker_id} (并发 {self.concurrency})")
+
+    async def stop(self):
+        """停止领取新任务并取消正在执行的任务（租约到期后由其他worker重新执行）"""
+        self._stopping = True
+        for task in list(self._slots) + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._slots, return_exceptions=True)
+
+    def notify(self):
+        """有新任务入队，唤醒空闲worker"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def busy(self) -> int:
+        return len(self._running)
+
+    async def _loop(self, slot: int):
+        while not self._stopping:
+            try:
+                job = await self._call(self.queue.lease, self.worker_id, self.kinds, self.visibility_timeout)
+            except Exception as e:
+                logger.error(f"领取任务失败: {e}")
+                job = None
+            if job is None:
+                if slot == 0:
+                    await self._purge()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(job)
+
+    async def _call(self, fn, *args):
+        return await run_queue_call(self.queue, fn, *args)
+
+    async def _purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            purged = await self._call(self.queue.purge)
+            if purged:
+                logger.info(f"已清理 {purged} 个结束的任务")
+        except Exception as e:
+            logger.warning(f"清理任务失败: {e}")
+
+    async def _execute(self, job: Job):
+        task = asyncio.create_task(self.run_job(job))
+        self._running[job.id] = task
+        heartbeat = asyncio.create_task(self._heartbeat(job, task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            if self._stopping:
+                # worker退出，保留租约让任务在到期后被重新领取
+                raise
+            logger.info(f"任务已取消: {job.id}")
+            await self._call(self.queue.complete, job.id, self.worker_id, CANCELLED, "任务已取消")
+            if self.on_cancelled is not None:
+                self.on_cancelled(job)
+        except Exception as e:
+            logger.error(f"任务执行失败 {job.id} (第{job.attempts}次): {e}")
+            await self._call(self.queue.fail, job.id, self.worker_id, str(e), RETRY_DELAY)
+        else:
+            await self._call(self.queue.complete, job.id, self.worker_id)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job.id, None)
+
+    async def _heartbeat(self, job: Job, task: asyncio.Task):
+        """定期续租，任务被请求取消或租约被其他worker接管时中止执行"""
+        interval = max(0.5, self.visibility_timeout / 3)
+        while not task.done():
+            await asyncio.sleep(interval)
+            try:
+                alive = await self._call(self.queue.heartbeat, job.id, self.worker_id, self.visibility_timeout)
+            except Exception as e:
+                logger.warning(f"任务续租失败 {job.id}: {e}")
+                continue
+            if not alive:
+                logger.info(f"任务 {job.id} 被请求取消或租约已失效，中止执行")
+                task.cancel()
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "busy": len(self._running),
+        }
+
+
+async def _serve(concurrency: int):
+    # 延迟导入，复用API中的搜索实现和共享的状态存储
+    from backend import enhanced_api
+
+    if enhanced_api.search_status_store.backend.name == "memory":
+        logger.warning("状态存储为内存后端，API进程无法看到独立worker写入的搜索状态，"
+                       "请设置 STATUS_STORE_BACKEND=sqlite 或 redis")
+    queue = create_job_queue()
+    if queue.name == "memory":
+        raise RuntimeError("独立worker需要与API共享任务队列，请使用SQLite队列（JOB_QUEUE_BACKEND=sqlite）和相同的 JOB_QUEUE_DB")
+    pool = SearchWorkerPool(queue, enhanced_api.run_search_job, concurrency,
+                            on_cancelled=enhanced_api.mark_search_cancelled)
+    pool.start()
+    try:
+        await asyncio.gather(*pool._slots)
+    finally:
+        await pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索worker进程")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同时执行的搜索数")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args.concurrency))
+    except KeyboardInterrupt:
+        logger.info("搜索worker已退出")
+
+
+__all__ = [
+    "SearchWorkerPool",
+    "SEARCH_JOB",
+]
+
+
+if __name__ == "__main__":
+    main()
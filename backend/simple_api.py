@@ -3,7 +3,7 @@
 专注于核心的多平台搜索聚合功能
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -11,14 +11,16 @@ import logging
 import asyncio
 import json
 import os
+import uuid
 from datetime import datetime
 
 # 导入核心模块
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from core.stream_aggregator import MultiPlatformStreamAggregator
+from core.stream_aggregator import AGGREGATOR_MAX_WORKERS, AggregationSession, AggregatorEngine
 from ragflow_utils.simple_aggregator import aggregate_platform_results
+from backend.admission import AdmissionController, RateLimiter, Rejected
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +47,10 @@ class SearchRequest(BaseModel):
     platforms: List[str] = ["DeepSeek", "Kimi", "智谱清言"]
     enable_ai_processing: bool = False
     ai_config: Optional[Dict[str, Any]] = None
+    search_id: Optional[str] = None  # 由客户端指定时可用于 /stop 停止本次搜索
+
+class StopRequest(BaseModel):
+    search_id: str
 
 class SearchResponse(BaseModel):
     query: str
@@ -54,6 +60,8 @@ class SearchResponse(BaseModel):
     processing_time: str
     source_count: int
     success: bool
+    search_id: Optional[str] = None
+    stopped: bool = False
 
 class HealthResponse(BaseModel):
     status: str
@@ -61,7 +69,12 @@ class HealthResponse(BaseModel):
     timestamp: str
 
 # 全局变量
-aggregator = MultiPlatformStreamAggregator()
+aggregator_engine = AggregatorEngine()  # 只读共享，每次搜索创建独立会话
+active_sessions: Dict[str, AggregationSession] = {}
+rate_limiter = RateLimiter()
+# 容量与聚合器线程池一致，排队超过上限时返回429
+search_admission = AdmissionController("simple", slots=AGGREGATOR_MAX_WORKERS,
+                                       max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "5")))
 
 @app.get("/", response_model=HealthResponse)
 async def health_check():
@@ -73,8 +86,22 @@ async def health_check():
     )
 
 @app.post("/search", response_model=SearchResponse)
-async def search_platforms(request: SearchRequest):
+async def search_platforms(request: SearchRequest, http_request: Request):
     """多平台搜索聚合"""
+    rate_limiter.check(http_request)
+    try:
+        with search_admission.track():
+            # 平台搜索在聚合器线程池中执行，等待时不阻塞事件循环（健康检查、/stop 等请求仍可响应）
+            return await _run_search(request)
+    except Rejected as e:
+        raise e.to_http()
+
+async def _run_search(request: SearchRequest) -> SearchResponse:
+    search_id = request.search_id or uuid.uuid4().hex
+    if search_id in active_sessions:
+        raise HTTPException(status_code=409, detail=f"搜索ID已在执行: {search_id}")
+    session = aggregator_engine.new_session(search_id)
+    active_sessions[search_id] = session
     try:
         logger.info(f"开始搜索: {request.query}")
         logger.info(f"目标平台: {request.platforms}")
@@ -82,7 +109,7 @@ async def search_platforms(request: SearchRequest):
         # 启动流式聚合
         ai_config = request.ai_config if request.enable_ai_processing else None
         
-        result = aggregator.start_aggregation(
+        result = await session.start_aggregation_async(
             platforms=request.platforms,
             query=request.query,
             ai_processor_config=ai_config
@@ -101,15 +128,19 @@ async def search_platforms(request: SearchRequest):
             aggregated_content=aggregated_content,
             processing_time=result["processing_time"],
             source_count=len(result["stream_results"]),
-            success=True
+            success=not result["stopped"],
+            search_id=search_id,
+            stopped=result["stopped"]
         )
         
     except Exception as e:
         logger.error(f"搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
+    finally:
+        active_sessions.pop(search_id, None)
 
 @app.post("/quick-search")
-async def quick_search(query: str, platforms: Optional[str] = None):
+async def quick_search(http_request: Request, query: str, platforms: Optional[str] = None):
     """快速搜索接口"""
     try:
         platform_list = platforms.split(",") if platforms else ["DeepSeek"]
@@ -120,8 +151,10 @@ async def quick_search(query: str, platforms: Optional[str] = None):
             enable_ai_processing=False
         )
         
-        return await search_platforms(request)
+        return await search_platforms(request, http_request)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"快速搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"快速搜索失败: {str(e)}")
@@ -182,11 +215,14 @@ async def get_platforms():
     return platforms
 
 @app.post("/stop")
-async def stop_search():
-    """停止当前搜索"""
+async def stop_search(request: StopRequest):
+    """停止指定的搜索，不影响其他进行中的搜索"""
+    session = active_sessions.get(request.search_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="搜索不存在或已结束")
     try:
-        aggregator.stop_aggregation()
-        return {"success": True, "message": "搜索已停止"}
+        session.stop()
+        return {"success": True, "message": "搜索已停止", "search_id": request.search_id}
     except Exception as e:
         logger.error(f"停止搜索失败: {e}")
         raise HTTPException(status_code=500, detail=f"停止搜索失败: {str(e)}")
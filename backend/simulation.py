@@ -0,0 +1,173 @@
+"""
+模拟模式引擎
+按平台配置各阶段（连接、思考、逐块输出、一次性响应）的延迟分布，所有等待乘以时间系数；
+时间系数为0时不等待（只让出事件循环），模拟搜索可用于压测服务本身的开销
+
+环境变量:
+    SIMULATION_TIME_SCALE=1.0   时间系数，0表示不等待
+    SIMULATION_SEED=42          固定随机种子，便于复现
+    SIMULATION_PROFILES=...     平台延迟配置，JSON字符串或JSON文件路径，例如
+        {"DeepSeek": {"connect": {"dist": "lognormal", "mean": 1.2, "sigma": 0.3}}}
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("connect", "think", "chunk", "response")
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """单个阶段的延迟分布（秒）
+
+    fixed: 恒为 mean；uniform: [low, high]；normal: mean±sigma；
+    lognormal: 中位数为 mean、对数标准差为 sigma 的长尾分布；exponential: 均值为 mean
+    结果限制在 [low, high] 之间
+    """
+    dist: str = "fixed"
+    mean: float = 0.0
+    sigma: float = 0.0
+    low: float = 0.0
+    high: Optional[float] = None
+
+    def sample(self, rng: random.Random) -> float:
+        if self.dist == "uniform":
+            value = rng.uniform(self.low, self.high if self.high is not None else self.mean)
+        elif self.dist == "normal":
+            value = rng.gauss(self.mean, self.sigma)
+        elif self.dist == "lognormal":
+            value = self.mean * math.exp(rng.gauss(0.0, self.sigma)) if self.mean > 0 else 0.0
+        elif self.dist == "exponential":
+            value = rng.expovariate(1.0 / self.mean) if self.mean > 0 else 0.0
+        else:
+            value = self.mean
+        value = max(self.low, value)
+        return min(self.high, value) if self.high is not None else value
+
+    @classmethod
+    def parse(cls, spec: Any) -> "LatencyModel":
+        """从数字（固定延迟）或 {"dist": ..., "mean": ...} 配置创建"""
+        if isinstance(spec, (int, float)):
+            return cls(mean=float(spec))
+        if isinstance(spec, LatencyModel):
+            return spec
+        dist = spec.get("dist", "fixed")
+        if dist not in DISTRIBUTIONS:
+            raise ValueError(f"未知的延迟分布: {dist}")
+        return cls(dist=dist, mean=float(spec.get("mean", 0.0)), sigma=float(spec.get("sigma", 0.0)),
+                   low=float(spec.get("low", 0.0)),
+                   high=float(spec["high"]) if spec.get("high") is not None else None)
+
+
+@dataclass(frozen=True)
+class PlatformProfile:
+    """一个平台各阶段的延迟，以及模拟失败的概率"""
+    connect: LatencyModel = LatencyModel(mean=1.0)  # 连接平台
+    think: LatencyModel = LatencyModel(mean=1.0)  # 分析问题到开始输出
+    chunk: LatencyModel = LatencyModel(mean=0.3)  # 每个输出块
+    response: LatencyModel = LatencyModel(mean=1.0)  # 一次性返回完整回答（同步/批量搜索）
+    failure_rate: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: Dict[str, Any], base: Optional["PlatformProfile"] = None) -> "PlatformProfile":
+        base = base or cls()
+        fields = {phase: LatencyModel.parse(spec[phase]) if phase in spec else getattr(base, phase)
+                  for phase in PHASES}
+        return cls(failure_rate=float(spec.get("failure_rate", base.failure_rate)), **fields)
+
+
+# 默认配置与原有的固定延时一致（连接1s、分析0.5s+生成0.5s、每块0.3s、一次性响应1s）
+DEFAULT_PROFILE = PlatformProfile()
+
+
+class SimulatedFailure(Exception):
+    """按 failure_rate 模拟的平台失败"""
+
+
+def _load_profiles(spec: Optional[str]) -> Dict[str, PlatformProfile]:
+    if not spec:
+        return {}
+    try:
+        if os.path.isfile(spec):
+            with open(spec, encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = json.loads(spec)
+        default = PlatformProfile.parse(data.pop("default", {}))
+        profiles = {platform: PlatformProfile.parse(item, default) for platform, item in data.items()}
+        profiles["default"] = default
+        return profiles
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        logger.warning(f"忽略无效的模拟延迟配置: {e}")
+        return {}
+
+
+class SimulationEngine:
+    """模拟平台的延迟与失败"""
+
+    def __init__(self, time_scale: float = 1.0, profiles: Optional[Dict[str, PlatformProfile]] = None,
+                 seed: Optional[int] = None):
+        self.time_scale = max(0.0, time_scale)
+        self.profiles: Dict[str, PlatformProfile] = dict(profiles or {})
+        self._rng = random.Random(seed)
+
+    def profile(self, platform: str) -> PlatformProfile:
+        return self.profiles.get(platform) or self.profiles.get("default") or DEFAULT_PROFILE
+
+    def latency(self, platform: str, phase: str) -> float:
+        """采样某平台某阶段的延迟（已乘时间系数）"""
+        return getattr(self.profile(platform), phase).sample(self._rng) * self.time_scale
+
+    async def sleep(self, seconds: float):
+        """按时间系数等待固定时长，系数为0时只让出事件循环"""
+        await asyncio.sleep(seconds * self.time_scale)
+
+    async def wait(self, platform: str, phase: str):
+        """等待某平台某阶段的模拟延迟"""
+        await asyncio.sleep(self.latency(platform, phase))
+
+    async def wait_all(self, platforms: Iterable[str], phase: str):
+        """多个平台并发执行同一阶段，等待最慢的平台"""
+        delays = [self.latency(platform, phase) for platform in platforms]
+        await asyncio.sleep(max(delays, default=0.0))
+
+    def check_failure(self, platform: str):
+        """按配置的失败率抛出 SimulatedFailure"""
+        rate = self.profile(platform).failure_rate
+        if rate > 0 and self._rng.random() < rate:
+            raise SimulatedFailure(f"{platform} 模拟失败")
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "time_scale": self.time_scale,
+            "profiles": {platform: asdict(profile) for platform, profile in self.profiles.items()},
+            "default": asdict(DEFAULT_PROFILE),
+        }
+
+
+def create_simulation_engine() -> SimulationEngine:
+    """按环境变量创建模拟引擎"""
+    seed = os.getenv("SIMULATION_SEED")
+    return SimulationEngine(
+        time_scale=float(os.getenv("SIMULATION_TIME_SCALE", "1.0")),
+        profiles=_load_profiles(os.getenv("SIMULATION_PROFILES")),
+        seed=int(seed) if seed else None,
+    )
+
+
+__all__ = [
+    "LatencyModel",
+    "PlatformProfile",
+    "SimulatedFailure",
+    "SimulationEngine",
+    "create_simulation_engine",
+]
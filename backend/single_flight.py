@@ -0,0 +1,99 @@
+"""
+相同请求合并（single-flight）
+同一个键同时只执行一次，后到的调用方等待并共享正在进行的结果
+"""
+
+import asyncio
+import collections
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Future"):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    """协程级请求合并
+
+    - 每个调用方使用自己的超时，超时只影响自己
+    - 所有调用方都放弃等待后才取消底层任务
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._counters = collections.Counter()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]],
+                 timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """执行或加入执行，返回 (结果, 是否与其他调用共享)"""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self._counters["executions"] += 1
+        else:
+            self._counters["coalesced"] += 1
+        call.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(call.task), timeout), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._calls),
+            "executions": self._counters["executions"],
+            "coalesced": self._counters["coalesced"],
+        }
+
+
+class InflightRegistry:
+    """记录正在进行的后台搜索 (键 -> search_id)，供后到的相同请求直接复用"""
+
+    def __init__(self):
+        self._searches: Dict[str, str] = {}
+        self._counters = collections.Counter()
+
+    def attach(self, key: str) -> Optional[str]:
+        """查找正在进行的相同搜索"""
+        search_id = self._searches.get(key)
+        if search_id is not None:
+            self._counters["coalesced"] += 1
+        return search_id
+
+    def register(self, key: str, search_id: str):
+        self._searches[key] = search_id
+        self._counters["executions"] += 1
+
+    def release(self, key: str, search_id: str):
+        """搜索结束后移除（只移除自己登记的记录）"""
+        if self._searches.get(key) == search_id:
+            del self._searches[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._searches),
+            "executions": self._counters["executions"],
+            "coalesced": self._counters["coalesced"],
+        }
+
+
+__all__ = [
+    "AsyncSingleFlight",
+    "InflightRegistry",
+]
@@ -0,0 +1,551 @@
+"""
+搜索状态存储
+有界、按完成时间过期、LRU淘汰并统计内存占用，后端可选内存/SQLite/Redis兼容服务
+"""
+
+import atexit
+import collections
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from backend.content_buffer import ContentBuffer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("STATUS_MAX_ENTRIES", "1000"))
+DEFAULT_MAX_BYTES = int(os.getenv("STATUS_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_TTL = float(os.getenv("STATUS_TTL", "3600"))  # 完成后保留的秒数
+DEFAULT_MAX_AGE = float(os.getenv("STATUS_MAX_AGE", "21600"))  # 长时间未完成的状态视为遗弃
+SWEEP_INTERVAL = 30.0
+# SQLite/Redis后端合并写入的间隔（秒）：运行中的高频更新在间隔内只写一次，0表示每次更新都写入
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("STATUS_FLUSH_INTERVAL", "0.5"))
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算状态对象占用的字节数（以字符串内容为主）"""
+    if isinstance(value, str):
+        return len(value) + 49
+    if isinstance(value, ContentBuffer):
+        return value.memory_chars() + 49
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(estimate_size(v) for v in value)
+    return 28
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class MemoryStatusBackend:
+    """进程内存后端 - 直接保存对象，更新为原地修改"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._data.get(key)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        self._data[key] = value
+
+    def patch(self, key: str, fields: Dict[str, Any], ttl: Optional[float] = None) -> bool:
+        value = self._data.get(key)
+        if value is None:
+            return False
+        value.update(fields)
+        return True
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SQLiteStatusBackend:
+    """SQLite后端 - 状态按顶层字段分别序列化保存，可在多个进程间共享
+
+    patch 只写入变化的字段（单个事务），不读出和重写整个状态
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS status_entries (key TEXT PRIMARY KEY, expires_at REAL);"
+            "CREATE TABLE IF NOT EXISTS status_fields "
+            "(key TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (key, field));"
+        )
+        self._db.commit()
+
+    def _alive(self, key: str) -> bool:
+        return self._db.execute(
+            "SELECT 1 FROM status_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone() is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._alive(key):
+                return None
+            rows = self._db.execute("SELECT field, value FROM status_fields WHERE key = ?", (key,)).fetchall()
+        return {field: json.loads(value) for field, value in rows}
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        rows = [(key, field, _dumps(item)) for field, item in value.items()]
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM status_fields WHERE key = ?", (key,))
+            self._db.execute("INSERT OR REPLACE INTO status_entries (key, expires_at) VALUES (?, ?)",
+                             (key, expires_at))
+            self._db.executemany("INSERT INTO status_fields (key, field, value) VALUES (?, ?, ?)", rows)
+
+    def patch(self, key: str, fields: Dict[str, Any], ttl: Optional[float] = None) -> bool:
+        rows = [(key, field, _dumps(item)) for field, item in fields.items()]
+        with self._lock, self._db:
+            if not self._alive(key):
+                return False
+            self._db.executemany("INSERT OR REPLACE INTO status_fields (key, field, value) VALUES (?, ?, ?)", rows)
+            if ttl:
+                self._db.execute("UPDATE status_entries SET expires_at = ? WHERE key = ?", (time.time() + ttl, key))
+        return True
+
+    def purge_expired(self):
+        """删除过期记录（包括其他进程遗留的记录）"""
+        with self._lock, self._db:
+            now = time.time()
+            self._db.execute("DELETE FROM status_fields WHERE key IN "
+                             "(SELECT key FROM status_entries WHERE expires_at <= ?)", (now,))
+            self._db.execute("DELETE FROM status_entries WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM status_fields WHERE key = ?", (key,))
+            self._db.execute("DELETE FROM status_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM status_fields")
+            self._db.execute("DELETE FROM status_entries")
+
+
+# 键存在时才写入字段并刷新过期时间，保证部分更新不会与并发的其他更新互相覆盖或重建已过期的状态
+_REDIS_PATCH_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+if tonumber(ARGV[1]) > 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class RedisStatusBackend:
+    """Redis兼容服务后端（Redis/KeyDB/Dragonfly等），过期交给服务端处理
+
+    状态保存为哈希（每个顶层字段一项），patch 通过Lua脚本原子地只写入变化的字段；
+    需要安装可选依赖 redis
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "search_status:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("使用Redis状态存储需要安装redis: pip install redis") from e
+        self._client = redis.Redis.from_url(url)
+        self._patch_script = self._client.register_script(_REDIS_PATCH_SCRIPT)
+        self._prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return self._prefix + key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self._client.hgetall(self._key(key))
+        if not data:
+            return None
+        return {field.decode("utf-8"): json.loads(value) for field, value in data.items()}
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        name = self._key(key)
+        pipe = self._client.pipeline(transaction=True)
+        pipe.delete(name)
+        pipe.hset(name, mapping={field: _dumps(item) for field, item in value.items()})
+        if ttl:
+            pipe.pexpire(name, int(ttl * 1000))
+        pipe.execute()
+
+    def patch(self, key: str, fields: Dict[str, Any], ttl: Optional[float] = None) -> bool:
+        args: List[Any] = [int(ttl * 1000) if ttl else 0]
+        for field, item in fields.items():
+            args.extend((field, _dumps(item)))
+        return bool(self._patch_script(keys=[self._key(key)], args=args))
+
+    def delete(self, key: str):
+        self._client.delete(self._key(key))
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + "*"):
+            self._client.delete(key)
+
+
+class _Pending:
+    __slots__ = ("value", "dirty", "ttl", "since")
+
+    def __init__(self, value: Dict[str, Any], since: float):
+        self.value = value  # 合并了未写入字段的完整状态
+        self.dirty: Dict[str, Any] = {}
+        self.ttl: Optional[float] = None
+        self.since = since
+
+
+class BufferedStatusBackend:
+    """合并持久化后端的高频更新
+
+    流式搜索每个输出块都会更新状态；运行中的更新在 interval 内合并（同一字段只写最新值），
+    每个间隔只读取一次完整状态、写入一次变化的字段；进入终态、整体写入或删除时立即落盘。
+    本进程读取时返回合并后的状态，其他进程看到的更新最多滞后一个间隔（输出暂停时滞后到下一次更新）
+    """
+
+    def __init__(self, backend, interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.backend = backend
+        self.name = backend.name
+        self.interval = interval
+        self._lock = threading.RLock()
+        self._pending: Dict[str, _Pending] = {}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending.value
+        return self.backend.get(key)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        with self._lock:
+            self._pending.pop(key, None)
+            self.backend.set(key, value, ttl)
+
+    def patch(self, key: str, fields: Dict[str, Any], ttl: Optional[float] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                value = self.backend.get(key)
+                if value is None:
+                    return False
+                pending = self._pending[key] = _Pending(value, now)
+            pending.value.update(fields)
+            pending.dirty.update(fields)
+            if ttl:
+                pending.ttl = ttl
+            if fields.get("status") in TERMINAL_STATES or now - pending.since >= self.interval:
+                return self._flush(key)
+            return True
+
+    def _flush(self, key: str) -> bool:
+        pending = self._pending.pop(key, None)
+        if pending is None or not pending.dirty:
+            return pending is not None
+        return self.backend.patch(key, pending.dirty, pending.ttl)
+
+    def flush(self):
+        """写入所有尚未落盘的更新"""
+        with self._lock:
+            for key in list(self._pending):
+                self._flush(key)
+
+    def purge_expired(self):
+        purge = getattr(self.backend, "purge_expired", None)
+        if purge is not None:
+            purge()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+            self.backend.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self.backend.clear()
+
+
+class _Meta:
+    __slots__ = ("created_at", "finished_at", "size")
+
+    def __init__(self, created_at: float):
+        self.created_at = created_at
+        self.finished_at: Optional[float] = None
+        self.size = 0
+
+
+class StatusStore:
+    """搜索状态存储
+
+    - 条目数超过 max_entries 或估算内存超过 max_bytes 时，优先淘汰最久未访问的已完成状态
+    - 已完成的状态在 ttl 秒后过期，长时间未完成的状态在 max_age 秒后过期
+    - 运行中的状态在完成时才计入内存统计，避免每次更新都遍历整个结果
+    """
+
+    def __init__(self, backend=None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.backend = backend or MemoryStatusBackend()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_age = max_age
+
+        self._lock = threading.RLock()
+        self._meta: "collections.OrderedDict[str, _Meta]" = collections.OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self._counters = collections.Counter()
+
+    # 字典风格访问，便于替换原有的全局字典
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Dict[str, Any]):
+        self.set(key, value)
+
+    def __delitem__(self, key: str):
+        if not self.delete(key):
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._meta)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取状态（刷新LRU顺序）
+
+        共享后端中由其他进程写入的状态在首次读取时纳入本进程的索引
+        """
+        now = time.monotonic()
+        with self._lock:
+            meta = self._meta.get(key)
+            if meta is not None and self._expired(meta, now):
+                self._remove(key, "expired")
+                meta = None
+            elif meta is not None:
+                self._meta.move_to_end(key)
+            value = self.backend.get(key)
+            if value is None:
+                if meta is not None:
+                    self._remove(key, None)
+                self._counters["misses"] += 1
+                return default
+            if meta is None:
+                meta = self._meta[key] = _Meta(now)
+                self._track(key, meta, value, now)
+            self._counters["hits"] += 1
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """写入完整状态"""
+        now = time.monotonic()
+        with self._lock:
+            meta = self._meta.get(key)
+            if meta is None:
+                meta = self._meta[key] = _Meta(now)
+            self._meta.move_to_end(key)
+            self.backend.set(key, value, self._backend_ttl(value))
+            self._track(key, meta, value, now)
+            self._maybe_sweep(now)
+
+    def patch(self, key: str, fields: Dict[str, Any]) -> bool:
+        """合并更新部分字段，状态不存在（已过期或被淘汰）时返回False"""
+        now = time.monotonic()
+        with self._lock:
+            meta = self._meta.get(key)
+            if meta is not None and self._expired(meta, now):
+                self._remove(key, "expired")
+                return False
+            if not self.backend.patch(key, fields, self._backend_ttl(fields)):
+                if meta is not None:
+                    self._remove(key, None)
+                return False
+            if meta is None:
+                meta = self._meta[key] = _Meta(now)
+            status = fields.get("status")
+            if status in TERMINAL_STATES or (status is None and meta.finished_at is not None):
+                # 只在终态时读取完整状态计算占用，运行中的更新不需要读回
+                self._track(key, meta, self.backend.get(key) or fields, now)
+            else:
+                self._track(key, meta, fields, now)
+            self._maybe_sweep(now)
+            return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            exists = key in self._meta or self.backend.get(key) is not None
+            self._remove(key, None)
+            return exists
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        value = self.get(key, default)
+        self.delete(key)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._meta.clear()
+            self._bytes = 0
+            self.backend.clear()
+
+    def sweep(self) -> int:
+        """清理过期状态，返回清理数量"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_sweep = now
+            return self._sweep(now)
+
+    def stats(self) -> Dict[str, Any]:
+        """状态存储统计"""
+        with self._lock:
+            finished = sum(1 for meta in self._meta.values() if meta.finished_at is not None)
+            return {
+                "backend": self.backend.name,
+                "entries": len(self._meta),
+                "running": len(self._meta) - finished,
+                "finished": finished,
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._counters["hits"],
+                "misses": self._counters["misses"],
+                "evicted_lru": self._counters["evicted_lru"],
+                "evicted_memory": self._counters["evicted_memory"],
+                "expired": self._counters["expired"],
+            }
+
+    def _backend_ttl(self, value: Dict[str, Any]) -> Optional[float]:
+        """交给后端的过期时间（Redis等支持服务端过期的后端使用），不含状态的部分更新保持原过期时间"""
+        status = value.get("status")
+        if status is None:
+            return None
+        if status in TERMINAL_STATES:
+            return self.ttl
+        return self.max_age
+
+    def _expired(self, meta: _Meta, now: float) -> bool:
+        if meta.finished_at is not None:
+            return now - meta.finished_at >= self.ttl
+        return now - meta.created_at >= self.max_age
+
+    def _track(self, key: str, meta: _Meta, value: Dict[str, Any], now: float):
+        """状态进入终态时记录完成时间和占用，并按容量淘汰（需持有锁）"""
+        if value.get("status") in TERMINAL_STATES:
+            if meta.finished_at is None:
+                meta.finished_at = now
+            size = estimate_size(value)
+            self._bytes += size - meta.size
+            meta.size = size
+        else:
+            meta.finished_at = None
+        self._evict(protect=key)
+
+    def _evict(self, protect: str):
+        while len(self._meta) > self.max_entries:
+            if not self._evict_one(protect, "evicted_lru"):
+                break
+        while self._bytes > self.max_bytes:
+            if not self._evict_one(protect, "evicted_memory"):
+                break
+
+    def _evict_one(self, protect: str, reason: str) -> bool:
+        """淘汰最久未访问的已完成状态，没有时淘汰最久未访问的状态"""
+        victim = next((key for key, meta in self._meta.items()
+                       if meta.finished_at is not None and key != protect), None)
+        if victim is None:
+            victim = next((key for key in self._meta if key != protect), None)
+        if victim is None:
+            return False
+        self._remove(victim, reason)
+        return True
+
+    def _remove(self, key: str, reason: Optional[str]):
+        meta = self._meta.pop(key, None)
+        if meta is not None:
+            self._bytes -= meta.size
+        self.backend.delete(key)
+        if reason:
+            self._counters[reason] += 1
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep >= SWEEP_INTERVAL:
+            self._last_sweep = now
+            self._sweep(now)
+
+    def _sweep(self, now: float) -> int:
+        expired = [key for key, meta in self._meta.items() if self._expired(meta, now)]
+        for key in expired:
+            self._remove(key, "expired")
+        purge = getattr(self.backend, "purge_expired", None)
+        if purge is not None:
+            purge()
+        return len(expired)
+
+
+def create_status_store() -> StatusStore:
+    """按环境变量创建状态存储: STATUS_STORE_BACKEND=memory/sqlite/redis"""
+    backend_name = os.getenv("STATUS_STORE_BACKEND", "memory").lower()
+    if backend_name == "sqlite":
+        backend = SQLiteStatusBackend(os.getenv("STATUS_STORE_DB", "search_status.db"))
+    elif backend_name == "redis":
+        backend = RedisStatusBackend(os.getenv("STATUS_STORE_REDIS_URL", "redis://127.0.0.1:6379/0"))
+    elif backend_name == "memory":
+        backend = MemoryStatusBackend()
+    else:
+        raise ValueError(f"不支持的状态存储后端: {backend_name}")
+    logger.info(f"搜索状态存储后端: {backend.name}")
+    if backend_name != "memory" and DEFAULT_FLUSH_INTERVAL > 0:
+        backend = BufferedStatusBackend(backend, DEFAULT_FLUSH_INTERVAL)
+        atexit.register(backend.flush)
+    return StatusStore(backend)
+
+
+__all__ = [
+    "StatusStore",
+    "MemoryStatusBackend",
+    "SQLiteStatusBackend",
+    "RedisStatusBackend",
+    "BufferedStatusBackend",
+    "create_status_store",
+    "estimate_size",
+    "TERMINAL_STATES",
+]
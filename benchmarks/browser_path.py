@@ -0,0 +1,111 @@
+"""
+浏览器自动化路径基准测试
+启动本地模拟平台和Playwright管理的Chromium（开启远程调试端口），每个平台打开一个标签页，
+再通过 BrowserSearchEngine 按真实流程（CDP连接、定位页面、输入、发送、读取回答）搜索，统计各平台延迟和成功率
+
+    python -m benchmarks.browser_path --rounds 5 --tokens-per-second 80 --failure-rate 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.metrics import latency_summary
+from benchmarks.mock_platforms import DEFAULT_PORT, MockConfig, MockPlatformServer, platform_urls
+
+DEFAULT_DEBUG_PORT = 9333  # 避免与用户日常使用的调试浏览器（9222）冲突
+
+
+async def run_browser_benchmark(rounds: int = 3, config: Optional[MockConfig] = None,
+                                port: int = DEFAULT_PORT, debug_port: int = DEFAULT_DEBUG_PORT,
+                                headless: bool = True, query: str = "本地模拟测试") -> Dict[str, Any]:
+    """对本地模拟平台执行多轮浏览器搜索（每轮各平台并发），返回各平台的延迟统计"""
+    from playwright.async_api import async_playwright  # 只在运行浏览器测试时需要
+    from core.browser_search_engine import BrowserSearchEngine
+
+    with MockPlatformServer(config, port=port) as server:
+        urls = platform_urls(server.base_url)
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=headless,
+                                              args=[f"--remote-debugging-port={debug_port}"])
+            try:
+                context = await browser.new_context()
+                for url in urls.values():
+                    page = await context.new_page()
+                    await page.goto(url)
+
+                engine = BrowserSearchEngine(debug_port=debug_port)
+                if not await engine.connect():
+                    raise RuntimeError(f"无法通过调试端口 {debug_port} 连接Chromium")
+                try:
+                    detected = await engine.detect_available_platforms()
+                    platforms = [item["platform"] for item in detected if item["platform"] in urls]
+                    latencies: Dict[str, List[float]] = {platform: [] for platform in platforms}
+                    outcomes: Dict[str, Dict[str, int]] = {
+                        platform: {"success": 0, "failed": 0, "circuit_open": 0} for platform in platforms
+                    }
+
+                    async def search(platform: str, round_query: str):
+                        start = time.perf_counter()
+                        result = await engine.search_platform(platform, round_query)
+                        elapsed = time.perf_counter() - start
+                        content = result.get("content", "")
+                        if result.get("circuit_open"):
+                            outcomes[platform]["circuit_open"] += 1
+                        elif result.get("success") and round_query in content:
+                            outcomes[platform]["success"] += 1
+                            latencies[platform].append(elapsed)
+                        else:
+                            outcomes[platform]["failed"] += 1
+
+                    start = time.perf_counter()
+                    for i in range(rounds):
+                        await asyncio.gather(*(search(platform, f"{query} {i + 1}") for platform in platforms))
+                    total = time.perf_counter() - start
+                finally:
+                    await engine.disconnect()
+            finally:
+                await browser.close()
+        stats = dict(server.stats)
+
+    return {
+        "rounds": rounds,
+        "total_seconds": round(total, 3),
+        "platforms": {platform: {**outcomes[platform], "count": len(latencies[platform]),
+                                 **latency_summary(latencies[platform])}
+                      for platform in platforms},
+        "server": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟平台上的浏览器自动化路径基准测试")
+    parser.add_argument("--rounds", type=int, default=3, help="搜索轮数（每轮各平台并发）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="模拟平台端口")
+    parser.add_argument("--debug-port", type=int, default=DEFAULT_DEBUG_PORT, help="Chromium远程调试端口")
+    parser.add_argument("--headed", action="store_true", help="显示浏览器窗口")
+    parser.add_argument("--first-token-latency", type=float, default=MockConfig.first_token_latency)
+    parser.add_argument("--tokens-per-second", type=float, default=MockConfig.tokens_per_second)
+    parser.add_argument("--answer-chars", type=int, default=MockConfig.answer_chars)
+    parser.add_argument("--failure-rate", type=float, default=MockConfig.failure_rate)
+    parser.add_argument("--drop-rate", type=float, default=MockConfig.drop_rate)
+    args = parser.parse_args()
+
+    config = MockConfig(first_token_latency=args.first_token_latency, tokens_per_second=args.tokens_per_second,
+                        answer_chars=args.answer_chars, failure_rate=args.failure_rate, drop_rate=args.drop_rate)
+    result = asyncio.run(run_browser_benchmark(args.rounds, config, args.port, args.debug_port,
+                                               headless=not args.headed))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if not result["platforms"]:
+        print("❌ 未检测到模拟平台页面")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
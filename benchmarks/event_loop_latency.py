@@ -0,0 +1,113 @@
+"""
+事件循环阻塞回归测试
+在一个慢搜索执行期间并发请求健康检查，对比空闲时的p99延迟；
+搜索阻塞事件循环时健康检查会被拖慢到与搜索同量级，测试失败（退出码1）
+
+    python -m benchmarks.event_loop_latency --slow 2 --requests 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import simple_api
+from core.stream_aggregator import AggregatorEngine
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _summary(latencies: List[float]) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def _install_slow_platform(delay: float):
+    """用阻塞的sleep模拟耗时的同步平台脚本"""
+    original = AggregatorEngine._run_platform_with_stream
+
+    def slow_platform(self, platform, query):
+        time.sleep(delay)
+        return original(self, platform, query)
+
+    AggregatorEngine._run_platform_with_stream = slow_platform
+
+
+async def _probe(client: httpx.AsyncClient, total: int, interval: float) -> List[float]:
+    """按固定间隔请求健康检查，延迟从计划发送时间算起（事件循环被阻塞时发送被推迟的时间也计入）"""
+    latencies: List[float] = []
+
+    async def one(scheduled: float):
+        response = await client.get("/")
+        latencies.append(time.perf_counter() - scheduled)
+        response.raise_for_status()
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        scheduled = start + i * interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+async def run(slow: float, total: int) -> Dict[str, Any]:
+    _install_slow_platform(slow)
+    simple_api.rate_limiter.rate = 0  # 测试只关心事件循环，关闭限流
+
+    transport = httpx.ASGITransport(app=simple_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=slow * 10) as client:
+        interval = slow / total  # 探测请求均匀覆盖整个慢搜索期间
+        await _probe(client, 10, 0)  # 预热
+        idle = await _probe(client, total, interval)
+
+        probe = asyncio.create_task(_probe(client, total, interval))
+        await asyncio.sleep(interval)
+        response = await client.post("/search", json={"query": "延迟测试", "platforms": ["DeepSeek"]})
+        response.raise_for_status()
+        loaded = await probe
+
+    return {
+        "slow_search_seconds": slow,
+        "idle": _summary(idle),
+        "during_slow_search": _summary(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="慢搜索期间的健康检查延迟回归测试")
+    parser.add_argument("--slow", type=float, default=2.0, help="模拟的慢搜索耗时（秒）")
+    parser.add_argument("--requests", type=int, default=200, help="每轮健康检查请求数")
+    parser.add_argument("--max-ratio", type=float, default=5.0, help="允许的p99相对空闲时的倍数")
+    parser.add_argument("--min-budget-ms", type=float, default=50.0, help="p99允许的最小绝对上限（毫秒）")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.slow, args.requests))
+    idle_p99 = result["idle"]["p99_ms"]
+    loaded_p99 = result["during_slow_search"]["p99_ms"]
+    budget = max(idle_p99 * args.max_ratio, args.min_budget_ms)
+
+    print(f"空闲时        p50 {result['idle']['p50_ms']}ms  p99 {idle_p99}ms")
+    print(f"慢搜索进行中  p50 {result['during_slow_search']['p50_ms']}ms  p99 {loaded_p99}ms  (上限 {budget:.1f}ms)")
+    if loaded_p99 > budget:
+        print(f"❌ 慢搜索({args.slow}s)期间健康检查p99超出上限，事件循环可能被阻塞")
+        sys.exit(1)
+    print("✅ 慢搜索未影响其他请求的延迟")
+
+
+if __name__ == "__main__":
+    main()
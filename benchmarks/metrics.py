@@ -0,0 +1,91 @@
+"""
+基准测试的统计与内存采样工具
+"""
+
+import gc
+import os
+import sys
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil为可选依赖，缺失时用resource读取峰值内存
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows上没有resource模块
+    resource = None
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩百分位（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def latency_summary(latencies: List[float], prefix: str = "") -> Dict[str, float]:
+    """延迟（秒）的 p50/p95/p99/max，单位毫秒"""
+    values = sorted(latencies)
+    return {
+        f"{prefix}p50_ms": round(percentile(values, 0.5) * 1000, 3),
+        f"{prefix}p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        f"{prefix}p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        f"{prefix}max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def rss_mb() -> Optional[float]:
+    """当前进程的常驻内存（MB），无法获取时返回None"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{os.getpid()}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+        except (OSError, ValueError, IndexError):
+            pass
+    return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程启动以来的峰值常驻内存（MB）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class MemoryProbe:
+    """记录一段代码执行前后的内存"""
+
+    def __init__(self):
+        self.before: Optional[float] = None
+        self.after: Optional[float] = None
+
+    def result(self) -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {}
+        if self.after is not None:
+            metrics["rss_mb"] = round(self.after, 1)
+            if self.before is not None:
+                metrics["rss_growth_mb"] = round(max(0.0, self.after - self.before), 1)
+        peak = peak_rss_mb()
+        if peak is not None:
+            metrics["peak_rss_mb"] = round(peak, 1)
+        return metrics
+
+
+@contextmanager
+def memory_probe() -> Iterator[MemoryProbe]:
+    probe = MemoryProbe()
+    gc.collect()
+    probe.before = rss_mb()
+    try:
+        yield probe
+    finally:
+        gc.collect()
+        probe.after = rss_mb()
+
@@ -0,0 +1,300 @@
+"""
+本地模拟AI平台
+按 DeepSeek、Kimi、智谱清言 的页面结构提供聊天页（满足 BrowserSearchEngine 和 stream_aggregator 中的选择器），
+回答按配置的首字延迟、输出速率逐段流式返回，并可注入失败，用于离线测试和压测浏览器自动化路径
+
+页面地址包含平台域名，BrowserSearchEngine 按域名即可识别:
+    http://127.0.0.1:8800/chat.deepseek.com/
+    http://127.0.0.1:8800/kimi.moonshot.cn/
+    http://127.0.0.1:8800/chatglm.cn/
+
+    python -m benchmarks.mock_platforms --port 8800 --tokens-per-second 50 --failure-rate 0.1
+"""
+
+import argparse
+import asyncio
+import html
+import random
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+DEFAULT_PORT = 8800
+
+
+@dataclass
+class MockConfig:
+    """模拟平台的回答行为"""
+    first_token_latency: float = 0.5  # 发送问题到第一段输出的延迟（秒）
+    tokens_per_second: float = 40.0  # 输出速率，<=0 表示一次性输出
+    token_chars: int = 4  # 每段输出的字符数
+    answer_chars: int = 600  # 回答长度
+    failure_rate: float = 0.0  # 返回错误提示的概率
+    drop_rate: float = 0.0  # 输出中途断开的概率
+    jitter: float = 0.2  # 延迟的随机抖动比例
+
+    def update(self, fields: Dict[str, Any]):
+        for key, value in fields.items():
+            if not hasattr(self, key):
+                raise ValueError(f"未知的配置项: {key}")
+            setattr(self, key, type(getattr(self, key))(value))
+
+
+# 各平台页面结构：输入框、发送/停止按钮与回答容器的标记与真实平台的选择器对应
+PLATFORM_PAGES = {
+    "chat.deepseek.com": {
+        "platform": "DeepSeek",
+        "input": '<textarea id="chat-input" placeholder="请输入你的问题"></textarea>',
+        "send": '<button type="submit" class="send-button" aria-label="发送">发送</button>',
+        "stop": '<button class="stop-button" aria-label="停止生成" hidden>停止</button>',
+        "list_open": '<div id="answers">',
+        "list_close": '</div>',
+        "answer_class": "message-content c08e6e93",
+    },
+    "kimi.moonshot.cn": {
+        "platform": "Kimi",
+        "input": '<div id="input-area"><textarea class="input-textarea" placeholder="有什么问题尽管问我"></textarea></div>',
+        "send": '<button type="submit" class="send-btn" aria-label="发送">发送</button>',
+        "stop": '<button class="stop-btn stop-message-btn" aria-label="停止输出" hidden>停止</button>',
+        "list_open": '<div class="message-list">',
+        "list_close": '</div>',
+        "answer_class": "message-item ai-response",
+    },
+    "chatglm.cn": {
+        "platform": "智谱清言",
+        "input": '<div class="input-box"><textarea placeholder="输入问题"></textarea></div>',
+        "send": '<button type="submit" class="send-btn" aria-label="发送">发送</button>',
+        "stop": '<button class="stop-btn" aria-label="停止生成" hidden>停止</button>',
+        "list_open": '<div class="message-area-LmU13Q">',
+        "list_close": '</div>',
+        "answer_class": "markdown-body ai-message",
+    },
+}
+
+_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head><meta charset="utf-8"><title>{platform} - 本地模拟</title></head>
+<body>
+<div class="user-info avatar">mock-user</div>
+{list_open}{list_close}
+<form id="chat-form">{input}{send}{stop}</form>
+<script>
+const domain = {domain_json};
+const answerClass = {answer_class_json};
+const form = document.getElementById("chat-form");
+const input = form.querySelector("textarea");
+const sendButton = form.querySelector("button[type=submit]");
+const stopButton = form.querySelector("[aria-label^='停止']");
+const answers = document.body.children[1];
+let controller = null;
+
+async function ask(question) {{
+  if (!question.trim() || controller) return;
+  const answer = document.createElement("div");
+  answer.className = answerClass;
+  answers.appendChild(answer);
+  input.value = "";
+  controller = new AbortController();
+  stopButton.hidden = false;
+  try {{
+    const response = await fetch("/api/" + domain + "/stream?q=" + encodeURIComponent(question),
+                                 {{signal: controller.signal}});
+    if (!response.ok) {{
+      answer.textContent = "服务繁忙，请稍后重试";
+      return;
+    }}
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    while (true) {{
+      const {{done, value}} = await reader.read();
+      if (done) break;
+      answer.textContent += decoder.decode(value, {{stream: true}});
+    }}
+  }} catch (e) {{
+    // 停止生成或连接中断时保留已输出的内容
+  }} finally {{
+    controller = null;
+    stopButton.hidden = true;
+  }}
+}}
+
+form.addEventListener("submit", (event) => {{ event.preventDefault(); ask(input.value); }});
+input.addEventListener("keydown", (event) => {{
+  if (event.key === "Enter" && !event.shiftKey) {{ event.preventDefault(); ask(input.value); }}
+}});
+stopButton.addEventListener("click", (event) => {{
+  event.preventDefault();
+  if (controller) controller.abort();
+}});
+document.addEventListener("keydown", (event) => {{
+  if (event.key === "Escape" && controller) controller.abort();
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def _answer_text(platform: str, question: str, length: int) -> str:
+    sentence = f"这是{platform}本地模拟平台针对「{question}」生成的回答内容，用于测试浏览器自动化路径。"
+    text = f"关于“{question}”：\n"
+    while len(text) < length:
+        text += sentence
+    return text[:max(length, 1)]
+
+
+def create_app(config: Optional[MockConfig] = None, seed: Optional[int] = None) -> FastAPI:
+    """创建模拟平台应用"""
+    config = config or MockConfig()
+    rng = random.Random(seed)
+    app = FastAPI(title="本地模拟AI平台")
+    app.state.config = config
+    app.state.stats = {"requests": 0, "failed": 0, "dropped": 0, "completed": 0, "cancelled": 0}
+
+    def jittered(seconds: float) -> float:
+        if seconds <= 0 or config.jitter <= 0:
+            return max(0.0, seconds)
+        return seconds * rng.uniform(1 - config.jitter, 1 + config.jitter)
+
+    @app.get("/", response_class=HTMLResponse)
+    async def index():
+        links = "".join(f'<li><a href="/{domain}/">{page["platform"]}</a></li>'
+                        for domain, page in PLATFORM_PAGES.items())
+        return f"<html><body><h1>本地模拟AI平台</h1><ul>{links}</ul></body></html>"
+
+    @app.get("/{domain}/", response_class=HTMLResponse)
+    async def chat_page(domain: str):
+        page = PLATFORM_PAGES.get(domain)
+        if page is None:
+            raise HTTPException(status_code=404, detail="未知的平台")
+        return _PAGE_TEMPLATE.format(
+            domain_json=f'"{domain}"',
+            answer_class_json=f'"{page["answer_class"]}"',
+            **{key: value for key, value in page.items() if key != "platform"},
+            platform=html.escape(page["platform"]),
+        )
+
+    @app.get("/api/{domain}/stream")
+    async def stream_answer(domain: str, q: str):
+        page = PLATFORM_PAGES.get(domain)
+        if page is None:
+            raise HTTPException(status_code=404, detail="未知的平台")
+        app.state.stats["requests"] += 1
+        await asyncio.sleep(jittered(config.first_token_latency))
+        if config.failure_rate > 0 and rng.random() < config.failure_rate:
+            app.state.stats["failed"] += 1
+            raise HTTPException(status_code=503, detail="模拟服务繁忙")
+
+        text = _answer_text(page["platform"], q, config.answer_chars)
+        drop_at = rng.randint(1, len(text)) if config.drop_rate > 0 and rng.random() < config.drop_rate else None
+
+        async def tokens() -> AsyncIterator[bytes]:
+            step = max(1, config.token_chars)
+            interval = step / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+            try:
+                for start in range(0, len(text), step):
+                    if drop_at is not None and start >= drop_at:
+                        app.state.stats["dropped"] += 1
+                        return
+                    yield text[start:start + step].encode("utf-8")
+                    if interval:
+                        await asyncio.sleep(jittered(interval))
+                app.state.stats["completed"] += 1
+            except asyncio.CancelledError:
+                # 页面点击停止或关闭时连接断开
+                app.state.stats["cancelled"] += 1
+                raise
+
+        return StreamingResponse(tokens(), media_type="text/plain; charset=utf-8",
+                                 headers={"Cache-Control": "no-store"})
+
+    @app.get("/_mock/config")
+    async def get_config():
+        return {"config": asdict(config), "stats": app.state.stats}
+
+    @app.post("/_mock/config")
+    async def set_config(fields: Dict[str, Any]):
+        try:
+            config.update(fields)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"config": asdict(config)}
+
+    return app
+
+
+def platform_urls(base_url: str) -> Dict[str, str]:
+    """各平台模拟页面的地址"""
+    return {page["platform"]: f"{base_url.rstrip('/')}/{domain}/" for domain, page in PLATFORM_PAGES.items()}
+
+
+class MockPlatformServer:
+    """在后台线程中运行模拟平台（供基准测试脚本使用）"""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1",
+                 port: int = DEFAULT_PORT, seed: Optional[int] = None):
+        import uvicorn
+
+        self.app = create_app(config, seed)
+        self.base_url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = None
+
+    @property
+    def config(self) -> MockConfig:
+        return self.app.state.config
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self.app.state.stats
+
+    def start(self, timeout: float = 10.0):
+        import threading
+
+        self._thread = threading.Thread(target=self._server.run, name="mock-platforms", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"模拟平台启动失败: {self.base_url}")
+            time.sleep(0.05)
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockPlatformServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟AI平台")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--first-token-latency", type=float, default=MockConfig.first_token_latency)
+    parser.add_argument("--tokens-per-second", type=float, default=MockConfig.tokens_per_second)
+    parser.add_argument("--answer-chars", type=int, default=MockConfig.answer_chars)
+    parser.add_argument("--failure-rate", type=float, default=MockConfig.failure_rate)
+    parser.add_argument("--drop-rate", type=float, default=MockConfig.drop_rate)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(first_token_latency=args.first_token_latency, tokens_per_second=args.tokens_per_second,
+                        answer_chars=args.answer_chars, failure_rate=args.failure_rate, drop_rate=args.drop_rate)
+    for platform, url in platform_urls(f"http://{args.host}:{args.port}").items():
+        print(f"{platform}: {url}")
+    uvicorn.run(create_app(config, args.seed), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+基准测试套件
+运行各场景（模拟搜索并发、聚合/去重吞吐、状态轮询、凭据加载、浏览器路径），输出 p50/p95/p99、吞吐和内存，
+结果保存为JSON并与基线对比，指标回退超过容差时退出码为1
+
+    python -m benchmarks.run                          # 运行全部场景并与基线对比
+    python -m benchmarks.run --quick --scenarios simulation,status_poll
+    python -m benchmarks.run --repeat 3 --save-baseline   # 运行3次取中位数，保存为基线
+    python -m benchmarks.run --quick --require-baseline   # 快速规模与 baseline-quick.json 对比，基线缺失时失败
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# 先于被测模块配置日志，避免压测期间输出大量INFO日志
+logging.basicConfig(level=logging.WARNING)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.scenarios import QUICK_SETTINGS, SCENARIOS
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "latest.json")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_QUICK_BASELINE = os.path.join(BENCH_DIR, "baseline-quick.json")  # --quick 规模的基线
+
+# 指标方向按名称后缀判断；p99和最大值受偶发抖动影响大，只记录不对比
+INFORMATIONAL = ("p99_ms", "max_ms")
+LOWER_IS_BETTER = ("_ms", "_mb", "_bytes", "_errors")
+HIGHER_IS_BETTER = ("_per_s",)
+# 绝对容差，避免亚毫秒级抖动和内存统计误差被判为回退
+ABSOLUTE_SLACK = {"_ms": 0.5, "_mb": 8.0, "_bytes": 64, "_errors": 0, "_per_s": 0}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _run_scenario(name: str, settings: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """运行场景 repeat 次，各指标取中位数"""
+    runs = []
+    for _ in range(repeat):
+        result = SCENARIOS[name](**settings)
+        if "metrics" not in result:
+            return result
+        runs.append(result)
+    result = runs[-1]
+    if repeat > 1:
+        result["metrics"] = {metric: statistics.median(run["metrics"][metric] for run in runs)
+                             for metric in result["metrics"]}
+        result["runs"] = repeat
+    return result
+
+
+def run_scenarios(names: List[str], quick: bool, repeat: int = 1) -> Dict[str, Any]:
+    """依次运行场景，场景异常时记录错误并继续"""
+    results: Dict[str, Any] = {}
+    for name in names:
+        settings = QUICK_SETTINGS.get(name, {}) if quick else {}
+        print(f"▶ {name} ...", flush=True)
+        start = time.perf_counter()
+        try:
+            result = _run_scenario(name, settings, repeat)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"error": f"{type(e).__name__}: {e}"}
+        result["duration_s"] = round(time.perf_counter() - start, 2)
+        results[name] = result
+        if "skipped" in result:
+            print(f"  ⏭️ 跳过: {result['skipped']}")
+        elif "error" in result:
+            print(f"  ❌ 失败: {result['error']}")
+        else:
+            for metric, value in result["metrics"].items():
+                print(f"  {metric:<32} {value}")
+    return results
+
+
+def _direction(metric: str) -> Optional[str]:
+    if metric.endswith(INFORMATIONAL):
+        return None
+    if metric.endswith(LOWER_IS_BETTER):
+        return "lower"
+    if metric.endswith(HIGHER_IS_BETTER):
+        return "higher"
+    return None
+
+
+def _slack(metric: str) -> float:
+    for suffix, value in ABSOLUTE_SLACK.items():
+        if metric.endswith(suffix):
+            return value
+    return 0.0
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """与基线对比，返回回退的指标"""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base or "metrics" not in base or "metrics" not in result:
+            continue
+        for metric, value in result["metrics"].items():
+            direction = _direction(metric)
+            old = base["metrics"].get(metric)
+            if direction is None or old is None:
+                continue
+            if direction == "lower":
+                limit = old * (1 + tolerance) + _slack(metric)
+                regressed = value > limit
+            else:
+                limit = old * (1 - tolerance) - _slack(metric)
+                regressed = value < limit
+            if regressed:
+                change = (value - old) / old * 100 if old else float("inf")
+                regressions.append({"scenario": name, "metric": metric, "baseline": old,
+                                    "current": value, "change_pct": round(change, 1)})
+    return regressions
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI搜索聚合器基准测试套件")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"逗号分隔的场景，可选: {', '.join(SCENARIOS)}")
+    parser.add_argument("--quick", action="store_true", help="使用较小规模快速运行")
+    parser.add_argument("--repeat", type=int, default=1, help="每个场景运行的次数，指标取中位数（保存基线时建议3次以上）")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果JSON路径")
+    parser.add_argument("--baseline", default=None,
+                        help="基线JSON路径（默认 baseline.json，--quick 时为 baseline-quick.json）")
+    parser.add_argument("--require-baseline", action="store_true", help="基线不存在或无法对比时视为失败")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="允许的相对回退比例")
+    args = parser.parse_args()
+
+    if args.baseline is None:
+        args.baseline = DEFAULT_QUICK_BASELINE if args.quick else DEFAULT_BASELINE
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}")
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+            "repeat": args.repeat,
+        },
+        "scenarios": run_scenarios(names, args.quick, max(1, args.repeat)),
+    }
+    _write_json(args.output, results)
+    print(f"\n📄 结果已保存: {args.output}")
+
+    failed = [name for name, result in results["scenarios"].items() if "error" in result]
+    if args.save_baseline:
+        if failed:
+            print(f"❌ 场景运行失败，未保存基线: {', '.join(failed)}")
+            sys.exit(1)
+        _write_json(args.baseline, results)
+        print(f"📌 已保存为基线: {args.baseline}")
+        return
+
+    regressions: List[Dict[str, Any]] = []
+    compared = False
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ 基线不存在 ({args.baseline})，使用 --save-baseline 保存本次结果作为基线")
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("quick") != args.quick:
+            print("⚠️ 基线与本次运行的规模不同（--quick），跳过对比")
+        else:
+            compared = True
+            regressions = compare(results, baseline, args.tolerance)
+            if regressions:
+                print(f"\n❌ {len(regressions)} 项指标相对基线回退超过 {args.tolerance:.0%}:")
+                for item in regressions:
+                    print(f"  {item['scenario']}.{item['metric']}: {item['baseline']} -> {item['current']} "
+                          f"({item['change_pct']:+.1f}%)")
+            else:
+                print(f"✅ 未发现超过 {args.tolerance:.0%} 的性能回退")
+
+    if failed:
+        print(f"❌ 场景运行失败: {', '.join(failed)}")
+    if args.require_baseline and not compared:
+        print("❌ 未与基线对比（--require-baseline）")
+    if failed or regressions or (args.require_baseline and not compared):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
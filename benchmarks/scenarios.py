@@ -0,0 +1,286 @@
+"""
+基准测试场景
+每个场景返回 {"metrics": {...}, "details": {...}}；metrics 参与基线对比，按名称后缀判断方向:
+    *_ms、*_mb、*_bytes、*_errors 越小越好；*_per_s 越大越好；p99/最大值及其他指标只记录不对比
+"""
+
+import asyncio
+import copy
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Sequence
+
+import httpx
+
+from benchmarks.metrics import latency_summary, memory_probe
+
+PLATFORMS = ["DeepSeek", "Kimi", "智谱清言"]
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+
+async def _run_concurrent(total: int, concurrency: int, call: Callable[[int], Any]) -> Dict[str, Any]:
+    """以固定并发执行 total 次调用，返回延迟列表、失败数和总耗时"""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"latencies": latencies, "errors": errors, "elapsed": time.perf_counter() - start}
+
+
+def simulation_search(levels: Sequence[int] = (1, 4, 16, 32), requests: int = 200,
+                      time_scale: float = 0.0) -> Dict[str, Any]:
+    """模拟模式同步搜索（POST /search）在逐级增加的并发下的延迟和吞吐
+
+    time_scale=0 时模拟平台不等待，测得的是服务本身（准入、缓存、聚合、序列化）的开销
+    """
+    from backend import enhanced_api
+
+    enhanced_api.simulator.time_scale = time_scale
+    enhanced_api.rate_limiter.rate = 0  # 压测来自同一客户端，关闭限流
+
+    async def run() -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {}
+        details: Dict[str, Any] = {}
+        async with _client(enhanced_api.app) as client:
+            run_id = uuid.uuid4().hex[:8]
+
+            async def search(level: int, i: int) -> bool:
+                # 每次使用不同的问题并禁用缓存，避免命中结果缓存或合并相同请求
+                response = await client.post("/search", json={
+                    "user_input": f"基准测试 {run_id}-{level}-{i}",
+                    "platforms": PLATFORMS,
+                    "simulation_mode": True,
+                    "cache_control": "no-store",
+                })
+                return response.status_code == 200
+
+            await _run_concurrent(10, 2, lambda i: search(0, i))  # 预热
+            for level in levels:
+                result = await _run_concurrent(requests, level, lambda i, level=level: search(level, i))
+                metrics.update(latency_summary(result["latencies"], prefix=f"c{level}_"))
+                metrics[f"c{level}_requests_per_s"] = round(requests / result["elapsed"], 1)
+                metrics[f"c{level}_errors"] = result["errors"]
+        details.update(levels=list(levels), requests_per_level=requests, time_scale=time_scale)
+        return {"metrics": metrics, "details": details}
+
+    with memory_probe() as memory:
+        result = asyncio.run(run())
+    result["metrics"].update(memory.result())
+    return result
+
+
+def _synthetic_corpus(documents: int, duplicate_ratio: float, length: int, seed: int) -> List[str]:
+    """生成包含一定比例重复（含仅格式不同的重复）的Markdown回答"""
+    rng = random.Random(seed)
+    words = ["人工智能", "模型", "搜索", "聚合", "平台", "回答", "数据", "分析", "结果", "可信度",
+             "性能", "延迟", "缓存", "浏览器", "自动化", "去重", "指纹", "内容"]
+    corpus: List[str] = []
+    for i in range(documents):
+        if corpus and rng.random() < duplicate_ratio:
+            original = rng.choice(corpus)
+            # 一半为原样重复，一半为仅Markdown格式不同的重复
+            corpus.append(original if rng.random() < 0.5 else original.replace("## ", "### ").replace("- ", "* "))
+            continue
+        lines = [f"## 回答 {i}"]
+        while sum(len(line) for line in lines) < length:
+            lines.append("- " + "".join(rng.choice(words) for _ in range(12)) + "。")
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def aggregation(documents: int = 20000, duplicate_ratio: float = 0.3, document_chars: int = 400,
+                merge_rounds: int = 500, merge_chars: int = 8000, repeats: int = 3) -> Dict[str, Any]:
+    """去重吞吐（精确指纹与布隆过滤器，取多次中最快的一次）以及聚合引擎合并多平台结果的吞吐"""
+    from core.stream_aggregator import AggregatorEngine, StreamContent
+    from ragflow_utils.deduplicate import iter_deduplicate
+
+    corpus = _synthetic_corpus(documents, duplicate_ratio, document_chars, seed=42)
+    corpus_mb = sum(len(text.encode("utf-8")) for text in corpus) / 1024 / 1024
+    metrics: Dict[str, Any] = {}
+    details: Dict[str, Any] = {"documents": documents, "duplicate_ratio": duplicate_ratio,
+                               "corpus_mb": round(corpus_mb, 2)}
+
+    with memory_probe() as memory:
+        for mode, use_bloom in (("exact", False), ("bloom", True)):
+            sum(1 for _ in iter_deduplicate(corpus[:200], use_bloom=use_bloom))  # 预热
+            elapsed = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                unique = sum(1 for _ in iter_deduplicate(corpus, use_bloom=use_bloom))
+                elapsed.append(time.perf_counter() - start)
+            metrics[f"dedup_{mode}_docs_per_s"] = round(documents / min(elapsed), 1)
+            details[f"dedup_{mode}_unique"] = unique
+
+        engine = AggregatorEngine()
+        body = ("多平台聚合基准测试内容。" * (merge_chars // 12 + 1))[:merge_chars]
+        streams = [StreamContent(platform=platform, content=f"## {platform}\n\n{body}",
+                                 timestamp="", is_complete=True) for platform in PLATFORMS]
+        for i in range(20):  # 预热
+            engine.build_result(PLATFORMS, "聚合测试", streams)
+        latencies = []
+        for i in range(merge_rounds):
+            start = time.perf_counter()
+            engine.build_result(PLATFORMS, f"聚合测试 {i}", streams)
+            latencies.append(time.perf_counter() - start)
+        metrics.update(latency_summary(latencies, prefix="merge_"))
+        metrics["merge_per_s"] = round(merge_rounds / sum(latencies), 1)
+        details["merge_chars_per_platform"] = merge_chars
+    metrics.update(memory.result())
+    return {"metrics": metrics, "details": details}
+
+
+def status_poll(polls: int = 2000, concurrency: int = 8, content_chars: int = 8000) -> Dict[str, Any]:
+    """搜索状态轮询的开销：完整状态、未变化（since_version）和按内容偏移的增量三种方式"""
+    from backend import enhanced_api
+    from backend.content_buffer import ContentBuffer
+
+    search_id = f"bench-{uuid.uuid4().hex[:8]}"
+    body = ("状态轮询基准测试的流式回答内容。" * (content_chars // 16 + 1))[:content_chars]
+    live_results = {}
+    for platform in PLATFORMS:
+        content = ContentBuffer()
+        for start in range(0, len(body), 200):
+            content.append(body[start:start + 200])
+        live_results[platform] = {"status": "searching", "content": content, "progress_text": "正在生成回答...",
+                                  "start_time": None, "end_time": None, "error": None}
+    status = enhanced_api._new_status(search_id, "running", 0.6, current_platform=PLATFORMS[0],
+                                      live_results=live_results)
+    status["version"] = 5
+    enhanced_api.search_status_store.set(search_id, status)
+
+    offsets = {f"content_offset[{platform}]": content_chars - 200 for platform in PLATFORMS}
+    modes = {
+        "full": {},
+        "unchanged": {"since_version": 5},
+        "delta": {"since_version": 4, **offsets},
+    }
+
+    async def run() -> Dict[str, Any]:
+        metrics: Dict[str, Any] = {}
+        async with _client(enhanced_api.app) as client:
+            for mode, params in modes.items():
+                sizes: List[int] = []
+
+                async def poll(i: int, params=params) -> bool:
+                    response = await client.get(f"/search-status/{search_id}", params=params)
+                    sizes.append(response.num_bytes_downloaded)
+                    return response.status_code == 200
+
+                await _run_concurrent(20, 1, poll)  # 预热
+                sizes.clear()
+                result = await _run_concurrent(polls, concurrency, poll)
+                metrics.update(latency_summary(result["latencies"], prefix=f"{mode}_"))
+                metrics[f"{mode}_polls_per_s"] = round(polls / result["elapsed"], 1)
+                metrics[f"{mode}_response_bytes"] = max(sizes)
+                metrics[f"{mode}_errors"] = result["errors"]
+        return metrics
+
+    try:
+        with memory_probe() as memory:
+            metrics = asyncio.run(run())
+    finally:
+        enhanced_api.search_status_store.delete(search_id)
+    metrics.update(memory.result())
+    return {"metrics": metrics, "details": {"polls": polls, "concurrency": concurrency,
+                                            "content_chars_per_platform": content_chars}}
+
+
+def credentials(records: int = 200, cookie_chars: int = 4000, loads: int = 200) -> Dict[str, Any]:
+    """凭据加载开销：批量写入、冷加载（逐条解密）和缓存命中时的 load_cookie 路径"""
+    # 使用固定的测试密钥，避免没有密钥时 get_key 生成新密钥写入 .env
+    os.environ.setdefault("ACCOUNT_AES_KEY", "benchmark-only-aes-key-32-bytes!")
+    from backend import account_manager
+    from backend.credential_store import CredentialStore
+
+    cookies = {f"platform-{i}": {"cookie": "k=" + "v" * cookie_chars, "domain": f"site{i}.example.com"}
+               for i in range(records)}
+    metrics: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as tmp, memory_probe() as memory:
+        store = CredentialStore(os.path.join(tmp, "credentials.db"), key_provider=account_manager.get_key)
+        start = time.perf_counter()
+        store.put_many(account_manager.COOKIE_KIND, cookies)
+        metrics["write_batch_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+        cold = []
+        for _ in range(max(1, loads // 10)):
+            start = time.perf_counter()
+            store.get_all(account_manager.COOKIE_KIND)
+            cold.append(time.perf_counter() - start)
+        metrics.update(latency_summary(cold, prefix="cold_load_"))
+
+        cache = account_manager._CredentialCache(store)
+        cache._migrated.update(account_manager._LEGACY_FILES)  # 不导入当前目录下的旧版凭据文件
+        cache.get(account_manager.COOKIE_KIND)
+        cached = []
+        for i in range(loads):
+            start = time.perf_counter()
+            copy.deepcopy(cache.get(account_manager.COOKIE_KIND).get(f"platform-{i % records}"))
+            cached.append(time.perf_counter() - start)
+        metrics.update(latency_summary(cached, prefix="cached_load_"))
+        metrics["cached_loads_per_s"] = round(loads / sum(cached), 1)
+        store._connect().close()
+    metrics.update(memory.result())
+    return {"metrics": metrics, "details": {"records": records, "cookie_chars": cookie_chars, "loads": loads}}
+
+
+def browser_path(rounds: int = 3, first_token_latency: float = 0.2,
+                 tokens_per_second: float = 200.0, answer_chars: int = 400) -> Dict[str, Any]:
+    """浏览器自动化路径在本地模拟平台上的延迟（需要安装 playwright 和 Chromium）"""
+    try:
+        import playwright  # noqa: F401
+    except ImportError:
+        return {"skipped": "未安装 playwright"}
+    from benchmarks.browser_path import run_browser_benchmark
+    from benchmarks.mock_platforms import MockConfig
+
+    config = MockConfig(first_token_latency=first_token_latency, tokens_per_second=tokens_per_second,
+                        answer_chars=answer_chars)
+    with memory_probe() as memory:
+        result = asyncio.run(run_browser_benchmark(rounds, config))
+    metrics: Dict[str, Any] = {}
+    for platform, stats in result["platforms"].items():
+        metrics.update({f"{platform}_{key}": value for key, value in stats.items()
+                        if key.endswith("_ms")})
+        metrics[f"{platform}_errors"] = stats["failed"] + stats["circuit_open"]
+    metrics["searches_per_s"] = round(rounds * len(result["platforms"]) / result["total_seconds"], 3)
+    metrics.update(memory.result())
+    return {"metrics": metrics, "details": result}
+
+
+SCENARIOS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "simulation": simulation_search,
+    "aggregation": aggregation,
+    "status_poll": status_poll,
+    "credentials": credentials,
+    "browser": browser_path,
+}
+
+# --quick 时各场景使用的较小规模
+QUICK_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "simulation": {"levels": (1, 8), "requests": 50},
+    "aggregation": {"documents": 3000, "merge_rounds": 100},
+    "status_poll": {"polls": 300},
+    "credentials": {"records": 50, "loads": 100},
+    "browser": {"rounds": 1},
+}
@@ -1,7 +1,15 @@
 # Core模块初始化
-from .stream_aggregator import MultiPlatformStreamAggregator, StreamContent, PlatformStreamMonitor
+from .stream_aggregator import (
+    AggregationSession,
+    AggregatorEngine,
+    MultiPlatformStreamAggregator,
+    PlatformStreamMonitor,
+    StreamContent,
+)
 
 __all__ = [
+    "AggregatorEngine",
+    "AggregationSession",
     "MultiPlatformStreamAggregator",
     "StreamContent", 
     "PlatformStreamMonitor"
@@ -10,8 +10,13 @@ from typing import Dict, List, Optional
 from datetime import datetime
 import logging
 
+from core.circuit_breaker import get_breaker
+
 logger = logging.getLogger(__name__)
 
+# 取消搜索时停止页面回答生成的最长等待时间（秒）
+STOP_GENERATION_TIMEOUT = 3
+
 class BrowserSearchEngine:
     """浏览器自动化搜索引擎"""
     
@@ -27,6 +32,7 @@ class BrowserSearchEngine:
                 "input_selector": 'textarea[placeholder*="请输入"], textarea[placeholder*="输入"], textarea[data-testid*="input"], #chat-input textarea',
                 "send_selector": 'button[type="submit"], button[aria-label*="发送"], .send-button, [data-testid*="send"]',
                 "result_selector": '.message-content, .answer-content, [class*="message"], [class*="response"], .chat-message',
+                "stop_selector": 'button[aria-label*="停止"], [data-testid*="stop"], .stop-button',
                 "wait_time": 3
             },
             "Kimi": {
@@ -34,6 +40,7 @@ class BrowserSearchEngine:
                 "input_selector": 'textarea[placeholder*="请输入"], textarea[placeholder*="有什么"], textarea[placeholder*="输入"], #input-area textarea, .input-textarea',
                 "send_selector": 'button[type="submit"], button[aria-label*="发送"], .send-btn, [data-testid*="send"], .submit-button',
                 "result_selector": '.message, [class*="answer"], [class*="response"], .chat-message, .ai-response',
+                "stop_selector": 'button[aria-label*="停止"], .stop-btn, [data-testid*="stop"], .stop-message-btn',
                 "wait_time": 4
             },
             "智谱清言": {
@@ -41,6 +48,7 @@ class BrowserSearchEngine:
                 "input_selector": 'textarea, input[type="text"], .input-box textarea, #chat-input, [placeholder*="输入"]',
                 "send_selector": 'button[type="submit"], .send-btn, .submit-btn, [aria-label*="发送"], .send-button',
                 "result_selector": '.response, .answer, [class*="message"], .chat-response, .ai-message',
+                "stop_selector": 'button[aria-label*="停止"], .stop-btn, .stop-button, [class*="stop"]',
                 "wait_time": 5
             }
         }
@@ -200,7 +208,7 @@ class BrowserSearchEngine:
                     if await login_element.is_visible():
                         logger.info(f"{platform} 发现登录按钮，未登录")
                         return False
-                except:
+                except Exception:
                     continue
             
             # 检查是否存在用户头像或用户名（已登录的标志）
@@ -219,7 +227,7 @@ class BrowserSearchEngine:
                     if await user_element.is_visible():
                         logger.info(f"{platform} 发现用户头像，已登录")
                         return True
-                except:
+                except Exception:
                     continue
             
             # 检查页面标题是否包含登录相关关键词
@@ -236,8 +244,8 @@ class BrowserSearchEngine:
             logger.error(f"替代登录检测失败: {e}")
             return False
     
-    async def search_platform(self, platform: str, query: str) -> Dict:
-        """在指定平台进行搜索"""
+    async def search_platform(self, platform: str, query: str, page=None) -> Dict:
+        """在指定平台进行搜索（page 为空时使用找到的第一个平台页面）"""
         if platform not in self.platform_configs:
             return {
                 "success": False,
@@ -247,10 +255,25 @@ class BrowserSearchEngine:
         
         config = self.platform_configs[platform]
         
+        # 平台熔断时快速失败
+        breaker = get_breaker(platform)
+        if not breaker.allow():
+            last_error = breaker.snapshot()["last_error"]
+            return {
+                "success": False,
+                "circuit_open": True,
+                "error": f"{platform} 暂不可用（熔断中）: {last_error}",
+                "content": f"⚠️ {platform} 暂不可用，最近错误: {last_error}"
+            }
+        start = time.monotonic()
+        sent = False
+        
         try:
             # 查找平台页面
-            page = await self._find_platform_page(platform)
+            if page is None:
+                page = await self._find_platform_page(platform)
             if not page:
+                breaker.record_failure("未找到平台页面", time.monotonic() - start)
                 return {
                     "success": False,
                     "error": f"未找到 {platform} 页面，请确保已打开并登录",
@@ -264,10 +287,24 @@ class BrowserSearchEngine:
             
             # 点击发送按钮
             await self._send_query(page, config)
+            sent = True
             
             # 等待并获取回答
             content = await self._get_response(page, config, platform)
             
+            # 未获取到回答内容时按失败返回，与熔断器的记录保持一致
+            if content.startswith(("⚠️", "❌")):
+                breaker.record_failure(content[:200], time.monotonic() - start)
+                return {
+                    "success": False,
+                    "error": content,
+                    "content": content,
+                    "timestamp": datetime.now().isoformat(),
+                    "platform": platform,
+                    "method": "browser_automation"
+                }
+            breaker.record_success(time.monotonic() - start)
+            
             return {
                 "success": True,
                 "content": content,
@@ -276,14 +313,52 @@ class BrowserSearchEngine:
                 "method": "browser_automation"
             }
             
+        except asyncio.CancelledError:
+            # 搜索被取消（用户取消或超时），停止页面上仍在生成的回答，不计入熔断失败
+            logger.info(f"{platform} 搜索已取消")
+            if page is not None and sent:
+                await self._stop_generation(page, config, platform)
+            raise
         except Exception as e:
             logger.error(f"{platform} 搜索失败: {e}")
+            breaker.record_failure(str(e), time.monotonic() - start)
             return {
                 "success": False,
                 "error": str(e),
                 "content": f"❌ {platform} 搜索异常: {str(e)}"
             }
     
+    async def _stop_generation(self, page, config: Dict, platform: str):
+        """尽力停止平台正在生成的回答：优先点击停止按钮，否则按Esc"""
+        async def stop():
+            for selector in config.get("stop_selector", "").split(", "):
+                if not selector.strip():
+                    continue
+                try:
+                    stop_button = page.locator(selector.strip()).first
+                    if await stop_button.is_visible():
+                        await stop_button.click(timeout=1000)
+                        logger.info(f"已停止 {platform} 回答生成: {selector.strip()}")
+                        return
+                except Exception:
+                    continue
+            await page.keyboard.press("Escape")
+        
+        try:
+            await asyncio.wait_for(stop(), timeout=STOP_GENERATION_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"停止 {platform} 回答生成失败: {e}")
+    
+    def find_platform_pages(self, platform: str) -> List:
+        """平台所有已打开的页面，批量搜索时每个页面可并行处理一个问题"""
+        domains = self.platform_configs[platform]["domains"]
+        return [
+            page
+            for context in self.browser.contexts
+            for page in context.pages
+            if any(domain in page.url for domain in domains)
+        ]
+    
     async def _find_platform_page(self, platform: str):
         """查找指定平台的页面"""
         config = self.platform_configs[platform]
@@ -317,7 +392,7 @@ class BrowserSearchEngine:
                 if await input_element.is_visible() and await input_element.is_enabled():
                     logger.info(f"找到可用输入框: {selector.strip()}")
                     break
-            except:
+            except Exception:
                 continue
         
         if not input_element:
@@ -367,7 +442,7 @@ class BrowserSearchEngine:
                     logger.info(f"✅ 点击发送按钮: {selector.strip()}")
                     sent = True
                     break
-            except:
+            except Exception:
                 continue
         
         if not sent:
@@ -376,7 +451,7 @@ class BrowserSearchEngine:
                 await page.keyboard.press("Enter")
                 logger.info("✅ 使用回车键发送")
                 sent = True
-            except:
+            except Exception:
                 pass
         
         if not sent:
@@ -395,7 +470,7 @@ class BrowserSearchEngine:
         # 等待回答出现
         try:
             await page.wait_for_selector(result_selector, timeout=30000)
-        except:
+        except Exception:
             logger.warning(f"{platform} 回答超时，尝试获取现有内容")
         
         # 等待内容生成
@@ -429,8 +504,35 @@ class BrowserSearchManager:
     def __init__(self):
         self.engine = None
     
-    async def search_multiple_platforms(self, platforms: List[str], query: str) -> Dict:
-        """在多个平台进行搜索"""
+    async def _search_with_timeout(self, platform: str, query: str,
+                                   timeout: Optional[float]) -> Dict:
+        """在时间预算内搜索单个平台，超时返回部分失败结果"""
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.engine.search_platform(platform, query), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{platform} 搜索超时 ({timeout}s)")
+            get_breaker(platform).record_failure("搜索超时", time.monotonic() - start)
+            result = {
+                "platform": platform,
+                "success": False,
+                "timed_out": True,
+                "error": f"超过时间预算 ({timeout:.1f}s)",
+                "content": f"⏱️ {platform} 搜索超时"
+            }
+        result.setdefault("platform", platform)
+        result["latency"] = round(time.monotonic() - start, 3)
+        return result
+    
+    async def search_multiple_platforms(self, platforms: List[str], query: str,
+                                        platform_timeout: Optional[float] = None) -> Dict:
+        """在多个平台进行搜索
+        
+        Args:
+            platforms: 平台列表
+            query: 搜索问题
+            platform_timeout: 每个平台的时间预算（秒），None表示不限制
+        """
         self.engine = BrowserSearchEngine()
         
         # 连接到浏览器
@@ -446,7 +548,7 @@ class BrowserSearchManager:
         try:
             # 并发搜索多个平台
             tasks = [
-                self.engine.search_platform(platform, query)
+                self._search_with_timeout(platform, query, platform_timeout)
                 for platform in platforms
             ]
             
@@ -475,10 +577,11 @@ class BrowserSearchManager:
 
 
 # 异步搜索函数接口
-async def browser_search(platforms: List[str], query: str) -> Dict:
+async def browser_search(platforms: List[str], query: str,
+                         platform_timeout: Optional[float] = None) -> Dict:
     """浏览器自动化搜索接口"""
     manager = BrowserSearchManager()
-    return await manager.search_multiple_platforms(platforms, query)
+    return await manager.search_multiple_platforms(platforms, query, platform_timeout)
 
 
 # 同步搜索函数接口（用于与现有代码兼容）
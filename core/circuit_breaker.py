@@ -0,0 +1,214 @@
+"""
+平台熔断器
+按平台统计滚动错误率和耗时，平台持续失败时快速失败，冷却后探测恢复
+"""
+
+import collections
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 默认配置，可通过环境变量调整
+DEFAULT_WINDOW_SIZE = int(os.getenv("CIRCUIT_WINDOW_SIZE", "20"))
+DEFAULT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+DEFAULT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+DEFAULT_CONSECUTIVE_FAILURES = int(os.getenv("CIRCUIT_CONSECUTIVE_FAILURES", "3"))
+DEFAULT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "60"))
+DEFAULT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "0.8"))
+DEFAULT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开，调用被快速拒绝"""
+
+    def __init__(self, name: str, last_error: Optional[str], retry_after: float):
+        self.name = name
+        self.last_error = last_error
+        self.retry_after = retry_after
+        super().__init__(f"{name} 暂不可用（熔断中，{retry_after:.0f}s 后重试）: {last_error or '连续失败'}")
+
+
+class CircuitBreaker:
+    """单个平台的熔断器
+
+    - closed: 正常放行，记录滚动窗口内的成功/失败/慢调用
+    - open: 失败率、连续失败或慢调用比例超过阈值后打开，直接返回缓存的错误
+    - half_open: 冷却结束后放行一次真实请求作为探测（该请求承担完整的平台耗时），成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name: str,
+                 window_size: int = DEFAULT_WINDOW_SIZE,
+                 min_calls: int = DEFAULT_MIN_CALLS,
+                 failure_rate: float = DEFAULT_FAILURE_RATE,
+                 consecutive_failures: int = DEFAULT_CONSECUTIVE_FAILURES,
+                 slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS,
+                 slow_call_rate: float = DEFAULT_SLOW_CALL_RATE,
+                 open_seconds: float = DEFAULT_OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.consecutive_failures = consecutive_failures
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+
+        self._lock = threading.Lock()
+        self._window = collections.deque(maxlen=window_size)  # (是否成功, 耗时)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._consecutive = 0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._last_error: Optional[str] = None
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """是否放行本次调用"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"熔断器 {self.name} 进入半开状态")
+            # 半开状态: 只允许一个探测（探测长时间无结果时允许重新探测）
+            if self._probe_in_flight and time.monotonic() - self._probe_started < self.open_seconds:
+                self._rejected += 1
+                return False
+            self._probe_in_flight = True
+            self._probe_started = time.monotonic()
+            return True
+
+    def check(self):
+        """放行检查，不放行时抛出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self._last_error, self.retry_after())
+
+    def retry_after(self) -> float:
+        """距离下次探测的秒数"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self, latency: float = 0.0):
+        """记录成功调用"""
+        with self._lock:
+            self._consecutive = 0
+            if self._state == HALF_OPEN:
+                logger.info(f"熔断器 {self.name} 探测成功，恢复正常")
+                self._state = CLOSED
+                self._probe_in_flight = False
+                self._window.clear()
+            self._window.append((True, latency))
+            self._evaluate()
+
+    def record_failure(self, error: Optional[str] = None, latency: float = 0.0):
+        """记录失败调用"""
+        with self._lock:
+            self._consecutive += 1
+            self._last_error = error or self._last_error
+            if self._state == HALF_OPEN:
+                self._trip("探测失败")
+                return
+            self._window.append((False, latency))
+            self._evaluate()
+
+    def _evaluate(self):
+        """根据滚动窗口判断是否需要打开（需持有锁）"""
+        if self._state != CLOSED:
+            return
+        if self._consecutive >= self.consecutive_failures:
+            self._trip(f"连续失败 {self._consecutive} 次")
+            return
+        calls = len(self._window)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for ok, _ in self._window if not ok)
+        if failures / calls >= self.failure_rate:
+            self._trip(f"错误率 {failures}/{calls}")
+            return
+        slow = sum(1 for _, latency in self._window if latency >= self.slow_call_seconds)
+        if slow / calls >= self.slow_call_rate:
+            self._trip(f"慢调用 {slow}/{calls}")
+
+    def _trip(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        logger.warning(f"熔断器 {self.name} 打开: {reason}，最近错误: {self._last_error}")
+
+    def reset(self):
+        """手动重置为关闭状态"""
+        with self._lock:
+            self._state = CLOSED
+            self._window.clear()
+            self._consecutive = 0
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """熔断器状态，用于状态接口"""
+        with self._lock:
+            calls = len(self._window)
+            failures = sum(1 for ok, _ in self._window if not ok)
+            latencies = sorted(latency for ok, latency in self._window if ok)
+            retry_after = 0.0
+            if self._state == OPEN:
+                retry_after = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+            return {
+                "state": self._state,
+                "calls": calls,
+                "failures": failures,
+                "error_rate": round(failures / calls, 3) if calls else 0.0,
+                "consecutive_failures": self._consecutive,
+                "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "p90_latency": round(latencies[int(len(latencies) * 0.9)], 3) if latencies else None,
+                "last_error": self._last_error,
+                "rejected": self._rejected,
+                "retry_after": round(retry_after, 1)
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """获取（或创建）指定平台的熔断器"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def breaker_snapshots() -> Dict[str, Dict[str, Any]]:
+    """所有熔断器的状态"""
+    return {name: breaker.snapshot() for name, breaker in list(_breakers.items())}
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "get_breaker",
+    "breaker_snapshots",
+    "CLOSED",
+    "OPEN",
+    "HALF_OPEN",
+]
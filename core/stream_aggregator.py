@@ -3,6 +3,8 @@
 专注于实时监控和动态内容聚合
 """
 
+import asyncio
+import concurrent.futures
 import time
 import logging
 from typing import List, Dict, Any, Optional, Tuple
@@ -12,11 +14,29 @@ import threading
 import queue
 import os
 import sys
+import uuid
+from types import MappingProxyType
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 异步接口使用的有界线程池：同步的平台脚本和AI调用在其中执行，不阻塞事件循环
+AGGREGATOR_MAX_WORKERS = int(os.getenv("AGGREGATOR_MAX_WORKERS", "4"))
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_aggregator_executor() -> concurrent.futures.ThreadPoolExecutor:
+    """获取聚合器共享的线程池"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=AGGREGATOR_MAX_WORKERS, thread_name_prefix="aggregator"
+                )
+    return _executor
+
 @dataclass
 class StreamContent:
     """流式内容数据结构"""
@@ -88,43 +108,90 @@ class PlatformStreamMonitor:
         """停止监控"""
         self.is_monitoring = False
 
-class MultiPlatformStreamAggregator:
-    """多平台流式聚合器"""
+# 平台内容选择器 - 简化版，专注于流式监控
+PLATFORM_CONFIGS = MappingProxyType({
+    "DeepSeek": ".c08e6e93",  # 消息内容选择器
+    "Kimi": ".message-list .message-item:last-child",
+    "智谱清言": ".message-area-LmU13Q .markdown-body:last-child",
+    # 其他平台可以继续添加
+})
+
+# AI处理提示词模板
+PROMPT_TEMPLATES = MappingProxyType({
+    "default": """
+请基于以下多平台搜索结果，进行信息整理和事实核查：
+
+**原始查询**: {query}
+
+**搜索结果**:
+{content}
+
+**处理要求**: {requirements}
+
+请提供：
+1. 核心信息总结
+2. 关键要点提取
+3. 信息可信度评估
+4. 潜在风险提示
+5. 建议行动方案
+""",
+    "fact_check": """
+请对以下信息进行专业的事实核查和分析：
+
+**查询内容**: {query}
+
+**待核查信息**:
+{content}
+
+请提供：
+1. 事实准确性验证
+2. 信息来源可信度分析
+3. 潜在偏见或误导识别
+4. 建议进一步验证的方向
+5. 综合可信度评分（1-10分）
+""",
+    "summary": """
+请将以下多源信息整理成清晰的总结报告：
+
+**主题**: {query}
+
+**信息来源**:
+{content}
+
+**要求**: {requirements}
+
+请按以下结构输出：
+- 📋 执行摘要
+- 🔍 详细分析  
+- 💡 关键洞察
+- ⚠️ 注意事项
+- 🎯 行动建议
+"""
+})
+
+class AggregatorEngine:
+    """聚合引擎 - 只保存只读的平台配置、提示词模板和线程池，可被所有搜索共享
+
+    每次搜索通过 new_session() 创建独立的 AggregationSession，搜索状态不在引擎上保存
+    """
     
-    def __init__(self):
-        self.platform_monitors = {}
-        self.aggregated_content = []
-        self.is_aggregating = False
-        
-        # 平台配置 - 简化版，专注于流式监控
-        self.platform_configs = {
-            "DeepSeek": ".c08e6e93",  # 消息内容选择器
-            "Kimi": ".message-list .message-item:last-child",
-            "智谱清言": ".message-area-LmU13Q .markdown-body:last-child",
-            # 其他平台可以继续添加
-        }
+    def __init__(self, platform_configs=None, prompt_templates=None,
+                 executor: Optional[concurrent.futures.Executor] = None):
+        self.platform_configs = MappingProxyType(dict(platform_configs or PLATFORM_CONFIGS))
+        self.prompt_templates = MappingProxyType(dict(prompt_templates or PROMPT_TEMPLATES))
+        self._executor = executor
     
-    def start_aggregation(self, platforms: List[str], query: str, 
-                         ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
-        """开始多平台流式聚合"""
-        logger.info(f"开始多平台流式聚合: {platforms}")
-        
-        self.is_aggregating = True
-        self.aggregated_content = []
-        
-        # 收集流式内容（模拟版本，实际需要集成playwright脚本）
-        stream_results = []
-        for platform in platforms:
-            if platform in self.platform_configs:
-                try:
-                    logger.info(f"启动 {platform} 搜索...")
-                    # 这里是模拟数据，实际需要调用相应的playwright脚本
-                    content = self._run_platform_with_stream(platform, query)
-                    if content:
-                        stream_results.append(content)
-                except Exception as e:
-                    logger.error(f"{platform} 执行失败: {e}")
-        
+    @property
+    def executor(self) -> concurrent.futures.Executor:
+        return self._executor or get_aggregator_executor()
+    
+    def new_session(self, session_id: Optional[str] = None) -> "AggregationSession":
+        """创建一次搜索的会话"""
+        return AggregationSession(self, session_id)
+    
+    def build_result(self, platforms: List[str], query: str, stream_results: List[StreamContent],
+                     ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
+        """聚合各平台内容并生成最终结果"""
         # 第二阶段：实时聚合
         aggregated_result = self._aggregate_streams(stream_results)
         
@@ -134,8 +201,6 @@ class MultiPlatformStreamAggregator:
         else:
             final_result = self._simple_merge(aggregated_result)
         
-        self.is_aggregating = False
-        
         return {
             "query": query,
             "platforms": platforms,
@@ -153,6 +218,16 @@ class MultiPlatformStreamAggregator:
             "processing_time": datetime.now().isoformat()
         }
     
+    def run_platform(self, platform: str, query: str) -> Optional[StreamContent]:
+        """运行单个平台，异常时记录并返回None"""
+        try:
+            logger.info(f"启动 {platform} 搜索...")
+            # 这里是模拟数据，实际需要调用相应的playwright脚本
+            return self._run_platform_with_stream(platform, query)
+        except Exception as e:
+            logger.error(f"{platform} 执行失败: {e}")
+            return None
+    
     def _run_platform_with_stream(self, platform: str, query: str) -> Optional[StreamContent]:
         """运行单个平台并进行流式监控（模拟版本）"""
         # 模拟搜索内容
@@ -221,7 +296,7 @@ class MultiPlatformStreamAggregator:
         ])
         
         # 加载提示词模板
-        prompt_template = self._load_prompt_template(config.get("prompt_type", "default"))
+        prompt_template = self.load_prompt_template(config.get("prompt_type", "default"))
         
         final_prompt = prompt_template.format(
             query=config.get("original_query", ""),
@@ -256,60 +331,9 @@ class MultiPlatformStreamAggregator:
             "source_count": len(contents)
         }
     
-    def _load_prompt_template(self, prompt_type: str) -> str:
+    def load_prompt_template(self, prompt_type: str) -> str:
         """加载提示词模板"""
-        templates = {
-            "default": """
-请基于以下多平台搜索结果，进行信息整理和事实核查：
-
-**原始查询**: {query}
-
-**搜索结果**:
-{content}
-
-**处理要求**: {requirements}
-
-请提供：
-1. 核心信息总结
-2. 关键要点提取
-3. 信息可信度评估
-4. 潜在风险提示
-5. 建议行动方案
-""",
-            "fact_check": """
-请对以下信息进行专业的事实核查和分析：
-
-**查询内容**: {query}
-
-**待核查信息**:
-{content}
-
-请提供：
-1. 事实准确性验证
-2. 信息来源可信度分析
-3. 潜在偏见或误导识别
-4. 建议进一步验证的方向
-5. 综合可信度评分（1-10分）
-""",
-            "summary": """
-请将以下多源信息整理成清晰的总结报告：
-
-**主题**: {query}
-
-**信息来源**:
-{content}
-
-**要求**: {requirements}
-
-请按以下结构输出：
-- 📋 执行摘要
-- 🔍 详细分析  
-- 💡 关键洞察
-- ⚠️ 注意事项
-- 🎯 行动建议
-"""
-        }
-        return templates.get(prompt_type, templates["default"])
+        return self.prompt_templates.get(prompt_type, self.prompt_templates["default"])
     
     def _call_ai_service(self, prompt: str, config: Dict[str, Any]) -> Dict[str, Any]:
         """调用AI服务（模拟版本）"""
@@ -350,14 +374,140 @@ class MultiPlatformStreamAggregator:
             "processing_time": 2.5
         }
     
-    def stop_aggregation(self):
-        """停止聚合"""
+class AggregationSession:
+    """单次搜索的聚合会话 - 保存该搜索的监控器、收集的内容和停止标记，停止只影响本会话"""
+    
+    def __init__(self, engine: AggregatorEngine, session_id: Optional[str] = None):
+        self.engine = engine
+        self.session_id = session_id or uuid.uuid4().hex
+        self.platform_monitors: Dict[str, PlatformStreamMonitor] = {}
+        self.aggregated_content: List[StreamContent] = []
+        self.is_aggregating = False
+        self._stopped = threading.Event()
+    
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+    
+    def start_aggregation(self, platforms: List[str], query: str,
+                          ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
+        """开始多平台流式聚合"""
+        logger.info(f"开始多平台流式聚合: {platforms}")
+        
+        self.is_aggregating = True
+        try:
+            # 收集流式内容（模拟版本，实际需要集成playwright脚本）
+            for platform in platforms:
+                if platform in self.engine.platform_configs:
+                    self._collect(self._run_platform(platform, query))
+            return self._finish(platforms, query, ai_processor_config)
+        finally:
+            self.is_aggregating = False
+    
+    async def start_aggregation_async(self, platforms: List[str], query: str,
+                                      ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
+        """异步多平台聚合 - 各平台在引擎的有界线程池中并行执行，等待期间不阻塞事件循环"""
+        logger.info(f"开始多平台流式聚合(异步): {platforms}")
+        loop = asyncio.get_running_loop()
+        executor = self.engine.executor
+        
+        self.is_aggregating = True
+        try:
+            contents = await asyncio.gather(*[
+                loop.run_in_executor(executor, self._run_platform, platform, query)
+                for platform in platforms
+                if platform in self.engine.platform_configs
+            ])
+            for content in contents:
+                self._collect(content)
+            # 聚合和AI处理可能涉及网络调用，同样放到线程池
+            return await loop.run_in_executor(executor, self._finish, platforms, query, ai_processor_config)
+        finally:
+            self.is_aggregating = False
+    
+    def _run_platform(self, platform: str, query: str) -> Optional[StreamContent]:
+        if self.stopped:
+            return None
+        return self.engine.run_platform(platform, query)
+    
+    def _collect(self, content: Optional[StreamContent]):
+        if content:
+            self.aggregated_content.append(content)
+    
+    def _finish(self, platforms: List[str], query: str,
+                ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
+        # 已停止时只合并已收集的内容，不再调用AI
+        result = self.engine.build_result(platforms, query, list(self.aggregated_content),
+                                          None if self.stopped else ai_processor_config)
+        result["session_id"] = self.session_id
+        result["stopped"] = self.stopped
+        return result
+    
+    def stop(self):
+        """停止本会话：尚未开始的平台不再执行，正在监控的平台停止监控"""
+        self._stopped.set()
         self.is_aggregating = False
-        for monitor in self.platform_monitors.values():
+        for monitor in list(self.platform_monitors.values()):
             monitor.stop_monitoring()
 
+class MultiPlatformStreamAggregator:
+    """多平台流式聚合器（兼容旧接口）- 每次调用创建独立会话，stop_aggregation 停止本实例发起的会话"""
+    
+    def __init__(self, engine: Optional[AggregatorEngine] = None):
+        self.engine = engine or AggregatorEngine()
+        self.platform_configs = self.engine.platform_configs
+        self._sessions: Dict[str, AggregationSession] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def is_aggregating(self) -> bool:
+        with self._lock:
+            return any(session.is_aggregating for session in self._sessions.values())
+    
+    def _open(self) -> AggregationSession:
+        session = self.engine.new_session()
+        with self._lock:
+            self._sessions[session.session_id] = session
+        return session
+    
+    def _close(self, session: AggregationSession):
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+    
+    def start_aggregation(self, platforms: List[str], query: str, 
+                         ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
+        """开始多平台流式聚合"""
+        session = self._open()
+        try:
+            return session.start_aggregation(platforms, query, ai_processor_config)
+        finally:
+            self._close(session)
+    
+    async def start_aggregation_async(self, platforms: List[str], query: str,
+                                      ai_processor_config: Optional[Dict] = None) -> Dict[str, Any]:
+        """异步多平台聚合"""
+        session = self._open()
+        try:
+            return await session.start_aggregation_async(platforms, query, ai_processor_config)
+        finally:
+            self._close(session)
+    
+    def stop_aggregation(self):
+        """停止本实例发起的所有会话"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.stop()
+
 # 导出主要接口
-__all__ = ["MultiPlatformStreamAggregator", "StreamContent", "PlatformStreamMonitor"]
+__all__ = [
+    "AggregatorEngine",
+    "AggregationSession",
+    "MultiPlatformStreamAggregator",
+    "StreamContent",
+    "PlatformStreamMonitor",
+    "get_aggregator_executor",
+]
 
 # 测试代码
 if __name__ == "__main__":
@@ -202,33 +202,22 @@ def start_web_interface():
         return None
 
 def performance_comparison():
-    """性能对比测试"""
-    print("🧪 测试5: 性能对比")
+    """性能测试 - 快速运行基准测试套件（完整测试见 python -m benchmarks.run）"""
+    print("🧪 测试5: 性能基准")
     
-    print("📊 测试模拟模式性能...")
-    start_time = time.time()
     try:
-        response = requests.post(
-            "http://localhost:8000/quick-search",
-            params={"query": "性能测试", "platforms": "DeepSeek,Kimi,智谱清言", "simulation": "true"},
-            timeout=30
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--quick", "--repeat", "3", "--require-baseline",
+             "--scenarios", "simulation,aggregation,status_poll,credentials"],
+            capture_output=True, text=True, timeout=300
         )
-        simulation_time = time.time() - start_time
-        if response.status_code == 200:
-            print(f"✅ 模拟模式: {simulation_time:.2f}秒")
+        print(result.stdout.strip())
+        if result.returncode == 0:
+            print("✅ 性能基准正常")
         else:
-            print(f"❌ 模拟模式测试失败")
+            print(f"❌ 性能基准未通过: {result.stderr.strip()[-500:]}")
     except Exception as e:
-        print(f"❌ 模拟模式异常: {e}")
-    
-    print("📊 系统资源占用...")
-    try:
-        import psutil
-        process = psutil.Process()
-        memory_mb = process.memory_info().rss / 1024 / 1024
-        print(f"✅ 内存占用: {memory_mb:.1f} MB")
-    except ImportError:
-        print("⚠️ 无法检测内存占用 (需要psutil)")
+        print(f"❌ 性能基准异常: {e}")
     
     print()
 
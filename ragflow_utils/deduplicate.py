@@ -1,16 +1,101 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Iterator, Callable, TypeVar
+from collections import OrderedDict
+import hashlib
 import logging
+import math
+
+from ragflow_utils.fingerprint import content_fingerprint
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# 默认最多记住的指纹数量，超出后淘汰最早的指纹
+DEFAULT_MAX_FINGERPRINTS = 100000
+
+
+class BoundedFingerprintSet:
+    """有界指纹集合 - 超出容量时淘汰最早加入的指纹"""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_FINGERPRINTS):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def add(self, fingerprint: str) -> bool:
+        """加入指纹，已存在时返回False"""
+        if fingerprint in self._items:
+            return False
+        self._items[fingerprint] = None
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class FingerprintBloomFilter:
+    """指纹布隆过滤器 - 内存固定，适合超大批量去重（存在极低误判率）"""
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.bit_count = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self._bits = bytearray((self.bit_count + 7) // 8)
+        self._count = 0
+
+    def _positions(self, fingerprint: str) -> Iterator[int]:
+        # 双重哈希: 由一次blake2b摘要派生出k个位置
+        digest = hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.bit_count
+
+    def add(self, fingerprint: str) -> bool:
+        """加入指纹，（可能）已存在时返回False"""
+        is_new = False
+        for pos in self._positions(fingerprint):
+            byte, bit = divmod(pos, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                is_new = True
+        if is_new:
+            self._count += 1
+        return is_new
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def iter_deduplicate(results: Iterable[T],
+                     key: Optional[Callable[[T], str]] = None,
+                     max_fingerprints: int = DEFAULT_MAX_FINGERPRINTS,
+                     use_bloom: bool = False) -> Iterator[T]:
+    """流式去重 - 按到达顺序产出首次出现的结果
+
+    Args:
+        results: 结果迭代器，可边搜索边消费
+        key: 从结果中提取文本的函数，默认结果本身即为文本
+        max_fingerprints: 精确模式下最多保留的指纹数量
+        use_bloom: 使用布隆过滤器（内存固定，允许极低误判）
+    """
+    seen = FingerprintBloomFilter(capacity=max_fingerprints) if use_bloom \
+        else BoundedFingerprintSet(max_fingerprints)
+
+    for item in results:
+        text = key(item) if key else item
+        if seen.add(content_fingerprint(text)):
+            yield item
+
+
 # 保持原有的简单去重函数
 def deduplicate_results(results: List[str]) -> List[str]:
-    """简单去重 - 保持原有接口兼容性"""
+    """简单去重 - 保持原有接口兼容性，按原始顺序保留首次出现的结果"""
     if not results:
         return []
     
-    # 使用set进行简单去重
-    unique_results = list(set(results))
+    unique_results = list(iter_deduplicate(results))
     logger.info(f"简单去重: {len(results)} -> {len(unique_results)}")
     return unique_results
 
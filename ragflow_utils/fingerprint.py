@@ -0,0 +1,169 @@
+"""
+内容指纹模块
+为去重、结果缓存和历史索引提供跨进程稳定的内容ID
+"""
+
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import xxhash
+except ImportError:  # xxhash为可选依赖，缺失时回退到blake2b
+    xxhash = None
+
+# 指纹算法: blake2b 为标准库实现，任何环境下结果一致；xxh3 更快但需要安装 xxhash
+# 多进程/多机器共享指纹时，所有节点必须使用相同算法
+DEFAULT_ALGORITHM = os.getenv("FINGERPRINT_ALGORITHM", "blake2b")
+DIGEST_SIZE = 16  # 128位
+
+# Markdown 语法清理规则（按行处理）
+_MD_CODE_FENCE = re.compile(r"^\s*(```|~~~).*$")
+_MD_HEADING = re.compile(r"^\s{0,3}#{1,6}\s*")
+_MD_BLOCKQUOTE = re.compile(r"^\s*(>\s?)+")
+_MD_LIST_MARKER = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_MD_HRULE = re.compile(r"^\s*(?:[-*_]\s*){3,}$")
+_MD_TABLE_RULE = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_MD_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_MD_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_HTML_TAG = re.compile(r"<[^>]+>")
+_MD_EMPHASIS = re.compile(r"[*_~`|]+")
+
+
+def _normalize_line(line: str) -> List[str]:
+    """规范化单行文本，返回词元列表"""
+    line = unicodedata.normalize("NFKC", line)
+    if _MD_CODE_FENCE.match(line) or _MD_HRULE.match(line) or _MD_TABLE_RULE.match(line):
+        return []
+    line = _MD_HEADING.sub("", line)
+    line = _MD_BLOCKQUOTE.sub("", line)
+    line = _MD_LIST_MARKER.sub("", line)
+    line = _MD_IMAGE.sub(r"\1", line)
+    line = _MD_LINK.sub(r"\1", line)
+    line = _HTML_TAG.sub(" ", line)
+    line = _MD_EMPHASIS.sub(" ", line)
+    return line.casefold().split()
+
+
+def _strip_line_end(line: str) -> str:
+    """去掉行尾换行符（与 str.splitlines() 的行分隔一致），换行符会被列表标记等规则误匹配"""
+    lines = line.splitlines()
+    return lines[0] if lines else ""
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：NFKC、去除Markdown标记、统一大小写、合并空白"""
+    if not text:
+        return ""
+    tokens = []
+    for line in text.splitlines():
+        tokens.extend(_normalize_line(line))
+    return " ".join(tokens)
+
+
+_xxhash_warned = False
+
+
+def _new_hasher(algorithm: str):
+    """创建哈希对象"""
+    global _xxhash_warned
+    if algorithm == "xxh3":
+        if xxhash is not None:
+            return xxhash.xxh3_128()
+        if not _xxhash_warned:
+            _xxhash_warned = True
+            logger.warning("未安装xxhash，指纹算法回退到blake2b")
+    elif algorithm != "blake2b":
+        raise ValueError(f"不支持的指纹算法: {algorithm}")
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+
+class StreamingFingerprint:
+    """流式指纹计算器 - 在内容到达时增量计算，结果与一次性计算一致"""
+
+    def __init__(self, algorithm: Optional[str] = None, max_chars: Optional[int] = None):
+        self.algorithm = algorithm or DEFAULT_ALGORITHM
+        self.max_chars = max_chars
+        self._hasher = _new_hasher(self.algorithm)
+        self._pending = ""  # 尚未遇到换行符的半行内容
+        self._fed_chars = 0
+        self._digest = None
+
+    def update(self, chunk: str) -> "StreamingFingerprint":
+        """追加一段内容"""
+        if self._digest is not None:
+            raise RuntimeError("指纹已完成计算，不能继续追加内容")
+        if not chunk:
+            return self
+        data = self._pending + chunk
+        lines = data.splitlines(keepends=True)
+        # 最后一行可能不完整，保留到下次更新
+        if lines and _strip_line_end(lines[-1]) == lines[-1]:
+            self._pending = lines.pop()
+        else:
+            self._pending = ""
+        for line in lines:
+            self._feed(_normalize_line(_strip_line_end(line)))
+        return self
+
+    def _feed(self, tokens: List[str]):
+        """写入已规范化的词元"""
+        if not tokens:
+            return
+        if self.max_chars is not None and self._fed_chars >= self.max_chars:
+            return
+        text = " ".join(tokens)
+        if self._fed_chars:
+            text = " " + text
+        if self.max_chars is not None:
+            text = text[:self.max_chars - self._fed_chars]
+        self._fed_chars += len(text)
+        self._hasher.update(text.encode("utf-8"))
+
+    def hexdigest(self) -> str:
+        """结束输入并返回十六进制指纹"""
+        if self._digest is None:
+            if self._pending:
+                self._feed(_normalize_line(_strip_line_end(self._pending)))
+                self._pending = ""
+            self._digest = self._hasher.hexdigest()
+        return self._digest
+
+
+def content_fingerprint(text: str, algorithm: Optional[str] = None,
+                        max_chars: Optional[int] = None) -> str:
+    """计算内容指纹
+
+    Args:
+        text: 原始文本（可包含Markdown）
+        algorithm: 指纹算法 (blake2b/xxh3)，默认读取 FINGERPRINT_ALGORITHM
+        max_chars: 仅对规范化后的前N个字符计算指纹
+    """
+    normalized = normalize_text(text)
+    if max_chars is not None:
+        normalized = normalized[:max_chars]
+    hasher = _new_hasher(algorithm or DEFAULT_ALGORITHM)
+    hasher.update(normalized.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def fingerprint_chunks(chunks: Iterable[str], algorithm: Optional[str] = None,
+                       max_chars: Optional[int] = None) -> str:
+    """对流式到达的内容块计算指纹"""
+    fingerprint = StreamingFingerprint(algorithm, max_chars)
+    for chunk in chunks:
+        fingerprint.update(chunk)
+    return fingerprint.hexdigest()
+
+
+__all__ = [
+    "normalize_text",
+    "content_fingerprint",
+    "fingerprint_chunks",
+    "StreamingFingerprint",
+]
@@ -6,6 +6,8 @@
 from typing import List, Dict, Any
 import logging
 
+from ragflow_utils.fingerprint import content_fingerprint
+
 logger = logging.getLogger(__name__)
 
 def simple_deduplicate(results: List[str]) -> List[str]:
@@ -19,8 +21,8 @@ def simple_deduplicate(results: List[str]) -> List[str]:
     
     for result in results:
         if result and result.strip():
-            # 简单的内容指纹
-            content_hash = hash(result.strip().lower()[:100])
+            # 跨进程稳定的内容指纹（规范化后的前100个字符）
+            content_hash = content_fingerprint(result, max_chars=100)
             if content_hash not in seen:
                 seen.add(content_hash)
                 unique_results.append(result)
@@ -0,0 +1,47 @@
+"""流式指纹与一次性指纹一致性测试"""
+
+import random
+
+from ragflow_utils.fingerprint import content_fingerprint, fingerprint_chunks
+
+SAMPLES = [
+    "intro\n-\nitem",
+    "a\n1.\nb",
+    "# 标题\r\n\r\n* 列表项\r\n+\r\n2)\r\n> 引用 **加粗** `代码`",
+    "行一 - 行二\x0c3.\x0b结尾",
+    "```\ncode\n```\n| a | b |\n|---|---|\n| 1 | 2 |\n---\n[链接](http://x) ![图](y.png)",
+]
+
+ALPHABET = ["a", "B", " ", "-", "*", "+", "1", ".", ")", "#", ">", "`", "\n", "\r", "\r\n", " ", "中", "Ａ"]
+
+
+def _random_chunks(text: str, rng: random.Random):
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 8)))) if len(text) > 1 else []
+    bounds = [0] + cuts + [len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def test_samples_match_for_random_chunkings():
+    rng = random.Random(0)
+    for text in SAMPLES:
+        expected = content_fingerprint(text)
+        assert fingerprint_chunks([text]) == expected
+        assert fingerprint_chunks(list(text)) == expected
+        for _ in range(50):
+            assert fingerprint_chunks(_random_chunks(text, rng)) == expected
+
+
+def test_fuzz_streaming_matches_one_shot():
+    rng = random.Random(1)
+    for _ in range(3000):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40)))
+        assert fingerprint_chunks(_random_chunks(text, rng)) == content_fingerprint(text), repr(text)
+
+
+def test_max_chars_matches_one_shot():
+    rng = random.Random(2)
+    text = "\n".join(f"- 第{i}项 *内容*" for i in range(50))
+    for max_chars in (1, 10, 100):
+        expected = content_fingerprint(text, max_chars=max_chars)
+        for _ in range(20):
+            assert fingerprint_chunks(_random_chunks(text, rng), max_chars=max_chars) == expected
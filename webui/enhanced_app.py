@@ -10,8 +10,10 @@ import time
 from datetime import datetime
 import logging
 import os
+import uuid
 import sqlite3
 from pathlib import Path
+from urllib.parse import urlencode
 import tempfile
 import shutil
 import json
@@ -149,14 +151,20 @@ st.markdown("""
 # API配置
 API_BASE_URL = "http://localhost:8000"
 
+def _client_headers():
+    """按浏览器会话标识客户端，后端开启限流（RATE_LIMIT_TRUST_CLIENT_ID=1）时各会话分别计数"""
+    if 'client_id' not in st.session_state:
+        st.session_state.client_id = uuid.uuid4().hex
+    return {"X-Client-Id": st.session_state.client_id}
+
 def call_api(endpoint, method="GET", data=None, timeout=60):
     """统一的API调用函数"""
     try:
         url = f"{API_BASE_URL}{endpoint}"
         if method == "GET":
-            response = requests.get(url, timeout=timeout)
+            response = requests.get(url, headers=_client_headers(), timeout=timeout)
         elif method == "POST":
-            response = requests.post(url, json=data, timeout=timeout)
+            response = requests.post(url, json=data, headers=_client_headers(), timeout=timeout)
         
         if response.status_code == 200:
             return response.json(), None
@@ -643,6 +651,137 @@ def display_help_info():
     - 检查平台状态
     """)
 
+POLL_INTERVAL = 1.5  # 轮询间隔（秒）
+POLL_MAX_ATTEMPTS = 60  # 最多轮询60次
+STREAM_RENDER_INTERVAL = 0.2  # SSE内容增量的最小刷新间隔（秒）
+
+def iter_search_status(search_id: str):
+    """跟踪搜索进度，逐次产出最新的搜索状态
+
+    优先订阅 /search-stream 事件流，后端不支持或连接中断时回退到轮询 /search-status
+    """
+    deadline = time.time() + POLL_INTERVAL * POLL_MAX_ATTEMPTS
+    try:
+        yield from _iter_search_status_stream(search_id, deadline)
+        return
+    except (requests.exceptions.RequestException, RuntimeError, ValueError) as e:
+        logging.warning(f"事件流不可用，回退到轮询: {e}")
+    
+    yield from _iter_search_status_polling(search_id)
+
+def _iter_search_status_stream(search_id: str, deadline: float):
+    """通过SSE事件在本地合成搜索状态"""
+    status_info = {
+        "status": "running",
+        "progress": 0.0,
+        "current_platform": None,
+        "live_results": {},
+        "error": None
+    }
+    url = f"{API_BASE_URL}/search-stream/{search_id}"
+    with requests.get(url, stream=True, headers=_client_headers(), timeout=(5, 30)) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"事件流返回 {response.status_code}")
+        
+        last_render = 0.0
+        for line in response.iter_lines(decode_unicode=True):
+            if time.time() > deadline:
+                return
+            if not line or not line.startswith("data: "):
+                continue
+            
+            event = json.loads(line[6:])
+            _apply_search_event(status_info, event)
+            
+            if event["type"] == "done":
+                # 搜索结束后获取一次完整结果
+                status_data, _ = call_api(f"/search-status/{search_id}", "GET", None, 10)
+                if status_data and status_data.get('status'):
+                    status_info = status_data['status']
+                yield status_info
+                return
+            
+            # 内容增量较密集，限制刷新频率
+            now = time.time()
+            if event["type"] != "content_delta" or now - last_render >= STREAM_RENDER_INTERVAL:
+                last_render = now
+                yield status_info
+    
+    raise RuntimeError("事件流意外结束")
+
+def _apply_search_event(status_info: dict, event: dict):
+    """把单个搜索事件合并到本地状态"""
+    event_type = event["type"]
+    platform = event.get("platform")
+    live = None
+    if platform:
+        live = status_info["live_results"].setdefault(platform, {
+            "status": "waiting", "content": "", "progress_text": "等待开始...", "error": None
+        })
+    
+    if event_type == "progress":
+        status_info["progress"] = event["progress"]
+        status_info["current_platform"] = event.get("current_platform")
+    elif event_type == "platform_started":
+        live["status"] = "searching"
+        live["start_time"] = event.get("start_time")
+    elif event_type == "content_delta":
+        live["content"] = live["content"][:event["offset"]] + event["delta"]
+    elif event_type == "content_reset":
+        live["content"] = event["content"]
+    elif event_type == "platform_progress":
+        live["progress_text"] = event.get("progress_text")
+    elif event_type == "platform_completed":
+        live["status"] = event["status"]
+        live["error"] = event.get("error")
+        live["latency"] = event.get("latency")
+    elif event_type == "done":
+        status_info["status"] = event["status"]
+        status_info["error"] = event.get("error")
+
+def _iter_search_status_polling(search_id: str):
+    """增量轮询搜索状态 - 带上已知版本和各平台内容长度，服务端只返回变化部分并在无变化时等待"""
+    status_info = {}
+    version = None
+    for _ in range(POLL_MAX_ATTEMPTS):
+        query = {}
+        if version is not None:
+            query = {"since_version": version, "wait": POLL_INTERVAL}
+            for platform, live in status_info.get('live_results', {}).items():
+                query[f"content_offset[{platform}]"] = len(live.get('content', ''))
+        endpoint = f"/search-status/{search_id}" + (f"?{urlencode(query)}" if query else "")
+        status_data, status_error = call_api(endpoint, "GET", None, 10 + POLL_INTERVAL)
+        
+        if status_error:
+            yield {"status": "failed", "error": f"获取搜索状态失败: {status_error}"}
+            return
+        
+        if status_data.get('changed', True):
+            _merge_status_delta(status_info, status_data.get('status', {}))
+        yield status_info
+        
+        if 'version' in status_data or 'version' in status_info:
+            version = status_data.get('version', status_info.get('version'))
+        else:
+            # 旧版后端不支持增量轮询
+            time.sleep(POLL_INTERVAL)
+
+def _merge_status_delta(status_info: dict, delta: dict):
+    """合并增量状态，带 content_offset 的平台内容为追加部分"""
+    for key, value in delta.items():
+        if key != 'live_results':
+            status_info[key] = value
+    live_results = status_info.setdefault('live_results', {})
+    for platform, live in delta.get('live_results', {}).items():
+        local = live_results.setdefault(platform, {})
+        offset = live.get('content_offset')
+        if offset is not None:
+            content = local.get('content', '')[:offset] + live.get('content', '')
+            local.update(live)
+            local['content'] = content
+        else:
+            local.update(live)
+
 def perform_search(query: str, platforms: list, timeout: int, max_workers: int, 
                   enable_ai: bool, mode: str):
     """执行搜索
@@ -722,19 +861,8 @@ def perform_search(query: str, platforms: list, timeout: int, max_workers: int,
                 platform_containers[platform]['content_area'] = st.empty()
                 platform_containers[platform]['status_text'].text("🔄 等待开始...")
     
-    # 轮询搜索状态并实时更新
-    max_attempts = 60  # 最多轮询60次 (2分钟)
-    attempt = 0
-    
-    while attempt < max_attempts:
-        # 获取当前状态
-        status_data, status_error = call_api(f"/search-status/{search_id}", "GET", None, 10)
-        
-        if status_error:
-            st.error(f"❌ 获取搜索状态失败: {status_error}")
-            break
-        
-        status_info = status_data.get('status', {})
+    # 订阅搜索进度（优先SSE，不可用时回退到轮询）并实时更新
+    for status_info in iter_search_status(search_id):
         current_status = status_info.get('status', 'unknown')
         progress = status_info.get('progress', 0.0)
         current_platform = status_info.get('current_platform')
@@ -746,7 +874,9 @@ def perform_search(query: str, platforms: list, timeout: int, max_workers: int,
         progress_bar.progress(progress)
         
         # 更新状态文本
-        if current_status == "running":
+        if current_status == "queued":
+            status_text.text("⏳ 排队中，等待空闲的搜索worker...")
+        elif current_status == "running":
             if current_platform:
                 status_text.text(f"🔍 正在搜索: {current_platform} ({int(progress*100)}%)")
             else:
@@ -882,12 +1012,8 @@ def perform_search(query: str, platforms: list, timeout: int, max_workers: int,
             # 清理搜索状态
             call_api(f"/search-status/{search_id}", "DELETE")
             break
-        
-        # 等待下次轮询
-        attempt += 1
-        time.sleep(1.5)  # 每1.5秒检查一次状态，更频繁的更新
     
-    if attempt >= max_attempts:
+    else:
         # 超时处理
         progress_container.empty()
         live_results_container.empty()
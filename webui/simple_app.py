@@ -7,6 +7,7 @@ import streamlit as st
 import requests
 import json
 import time
+import uuid
 from datetime import datetime
 import logging
 
@@ -159,10 +160,13 @@ def main():
             return
         
         # 构建请求
+        # 记录搜索ID，停止时只停止本次搜索
+        st.session_state.search_id = uuid.uuid4().hex
         search_request = {
             "query": query,
             "platforms": selected_platforms,
-            "enable_ai_processing": enable_ai
+            "enable_ai_processing": enable_ai,
+            "search_id": st.session_state.search_id
         }
         
         if enable_ai and api_key:
@@ -248,11 +252,15 @@ def main():
     
     with col2:
         if st.button("⏹️ 停止搜索", use_container_width=True):
-            stop_data, stop_error = call_api("/stop", "POST")
-            if stop_data:
-                st.success("搜索已停止")
+            search_id = st.session_state.get("search_id")
+            if not search_id:
+                st.info("没有进行中的搜索")
             else:
-                st.error(f"停止失败: {stop_error}")
+                stop_data, stop_error = call_api("/stop", "POST", {"search_id": search_id})
+                if stop_data:
+                    st.success("搜索已停止")
+                else:
+                    st.error(f"停止失败: {stop_error}")
     
     with col3:
         if st.button("📊 查看配置", use_container_width=True):